@@ -11,20 +11,47 @@ notion_utils.py
 import os
 import sys
 import json
+import atexit
+import hashlib
+import importlib.util
+import pickle
 import re
 import math
 import time
-from datetime import date, datetime, timedelta
+import random
+import queue
+import asyncio
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote
 from zoneinfo import ZoneInfo
-from typing import Any, Dict, Iterable, List, Optional, Tuple, Set, cast
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Set, Union, cast
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+if TYPE_CHECKING:
+    import pandas as pd  # 타입 표기 전용 (런타임에는 사용하는 함수 안에서 지연 임포트)
+
+# 토큰 캐시 동시 접근 방지용 파일 잠금 (Windows는 msvcrt, 그 외는 POSIX fcntl)
+if sys.platform == "win32":
+    import msvcrt
+    fcntl = None
+else:
+    msvcrt = None
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
 
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 from dotenv import load_dotenv
 
-from notion_client import Client
+from notion_client import Client, AsyncClient
 from notion_client.errors import HTTPResponseError
 
 # .env 환경변수 로드
@@ -42,30 +69,281 @@ if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
 # 1. 공통 상수 및 네트워크 세션 관리
 # ==============================================================================
 RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# urllib3 어댑터가 자체 재시도하는 상태 코드. 429/503(Retry-After)은 BACKOFF가 예산·워커 간 일시 정지와 함께 처리하도록 제외
+ADAPTER_RETRY_STATUS_CODES = RETRY_STATUS_CODES - {429, 503}
 DEFAULT_PAGE_SIZE = 100
 KIS_PROD_URL = "https://openapi.koreainvestment.com:9443"
+KIS_PROD_WS_URL = "ws://ops.koreainvestment.com:21000"
+# KIS 실전 앱키 한도(초당 20건)에 여유를 둔 호출 속도와, 이 속도를 채우는 데 필요한 수집 워커 수
+KIS_RPS = float(os.environ.get("KIS_RPS", "18"))
+KIS_MAX_WORKERS = int(os.environ.get("KIS_MAX_WORKERS", "8"))
+NOTION_WRITE_RPS = float(os.environ.get("NOTION_WRITE_RPS", "3.0"))
+UPDATE_DATE_CANDIDATES = ["마지막 업데이트", "업데이트 일자", "업데이트", "최종수정일", "수정일", "일자"]
+
+
+class TokenBucket:
+    """
+    스레드와 asyncio 양쪽에서 공유 가능한 토큰 버킷 속도 제한기입니다.
+    토큰을 선(先)예약하는 방식이라 대기 중인 호출이 순서대로 정확히 rate(초당 건수)에 맞춰 방출됩니다.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = max(rate, 0.01)
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """토큰 1개를 예약하고 사용 가능 시점까지 대기해야 할 시간(초)을 반환합니다."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        """토큰을 얻을 때까지 현재 스레드를 대기시킵니다."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """토큰을 얻을 때까지 이벤트 루프를 막지 않고 대기합니다."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# 노션 쓰기(pages.update / pages.create / blocks.children.append) 전용 프로세스 공용 버킷
+NOTION_WRITE_BUCKET = TokenBucket(rate=NOTION_WRITE_RPS, capacity=NOTION_WRITE_RPS)
+
+# 한투(KIS) REST 호출 전용 프로세스 공용 버킷 (KISClient가 사용)
+# KIS는 1초 구간 단위로 건수를 세므로 순간 몰림(burst) 없이 균등 간격으로 방출되도록 용량을 1로 둠
+KIS_BUCKET = TokenBucket(rate=KIS_RPS, capacity=1.0)
+
+
+class BackoffCoordinator:
+    """
+    호스트(notion, kis 등) 단위로 재시도 대기를 조율하는 프로세스 공용 백오프 코디네이터입니다.
+    - 429/503 응답의 Retry-After 헤더를 해석하여 해당 호스트로 향하는 모든 워커를 같은 시점까지 함께 멈춥니다.
+    - 헤더가 없으면 지수 백오프에 지터(jitter)를 더해 워커들이 동시에 재시도하지 않도록 분산합니다.
+    - 실행 1회당 호스트별 재시도 예산(retry budget)을 초과하면 더 이상 재시도하지 않고 즉시 실패 처리합니다.
+      예산은 호스트마다 따로 두므로 한투 장애로 재시도가 몰려도 노션 429 재시도 여력은 남습니다.
+      (기본값 retry_budget, 호스트별로 RETRY_BUDGET_<HOST> 환경 변수로 조정. 예: RETRY_BUDGET_KIS=100)
+    """
+
+    def __init__(self, retry_budget: int = 200, max_pause: float = 60.0):
+        self.retry_budget = retry_budget
+        self.max_pause = max_pause
+        self._paused_until: Dict[str, float] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._retries_used: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def budget_for(self, host: str) -> int:
+        """호스트별 재시도 예산을 반환합니다 (RETRY_BUDGET_<HOST>가 없으면 기본 예산)."""
+        raw = os.environ.get(f"RETRY_BUDGET_{host.upper()}")
+        try:
+            return int(raw) if raw else self.retry_budget
+        except ValueError:
+            return self.retry_budget
+
+    @staticmethod
+    def parse_retry_after(headers: Any) -> Optional[float]:
+        """Retry-After 헤더(초 단위 숫자 또는 HTTP-date)를 대기 초로 변환합니다."""
+        if not headers:
+            return None
+        try:
+            raw = headers.get("Retry-After") or headers.get("retry-after")
+        except Exception:
+            return None
+        if raw is None:
+            return None
+        raw = str(raw).strip()
+        try:
+            return max(0.0, float(raw))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(raw)
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError, IndexError):
+            return None
+
+    def _host_stats(self, host: str) -> Dict[str, float]:
+        return self._stats.setdefault(host, {"retries": 0, "throttled": 0, "waited_sec": 0.0, "exhausted": 0})
+
+    def wait(self, host: str) -> None:
+        """해당 호스트가 일시 정지 상태라면 재개 시점까지 현재 스레드를 대기시킵니다."""
+        remaining = self._paused_until.get(host, 0.0) - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    async def wait_async(self, host: str) -> None:
+        """wait의 비동기 버전 (이벤트 루프를 막지 않음)."""
+        remaining = self._paused_until.get(host, 0.0) - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    def next_delay(
+        self,
+        host: str,
+        attempt: int,
+        base_delay: float,
+        status: Optional[int] = None,
+        headers: Any = None,
+    ) -> Optional[float]:
+        """
+        재시도 1회를 예산에서 차감하고 이번 워커가 대기할 시간(초)을 반환합니다.
+        예산이 소진되었으면 None을 반환하며, 호출 측은 재시도를 중단해야 합니다.
+        """
+        retry_after = self.parse_retry_after(headers)
+        with self._lock:
+            stats = self._host_stats(host)
+            used = self._retries_used.get(host, 0)
+            if used >= self.budget_for(host):
+                stats["exhausted"] += 1
+                return None
+            self._retries_used[host] = used + 1
+            stats["retries"] += 1
+
+            backoff = base_delay * (2 ** (attempt - 1))
+            delay = backoff / 2 + random.uniform(0, backoff / 2)
+            if retry_after is not None or status == 429:
+                stats["throttled"] += 1
+                pause = min(self.max_pause, retry_after if retry_after is not None else backoff)
+                resume_at = max(self._paused_until.get(host, 0.0), time.monotonic() + pause)
+                self._paused_until[host] = resume_at
+                # 동시에 깨어난 워커가 한꺼번에 몰리지 않도록 재개 시점 이후로 작은 지터를 더함
+                delay = max(0.0, resume_at - time.monotonic()) + random.uniform(0, min(1.0, base_delay))
+
+            stats["waited_sec"] += delay
+            return delay
+
+    def summary(self) -> str:
+        """호스트별 재시도/스로틀/대기 시간 통계를 한 줄 요약 문자열로 반환합니다."""
+        with self._lock:
+            if not self._stats:
+                return f"재시도 없음 (호스트별 예산 {self.retry_budget}회)"
+            parts = [
+                f"{host}: 재시도 {int(s['retries'])}/{self.budget_for(host)}회, 429/Retry-After {int(s['throttled'])}회, "
+                f"대기 {s['waited_sec']:.1f}초, 예산초과 포기 {int(s['exhausted'])}회"
+                for host, s in sorted(self._stats.items())
+            ]
+            return " / ".join(parts)
+
+    def report(self, logger: Optional[Any] = None) -> None:
+        """실행 종료 시 재시도 통계를 출력합니다."""
+        message = f"📊 [Backoff 리포트] {self.summary()}"
+        if logger:
+            logger.info(message)
+        else:
+            print(message)
+
+
+# 노션·한투 등 외부 API 재시도를 조율하는 프로세스 공용 코디네이터 (호스트별 기본 예산은 RETRY_BUDGET으로 조정)
+BACKOFF = BackoffCoordinator(retry_budget=int(os.environ.get("RETRY_BUDGET", "200")))
+
 
+HTTP_KEEP_ALIVE = os.environ.get("HTTP_KEEP_ALIVE", "on").lower() not in ("off", "false", "0")
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))
+# keep-alive 재사용 시 오동작(끊긴 연결 재사용 오류 등)하는 호스트는 콤마로 지정하면 요청마다 연결을 닫음
+HTTP_CLOSE_HOSTS = [h.strip().lower() for h in os.environ.get("HTTP_CLOSE_HOSTS", "").split(",") if h.strip()]
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
-def get_http_session(user_agent: Optional[str] = None) -> requests.Session:
-    """Connection: close 및 지수 백오프 Retry가 적용된 고신뢰성 HTTP 세션을 반환합니다."""
+
+class ConnectionCloseAdapter(HTTPAdapter):
+    """요청마다 Connection: close 헤더를 붙여 연결을 재사용하지 않는 어댑터 (keep-alive 오동작 호스트 전용)"""
+
+    def add_headers(self, request: Any, **kwargs: Any) -> None:
+        request.headers["Connection"] = "close"
+
+
+def get_http_session(
+    user_agent: Optional[str] = None,
+    pool_size: Optional[int] = None,
+    keep_alive: Optional[bool] = None,
+    close_hosts: Optional[Iterable[str]] = None,
+    status_retries: bool = True,
+) -> requests.Session:
+    """
+    지수 백오프 Retry가 적용된 고신뢰성 HTTP 세션을 반환합니다.
+    - 어댑터는 연결 오류와 ADAPTER_RETRY_STATUS_CODES만 재시도하며, 429/503은 호출 측(BACKOFF)에 그대로 넘깁니다.
+    - status_retries=False면 상태 코드 재시도를 끄고 연결 오류만 재시도합니다 (BACKOFF가 모든 재시도를 세는 세션용).
+    - 기본은 keep-alive 연결 풀 모드이며, pool_size는 세션을 공유하는 워커 수에 맞춥니다 (pool_block으로 초과 연결 생성 방지).
+    - keep_alive=False(또는 HTTP_KEEP_ALIVE=off)면 기존처럼 모든 요청에 Connection: close를 사용합니다.
+    - close_hosts(또는 HTTP_CLOSE_HOSTS)에 지정된 호스트만 요청마다 연결을 닫습니다.
+    """
     session = requests.Session()
-    headers = {
-        "Connection": "close",
-        "User-Agent": user_agent or "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    }
+    keep_alive = HTTP_KEEP_ALIVE if keep_alive is None else keep_alive
+    pool = max(1, pool_size or HTTP_POOL_SIZE)
+
+    headers = {"User-Agent": user_agent or DEFAULT_USER_AGENT}
+    if not keep_alive:
+        headers["Connection"] = "close"
     session.headers.update(headers)
 
     retries = Retry(
         total=3,
+        status=3 if status_retries else 0,
         backoff_factor=0.2,
-        status_forcelist=list(RETRY_STATUS_CODES),
+        status_forcelist=list(ADAPTER_RETRY_STATUS_CODES),
         raise_on_status=False
     )
-    session.mount("https://", HTTPAdapter(max_retries=retries))
-    session.mount("http://", HTTPAdapter(max_retries=retries))
+    adapter = HTTPAdapter(max_retries=retries, pool_connections=pool, pool_maxsize=pool, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    if keep_alive:
+        close_adapter = ConnectionCloseAdapter(max_retries=retries)
+        for host in (close_hosts if close_hosts is not None else HTTP_CLOSE_HOSTS):
+            session.mount(f"https://{host}", close_adapter)
+            session.mount(f"http://{host}", close_adapter)
     return session
 
 
+_SHARED_SESSIONS: Dict[str, requests.Session] = {}
+# 이름별 공용 세션 생성 설정 (연결 풀 크기, keep-alive)
+_SHARED_SESSION_CONFIGS: Dict[str, Tuple[int, bool]] = {}
+_SHARED_SESSIONS_LOCK = threading.Lock()
+
+
+def get_shared_http_session(
+    name: str = "default",
+    pool_size: Optional[int] = None,
+    keep_alive: Optional[bool] = None,
+) -> requests.Session:
+    """
+    이름별 프로세스 공용 세션을 반환합니다. 연결 풀(urllib3)은 스레드 안전하므로
+    여러 워커 스레드·모듈이 같은 세션을 공유해 TCP/TLS 핸드셰이크를 재사용합니다.
+    공용 세션(KIS·야후)의 상태 코드 재시도는 호출 측 BACKOFF가 담당하므로 어댑터는 연결 오류만 재시도합니다.
+    이미 만든 세션보다 큰 pool_size나 다른 keep_alive를 요청하면 (pool_block으로 워커가 막히지 않도록)
+    요청한 설정 중 큰 풀 크기로 세션을 다시 만들고 로그를 남깁니다. 기존 세션을 쥔 호출 측은 그대로 동작합니다.
+    """
+    pool = max(1, pool_size or HTTP_POOL_SIZE)
+    alive = HTTP_KEEP_ALIVE if keep_alive is None else keep_alive
+    with _SHARED_SESSIONS_LOCK:
+        session = _SHARED_SESSIONS.get(name)
+        if session is not None:
+            cur_pool, cur_alive = _SHARED_SESSION_CONFIGS[name]
+            if (pool_size is None or pool <= cur_pool) and (keep_alive is None or alive == cur_alive):
+                return session
+            pool = max(pool, cur_pool) if pool_size is not None else cur_pool
+            alive = alive if keep_alive is not None else cur_alive
+            print(
+                f"   ℹ️ 공용 HTTP 세션 '{name}' 재생성: 연결 풀 {cur_pool} → {pool}, "
+                f"keep-alive {'on' if cur_alive else 'off'} → {'on' if alive else 'off'}"
+            )
+        session = get_http_session(pool_size=pool, keep_alive=alive, status_retries=False)
+        _SHARED_SESSIONS[name] = session
+        _SHARED_SESSION_CONFIGS[name] = (pool, alive)
+        return session
+
+
 # ==============================================================================
 # 2. 환경 변수, DB ID 및 시간 처리 유틸리티
 # ==============================================================================
@@ -500,7 +778,7 @@ def search_foreign_ticker(name: str) -> Optional[Tuple[str, str]]:
         if cand and cand not in search_queries:
             search_queries.append(cand)
 
-    session = get_http_session()
+    session = get_yahoo_client().session
     url = "https://query2.finance.yahoo.com/v1/finance/search"
 
     try:
@@ -544,6 +822,231 @@ def search_foreign_ticker(name: str) -> Optional[Tuple[str, str]]:
         return None
 
 
+# ==============================================================================
+# 4-1. 야후 API 경량 클라이언트 (필요 모듈만 요청 + 스레드·스크립트 공용 cookie/crumb)
+# ==============================================================================
+YAHOO_COOKIE_URL = "https://fc.yahoo.com"
+YAHOO_CRUMB_URL = "https://query1.finance.yahoo.com/v1/test/getcrumb"
+YAHOO_QUOTE_SUMMARY_URL = "https://query2.finance.yahoo.com/v10/finance/quoteSummary/{symbol}"
+# 발급받은 cookie·crumb 보관 파일 (다음 실행·다른 동기화 스크립트가 재사용, 401 응답 시에만 재발급)
+YAHOO_SESSION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".yahoo_session.json")
+YAHOO_SESSION_ENABLED = os.environ.get("YAHOO_SESSION_CACHE", "on").lower() not in ("off", "false", "0")
+YAHOO_MAX_WORKERS = int(os.environ.get("YAHOO_MAX_WORKERS", "8"))
+# bind_yfinance가 crumb를 주입하는 yfinance YfData 비공개 속성 (requirements.txt의 yfinance 1.7.x 기준)
+YFINANCE_BIND_ATTRS = ("_cookie_lock", "_cookie_strategy", "_cookie", "_crumb")
+# 호출 측별 요청 모듈 (Ticker.info는 30여 개 모듈을 모두 받아오므로 필요한 것만 지정)
+YAHOO_FUNDAMENTAL_MODULES = ("defaultKeyStatistics", "summaryDetail", "calendarEvents")
+YAHOO_PROFILE_MODULES = ("price", "summaryProfile")
+YAHOO_NAME_MODULES = ("price",)
+
+
+def _yahoo_raw(value: Any) -> Any:
+    """quoteSummary 값({"raw": ..., "fmt": ...})에서 원시값을 꺼냅니다. 빈 객체는 None으로 봅니다."""
+    if isinstance(value, dict):
+        return value.get("raw") if value else None
+    return value
+
+
+def flatten_quote_summary(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    quoteSummary 모듈별 응답을 Ticker.info와 같은 평탄한 dict로 합칩니다.
+    - 앞선 모듈의 값이 우선하며, 값이 없는(None) 키만 뒤 모듈 값으로 채웁니다.
+    - calendarEvents의 실적 발표 예정일은 earningsTimestampStart로, price의 exchangeName은 fullExchangeName으로도 노출합니다.
+    """
+    info: Dict[str, Any] = {}
+    for module, body in result.items():
+        if not isinstance(body, dict):
+            continue
+        if module == "calendarEvents":
+            dates = (body.get("earnings") or {}).get("earningsDate") or []
+            if dates:
+                info.setdefault("earningsTimestampStart", _yahoo_raw(dates[0]))
+            continue
+        for key, value in body.items():
+            if isinstance(value, list) or (isinstance(value, dict) and "raw" not in value and value):
+                continue
+            if info.get(key) is None:
+                info[key] = _yahoo_raw(value)
+    if info.get("fullExchangeName") is None and info.get("exchangeName"):
+        info["fullExchangeName"] = info["exchangeName"]
+    return info
+
+
+class YahooClient:
+    """
+    야후 API(quoteSummary·quote 등)를 공용 cookie/crumb로 호출하는 경량 클라이언트입니다.
+    - cookie(fc.yahoo.com)·crumb는 프로세스당 한 번만 확보해 모든 워커 스레드와 yfinance(YfData)가 공유합니다.
+    - 확보한 cookie·crumb는 YAHOO_SESSION_FILE에 보관해 다음 실행·다른 스크립트가 그대로 재사용하며,
+      401(crumb 만료) 응답을 받았을 때만 새로 발급받습니다. 404(없는 종목)는 None을 반환합니다.
+    - 야후 전용 세션은 HTTP_KEEP_ALIVE 설정과 무관하게 keep-alive 연결 풀을 사용합니다.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None, path: str = YAHOO_SESSION_FILE):
+        self.session = session or get_shared_http_session("yahoo", pool_size=YAHOO_MAX_WORKERS, keep_alive=True)
+        self.path = path
+        self.calls = 0
+        self.crumb_fetches = 0
+        self.crumb_reused = False
+        self._crumb: Optional[str] = None
+        self._loaded = False
+        self._yf_bound: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _load_state(self) -> None:
+        """보관된 cookie·crumb를 세션에 복원합니다 (파일이 없거나 손상되면 새로 발급)."""
+        self._loaded = True
+        if not YAHOO_SESSION_ENABLED or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            crumb = str(state.get("crumb") or "")
+            cookies = state.get("cookies") or []
+            if not crumb or not cookies:
+                return
+            for c in cookies:
+                self.session.cookies.set(
+                    c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"), expires=c.get("expires")
+                )
+            self._crumb = crumb
+            self.crumb_reused = True
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+
+    def _save_state(self) -> None:
+        if not YAHOO_SESSION_ENABLED or not self._crumb:
+            return
+        cookies = [
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path, "expires": c.expires}
+            for c in self.session.cookies if "yahoo" in (c.domain or "")
+        ]
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"crumb": self._crumb, "cookies": cookies, "saved_at": time.time()}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            print(f"⚠️ 야후 세션 저장 실패: {exc}")
+
+    def _fetch_crumb(self) -> str:
+        try:
+            # fc.yahoo.com은 404를 돌려주지만 응답과 함께 세션에 인증 쿠키(A3)를 심어줌
+            self.session.get(YAHOO_COOKIE_URL, timeout=10, allow_redirects=True)
+        except requests.exceptions.RequestException:
+            pass
+        response = self.session.get(YAHOO_CRUMB_URL, timeout=10)
+        crumb = response.text.strip() if response.status_code == 200 else ""
+        if not crumb or "<" in crumb:
+            raise ValueError(f"야후 crumb 발급 실패 (HTTP {response.status_code})")
+        self.crumb_fetches += 1
+        return crumb
+
+    def get_crumb(self, stale: Optional[str] = None) -> str:
+        """
+        공용 crumb를 반환합니다. 최초 호출 시 보관 파일에서 복원하고, 없을 때만 발급받습니다.
+        stale을 넘기면(401 응답) 그 값이 아직 현재 crumb일 때만 새로 발급받아 보관합니다.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load_state()
+            if self._crumb is None or (stale is not None and self._crumb == stale):
+                if stale is not None:
+                    self.session.cookies.clear()
+                self._crumb = self._fetch_crumb()
+                self._save_state()
+            return self._crumb
+
+    def bind_yfinance(self) -> None:
+        """
+        yfinance 공용 YfData에 이 세션과 crumb를 주입해 yf.Ticker 호출이 별도 crumb 발급을 하지 않게 합니다.
+        YfData의 비공개 속성(YFINANCE_BIND_ATTRS)을 쓰므로 requirements.txt에 고정한 yfinance 버전 기준이며,
+        속성이 하나라도 없으면 주입을 건너뛰고 세션만 공유합니다. cookie는 세션에 실제 A3 쿠키가 있을 때만 넘깁니다.
+        """
+        crumb = self.get_crumb()
+        with self._lock:
+            if self._yf_bound == crumb:
+                return
+            self._yf_bound = crumb
+            try:
+                from yfinance.data import YfData
+                data = YfData(session=self.session)
+            except Exception as exc:
+                print(f"⚠️ yfinance 세션 공유 실패: {exc}")
+                return
+            missing = [attr for attr in YFINANCE_BIND_ATTRS if not hasattr(data, attr)]
+            if missing:
+                # yfinance 내부 구조가 바뀌었으면 세션만 공유하고 crumb 발급은 yfinance에 맡김
+                print(f"⚠️ yfinance 내부 구조 변경({', '.join(missing)} 없음): crumb 주입을 건너뛰고 세션만 공유합니다.")
+                return
+            a3_cookie = next((c for c in self.session.cookies if c.name == "A3" and "yahoo" in (c.domain or "")), None)
+            with data._cookie_lock:
+                data._cookie_strategy = "basic"
+                if a3_cookie is not None:
+                    data._cookie = a3_cookie
+                data._crumb = crumb
+
+    def get_json(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+        """crumb를 붙여 야후 API를 GET으로 호출하고 JSON을 반환합니다. 401이면 crumb를 한 번 갱신해 재시도하고, 404면 None을 반환합니다."""
+        crumb = self.get_crumb()
+        for attempt in (1, 2):
+            with self._lock:
+                self.calls += 1
+            query: Dict[str, Any] = dict(params or {})
+            query["crumb"] = crumb
+            response = self.session.get(url, params=query, timeout=timeout)
+            if response.status_code == 401 and attempt == 1:
+                crumb = self.get_crumb(stale=crumb)
+                continue
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return response.json()
+        return None
+
+    def quote_summary(self, symbol: str, modules: Iterable[str], timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+        """지정한 모듈만 담은 quoteSummary 결과(모듈명 -> 본문)를 반환합니다. 없는 종목이면 None을 반환합니다."""
+        url = YAHOO_QUOTE_SUMMARY_URL.format(symbol=quote(symbol.strip().upper(), safe=""))
+        params = {"modules": ",".join(modules), "formatted": "false", "corsDomain": "finance.yahoo.com"}
+        data = self.get_json(url, params=params, timeout=timeout)
+        results = ((data or {}).get("quoteSummary") or {}).get("result") or []
+        return results[0] if results else None
+
+    def get_info(self, symbol: str, modules: Iterable[str]) -> Dict[str, Any]:
+        """Ticker.info와 같은 키를 가진 평탄한 dict를 반환합니다 (요청한 모듈에 속한 키만 채워짐)."""
+        result = self.quote_summary(symbol, modules)
+        return flatten_quote_summary(result) if result else {}
+
+    def summary(self) -> str:
+        crumb_state = "보관 crumb 재사용" if self.crumb_reused and not self.crumb_fetches else f"crumb 발급 {self.crumb_fetches}회"
+        return f"야후 API: 호출 {self.calls}건 ({crumb_state})"
+
+
+_YAHOO_CLIENT: Optional[YahooClient] = None
+_YAHOO_CLIENT_LOCK = threading.Lock()
+
+
+def get_yahoo_client() -> YahooClient:
+    """프로세스 공용 YahooClient를 반환합니다 (cookie·crumb·연결 풀을 모든 스레드가 공유)."""
+    global _YAHOO_CLIENT
+    with _YAHOO_CLIENT_LOCK:
+        if _YAHOO_CLIENT is None:
+            _YAHOO_CLIENT = YahooClient()
+        return _YAHOO_CLIENT
+
+
+def get_yahoo_session() -> requests.Session:
+    """
+    yf.Ticker(..., session=...)에 넘길 야후 공용 세션을 반환합니다.
+    보관·공유 중인 crumb를 yfinance에 미리 주입하므로 스레드·스크립트마다 cookie/crumb 왕복이 반복되지 않습니다.
+    """
+    client = get_yahoo_client()
+    try:
+        client.bind_yfinance()
+    except (requests.exceptions.RequestException, ValueError) as exc:
+        print(f"⚠️ 야후 crumb 확보 실패 (yfinance 자체 발급으로 진행): {exc}")
+    return client.session
+
+
 # ==============================================================================
 # 5. 노션 API 클라이언트 및 데이터베이스 연동
 # ==============================================================================
@@ -556,6 +1059,20 @@ def build_notion_client(auth_token: str, use_httpx: bool = False, timeout: float
     return Client(auth=auth_token)
 
 
+def build_async_notion_client(auth_token: str, timeout: float = 60.0) -> AsyncClient:
+    """httpx.AsyncClient 기반 notion_client AsyncClient 인스턴스를 생성합니다."""
+    import httpx
+    httpx_client: Any = httpx.AsyncClient(timeout=timeout)
+    return AsyncClient(auth=auth_token, client=httpx_client)
+
+
+def _get_client_auth(client: Any) -> Optional[str]:
+    """동기 notion_client Client에 설정된 인증 토큰을 추출합니다 (비동기 쓰기 경로 재사용용)."""
+    options = getattr(client, "options", None)
+    auth = getattr(options, "auth", None)
+    return str(auth) if auth else None
+
+
 def _format_notion_error(error: Exception) -> str:
     """노션 API 오류 발생 시 상태 코드 및 메시지를 포맷팅합니다."""
     if isinstance(error, HTTPResponseError):
@@ -566,6 +1083,64 @@ def _format_notion_error(error: Exception) -> str:
     return str(error)
 
 
+# 노션이 요청을 반영하지 않고 거절했음이 확실한 응답 (409 트랜잭션 충돌, 429 속도 제한, 503 일시 중단).
+# 타임아웃·연결 끊김·502/504는 서버에서 이미 반영됐을 수 있어 비멱등 쓰기(페이지 생성·블록 추가)는 재시도하지 않음
+NOTION_NOT_APPLIED_STATUS_CODES = {409, 429, 503}
+
+
+def _notion_retry_delay(
+    error: Exception,
+    attempt: int,
+    max_retries: int,
+    retry_delay: float,
+    idempotent: bool = True,
+) -> Optional[float]:
+    """
+    재시도 대상 오류이면 공용 BACKOFF에서 대기 시간을 받아 반환하고, 재시도 불가(또는 예산 소진)면 None을 반환합니다.
+    idempotent=False(페이지 생성·블록 추가)면 NOTION_NOT_APPLIED_STATUS_CODES 응답만 재시도합니다.
+    """
+    if attempt >= max_retries:
+        return None
+    if isinstance(error, HTTPResponseError):
+        status = getattr(error, "status", None)
+        allowed = RETRY_STATUS_CODES if idempotent else NOTION_NOT_APPLIED_STATUS_CODES
+        if status not in allowed:
+            return None
+        return BACKOFF.next_delay("notion", attempt, retry_delay, status, getattr(error, "headers", None))
+    if not idempotent:
+        return None
+    return BACKOFF.next_delay("notion", attempt, retry_delay)
+
+
+DATABASE_INFO_TTL_SEC = float(os.environ.get("NOTION_DATABASE_INFO_TTL_SEC", "3600"))
+_DATABASE_INFO_CACHE: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_DATABASE_INFO_CACHE_LOCK = threading.Lock()
+
+
+def retrieve_database_cached(client: Any, database_id: str) -> Dict[str, Any]:
+    """
+    databases.retrieve 결과를 database_id별로 TTL(기본 1시간) 동안 프로세스 내에 캐시합니다.
+    data_source ID 해석과 스키마(속성 ID) 조회가 이 결과를 공유하므로 DB당 1회만 조회됩니다.
+    """
+    now = time.monotonic()
+    with _DATABASE_INFO_CACHE_LOCK:
+        cached = _DATABASE_INFO_CACHE.get(database_id)
+        if cached and now - cached[0] < DATABASE_INFO_TTL_SEC:
+            return cached[1]
+
+    BACKOFF.wait("notion")
+    db_info = cast(Dict[str, Any], client.databases.retrieve(database_id=database_id))
+    with _DATABASE_INFO_CACHE_LOCK:
+        _DATABASE_INFO_CACHE[database_id] = (time.monotonic(), db_info)
+    return db_info
+
+
+def resolve_data_source_id(client: Any, database_id: str) -> str:
+    """신규 API(data_sources)용 첫 번째 data source ID를 캐시에서 해석합니다. 없으면 database_id를 그대로 반환합니다."""
+    data_sources = retrieve_database_cached(client, database_id).get("data_sources", [])
+    return str(data_sources[0]["id"]) if data_sources else database_id
+
+
 def safe_databases_query(
     client: Any,
     database_id: str,
@@ -573,53 +1148,78 @@ def safe_databases_query(
     page_size: int = DEFAULT_PAGE_SIZE,
     max_retries: int = 3,
     retry_delay: float = 2.0,
+    query_filter: Optional[Dict[str, Any]] = None,
+    sorts: Optional[List[Dict[str, Any]]] = None,
+    filter_properties: Optional[List[str]] = None,
 ) -> Dict[str, Any]:
-    """재시도(Retry) 로직이 포함된 안전한 노션 데이터베이스 쿼리 함수"""
+    """
+    재시도(Retry) 로직이 포함된 안전한 노션 데이터베이스 쿼리 함수 (query_filter/sorts는 노션 API 형식 그대로 전달)
+    filter_properties(속성 ID 목록)를 주면 응답 페이지에 해당 속성만 포함됩니다.
+    """
     attempt = 1
     while True:
         try:
-            params = {"database_id": database_id, "page_size": page_size}
+            BACKOFF.wait("notion")
+            params: Dict[str, Any] = {"database_id": database_id, "page_size": page_size}
             if start_cursor:
                 params["start_cursor"] = start_cursor
+            if query_filter:
+                params["filter"] = query_filter
+            if sorts:
+                params["sorts"] = sorts
+            if filter_properties:
+                params["filter_properties"] = filter_properties
             if hasattr(client, "databases") and hasattr(client.databases, "query"):
                 return cast(Dict[str, Any], client.databases.query(**params))
             elif hasattr(client, "data_sources") and hasattr(client.data_sources, "query"):
-                db_info = client.databases.retrieve(database_id=database_id)
-                data_sources = db_info.get("data_sources", [])
-                ds_id = data_sources[0]["id"] if data_sources else database_id
-                ds_params = {"data_source_id": ds_id, "page_size": page_size}
+                ds_id = resolve_data_source_id(client, database_id)
+                ds_params: Dict[str, Any] = {"data_source_id": ds_id, "page_size": page_size}
                 if start_cursor:
                     ds_params["start_cursor"] = start_cursor
+                if query_filter:
+                    ds_params["filter"] = query_filter
+                if sorts:
+                    ds_params["sorts"] = sorts
+                if filter_properties:
+                    ds_params["filter_properties"] = filter_properties
                 return cast(Dict[str, Any], client.data_sources.query(**ds_params))
             else:
                 return cast(Dict[str, Any], client.databases.query(**params))
         except HTTPResponseError as error:
             status = getattr(error, "status", None)
-            if status in RETRY_STATUS_CODES and attempt < max_retries:
-                print(f"   ⚠️ Notion query retry {attempt}/{max_retries} - status={status}: {error}")
-                time.sleep(retry_delay * attempt)
+            delay = _notion_retry_delay(error, attempt, max_retries, retry_delay)
+            if delay is not None:
+                print(f"   ⚠️ Notion query retry {attempt}/{max_retries} - status={status}: {error} ({delay:.1f}초 대기)")
+                time.sleep(delay)
                 attempt += 1
                 continue
             raise
         except Exception as error:
-            if attempt < max_retries:
-                print(f"   ⚠️ Notion query retry {attempt}/{max_retries}: {error}")
-                time.sleep(retry_delay * attempt)
+            delay = _notion_retry_delay(error, attempt, max_retries, retry_delay)
+            if delay is not None:
+                print(f"   ⚠️ Notion query retry {attempt}/{max_retries}: {error} ({delay:.1f}초 대기)")
+                time.sleep(delay)
                 attempt += 1
                 continue
             raise
 
 
-def paginate_database(
+def _iter_database_pages(
     client: Any,
     database_id: str,
     page_size: int = DEFAULT_PAGE_SIZE,
     retry_delay: float = 0.05,
+    query_filter: Optional[Dict[str, Any]] = None,
+    sorts: Optional[List[Dict[str, Any]]] = None,
+    filter_properties: Optional[List[str]] = None,
 ) -> Iterable[Dict[str, Any]]:
-    """노션 데이터베이스 전체 페이지를 고속으로 페이지네이션하며 하나씩 yield하는 Generator"""
+    """필터 폴백 없이 쿼리 결과를 그대로 페이지네이션하는 내부 Generator"""
     start_cursor = None
     while True:
-        response = safe_databases_query(client, database_id, start_cursor=start_cursor, page_size=page_size)
+        response = safe_databases_query(
+            client, database_id, start_cursor=start_cursor, page_size=page_size,
+            query_filter=query_filter, sorts=sorts, filter_properties=filter_properties
+        )
         for page in response.get("results", []):
             yield page
         if not response.get("has_more"):
@@ -629,6 +1229,119 @@ def paginate_database(
             time.sleep(retry_delay)
 
 
+def _with_filter_fallback(
+    make_iter: Any,
+    query_filter: Optional[Dict[str, Any]],
+) -> Iterable[Dict[str, Any]]:
+    """
+    필터 쿼리가 첫 페이지를 받기 전에 400(validation_error)으로 거부되면
+    (속성명 변경·타입 불일치 등 스키마 차이) 필터 없이 전체 스캔으로 한 번 재시도합니다.
+    """
+    yielded = False
+    try:
+        for page in make_iter(query_filter):
+            yielded = True
+            yield page
+        return
+    except HTTPResponseError as error:
+        if yielded or not query_filter or getattr(error, "status", None) != 400:
+            raise
+        print(f"   ⚠️ 노션 필터 쿼리가 거부되어 전체 스캔으로 폴백합니다: {_format_notion_error(error)}")
+    yield from make_iter(None)
+
+
+def paginate_database(
+    client: Any,
+    database_id: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    retry_delay: float = 0.05,
+    query_filter: Optional[Dict[str, Any]] = None,
+    sorts: Optional[List[Dict[str, Any]]] = None,
+    properties: Optional[List[str]] = None,
+) -> Iterable[Dict[str, Any]]:
+    """
+    노션 데이터베이스 전체 페이지를 고속으로 페이지네이션하며 하나씩 yield하는 Generator.
+    query_filter/sorts를 주면 서버 측에서 행을 걸러 필요한 페이지만 수신합니다 (build_market_filter 참고).
+    properties(속성명 목록)를 주면 해당 속성만 담긴 페이지를 수신합니다 (스키마에 없는 이름은 무시).
+    """
+    filter_properties = resolve_property_ids(client, database_id, properties) if properties else None
+    yield from _with_filter_fallback(
+        lambda flt: _iter_database_pages(
+            client, database_id, page_size=page_size, retry_delay=retry_delay,
+            query_filter=flt, sorts=sorts, filter_properties=filter_properties
+        ),
+        query_filter,
+    )
+
+
+_PROPERTY_ID_CACHE: Dict[str, Dict[str, str]] = {}
+_PROPERTY_ID_CACHE_LOCK = threading.Lock()
+
+
+def get_database_property_ids(client: Any, database_id: str) -> Dict[str, str]:
+    """DB(또는 첫 번째 data source) 스키마를 조회하여 {속성명: 속성 ID} 매핑을 반환합니다. 프로세스 내에서 1회만 조회합니다."""
+    with _PROPERTY_ID_CACHE_LOCK:
+        if database_id in _PROPERTY_ID_CACHE:
+            return _PROPERTY_ID_CACHE[database_id]
+
+    mapping: Dict[str, str] = {}
+    try:
+        db_info = retrieve_database_cached(client, database_id)
+        schema = db_info.get("properties") or {}
+        data_sources = db_info.get("data_sources", [])
+        if not schema and data_sources and hasattr(client, "data_sources"):
+            ds_info = client.data_sources.retrieve(data_source_id=data_sources[0]["id"])
+            schema = ds_info.get("properties") or {}
+        mapping = {name: prop["id"] for name, prop in schema.items() if isinstance(prop, dict) and prop.get("id")}
+    except Exception as exc:
+        print(f"   ⚠️ 노션 DB 스키마 조회 실패 (속성 축약 없이 진행): {exc}")
+
+    with _PROPERTY_ID_CACHE_LOCK:
+        _PROPERTY_ID_CACHE[database_id] = mapping
+    return mapping
+
+
+def resolve_property_ids(client: Any, database_id: str, names: Iterable[str]) -> Optional[List[str]]:
+    """속성명 목록을 filter_properties용 속성 ID 목록으로 변환합니다. 매칭되는 속성이 없으면 None(축약 없음)을 반환합니다."""
+    mapping = get_database_property_ids(client, database_id)
+    ids: List[str] = []
+    for name in names:
+        prop_id = mapping.get(name)
+        if prop_id and prop_id not in ids:
+            ids.append(prop_id)
+    return ids or None
+
+
+KR_MARKET_VALUES = ("KOSPI", "KOSDAQ", "ETF(KR)")
+
+
+def build_market_filter(
+    market: str,
+    market_property: str = "Market",
+    ticker_property: str = "티커",
+) -> Dict[str, Any]:
+    """
+    국내/해외 스크립트가 처리할 행만 서버에서 거르는 노션 필터를 생성합니다.
+    최종 판별은 각 스크립트의 is_kr_ticker가 그대로 수행하므로, 필터는 누락 없이 넉넉하게(보수적으로) 구성합니다.
+    - "KR": Market이 국내 시장값이거나 비어 있거나, 티커가 숫자로 시작하는 행 (OR)
+    - "US": Market이 국내 시장값이 아닌 행 (빈 값 포함, AND)
+    """
+    if market.upper() == "KR":
+        conditions: List[Dict[str, Any]] = [
+            {"property": market_property, "select": {"equals": value}} for value in KR_MARKET_VALUES
+        ]
+        conditions.append({"property": market_property, "select": {"is_empty": True}})
+        conditions.extend(
+            {"property": ticker_property, "title": {"starts_with": str(digit)}} for digit in range(10)
+        )
+        return {"or": conditions}
+    return {
+        "and": [
+            {"property": market_property, "select": {"does_not_equal": value}} for value in KR_MARKET_VALUES
+        ]
+    }
+
+
 def safe_page_update(
     client: Any,
     page_id: str,
@@ -643,27 +1356,36 @@ def safe_page_update(
     attempt = 1
     while True:
         try:
+            BACKOFF.wait("notion")
+            NOTION_WRITE_BUCKET.acquire()
             _ = cast(Any, client.pages.update(page_id=page_id, properties=properties))
             return True
         except HTTPResponseError as error:
             status = getattr(error, "status", None)
-            if status in RETRY_STATUS_CODES and attempt < max_retries:
-                print(f"   ⚠️ Notion update retry {attempt}/{max_retries} - status={status}: {error}")
-                time.sleep(retry_delay * attempt)
+            delay = _notion_retry_delay(error, attempt, max_retries, retry_delay)
+            if delay is not None:
+                print(f"   ⚠️ Notion update retry {attempt}/{max_retries} - status={status}: {error} ({delay:.1f}초 대기)")
+                time.sleep(delay)
                 attempt += 1
                 continue
             print(f"   ❌ Notion update failed: {_format_notion_error(error)}")
+            forget_snapshot_page(page_id, error)
             return False
         except Exception as error:
-            if attempt < max_retries:
-                print(f"   ⚠️ Notion update retry {attempt}/{max_retries}: {error}")
-                time.sleep(retry_delay * attempt)
+            delay = _notion_retry_delay(error, attempt, max_retries, retry_delay)
+            if delay is not None:
+                print(f"   ⚠️ Notion update retry {attempt}/{max_retries}: {error} ({delay:.1f}초 대기)")
+                time.sleep(delay)
                 attempt += 1
                 continue
             print(f"   ❌ Notion update failed: {error}")
             return False
 
 
+# 노션 properties dict 또는 PageRecord (PageRecord는 아래 5-1절에서 정의되므로 전방 참조)
+PropsLike = Union[Dict[str, Any], "PageRecord"]
+
+
 def get_page_text(props: Dict[str, Any], names: List[str]) -> str:
     """노션 페이지의 title 또는 rich_text 속성에서 첫 번째로 발견된 문자열 텍스트를 추출합니다."""
     for name in names:
@@ -679,7 +1401,7 @@ def get_page_text(props: Dict[str, Any], names: List[str]) -> str:
 
 def set_page_date_property(
     props_to_update: Dict[str, Any],
-    existing_page_props: Dict[str, Any],
+    existing_page_props: PropsLike,
     candidate_names: Optional[List[str]] = None,
     iso_date_str: Optional[str] = None,
 ) -> str:
@@ -689,7 +1411,7 @@ def set_page_date_property(
     매칭된 속성명을 반환합니다.
     """
     if candidate_names is None:
-        candidate_names = ["마지막 업데이트", "업데이트 일자", "업데이트", "최종수정일", "수정일", "일자"]
+        candidate_names = UPDATE_DATE_CANDIDATES
     
     date_val = iso_date_str or kst_isoformat()
     
@@ -730,9 +1452,82 @@ def extract_prop_raw_value(prop: Dict[str, Any]) -> Any:
     elif p_type == "date":
         d = prop.get("date")
         return d.get("start") if d else None
+    elif p_type == "checkbox":
+        return bool(prop.get("checkbox", False))
+    elif p_type == "relation":
+        return sorted(_normalize_page_id(r.get("id", "")) for r in prop.get("relation", []) or [] if r.get("id"))
+    elif p_type == "multi_select":
+        return sorted(str(o.get("name", "")).strip() for o in prop.get("multi_select", []) or [] if o.get("name"))
     return None
 
 
+def _normalize_page_id(page_id: str) -> str:
+    """노션 페이지 ID를 하이픈 없는 소문자 형태로 정규화합니다 (relation 비교용)."""
+    return str(page_id).replace("-", "").strip().lower()
+
+
+class PageRecord:
+    """
+    노션 페이지 원본 JSON 대신 보관하는 경량 레코드입니다 (__slots__).
+    페이지 ID, last_edited_time과 속성별 (타입, 원시값)만 유지하므로 전체 스캔 결과를 메모리에 들고 있어도 부담이 적습니다.
+    build_dirty_payload / set_page_date_property는 속성 dict 대신 PageRecord를 그대로 받을 수 있습니다.
+    """
+
+    __slots__ = ("id", "last_edited_time", "types", "values")
+
+    def __init__(self, page_id: str, last_edited_time: Optional[str], types: Dict[str, str], values: Dict[str, Any]):
+        self.id = page_id
+        self.last_edited_time = last_edited_time
+        self.types = types
+        self.values = values
+
+    @classmethod
+    def from_page(cls, page: Dict[str, Any], names: Optional[Iterable[str]] = None) -> "PageRecord":
+        """노션 페이지 dict에서 필요한 속성(names, 미지정 시 전체)의 원시값만 추출해 레코드를 만듭니다."""
+        props = page.get("properties", {}) or {}
+        keys = props.keys() if names is None else [n for n in names if n in props]
+        types: Dict[str, str] = {}
+        values: Dict[str, Any] = {}
+        for name in keys:
+            prop = props[name]
+            types[name] = prop.get("type", "") if isinstance(prop, dict) else ""
+            values[name] = extract_prop_raw_value(prop)
+        return cls(page.get("id", ""), page.get("last_edited_time"), types, values)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.types
+
+    def raw(self, name: str) -> Any:
+        """속성의 원시값을 반환합니다 (extract_prop_raw_value 결과와 동일)."""
+        return self.values.get(name)
+
+    def type_of(self, name: str, default: str = "") -> str:
+        """속성의 노션 타입(number/select/rich_text/...)을 반환합니다."""
+        return self.types.get(name) or default
+
+    def text(self, names: List[str]) -> str:
+        """get_page_text와 동일하게 names 순서대로 첫 번째로 비어 있지 않은 문자열 값을 반환합니다."""
+        for name in names:
+            val = self.values.get(name)
+            if isinstance(val, str) and val.strip():
+                return val.strip()
+        return ""
+
+
+def _prop_raw(existing: PropsLike, field: str) -> Any:
+    """속성 dict 또는 PageRecord에서 원시값을 꺼냅니다."""
+    if isinstance(existing, PageRecord):
+        return existing.raw(field)
+    return extract_prop_raw_value(existing[field])
+
+
+def _prop_type(existing: PropsLike, field: str, default: str = "") -> str:
+    """속성 dict 또는 PageRecord에서 속성 타입을 꺼냅니다."""
+    if isinstance(existing, PageRecord):
+        return existing.type_of(field, default)
+    return existing[field].get("type", default)
+
+
 def is_value_different(old_val: Any, new_val: Any, tolerance: float = 1e-4) -> bool:
     """기존 값과 신규 값의 실질적 차이 여부를 판별합니다 (부동소수점 오차 감안)."""
     if old_val is None and new_val is None:
@@ -743,23 +1538,35 @@ def is_value_different(old_val: Any, new_val: Any, tolerance: float = 1e-4) -> b
     # 숫자형 비교
     if isinstance(old_val, (int, float)) and isinstance(new_val, (int, float)):
         return abs(float(old_val) - float(new_val)) > tolerance
+
+    # 목록형(relation / multi_select) 비교: 순서 무관
+    if isinstance(old_val, (list, tuple)) or isinstance(new_val, (list, tuple)):
+        old_list = old_val if isinstance(old_val, (list, tuple)) else [old_val]
+        new_list = new_val if isinstance(new_val, (list, tuple)) else [new_val]
+        return sorted(str(v).strip() for v in old_list) != sorted(str(v).strip() for v in new_list)
         
     return str(old_val).strip() != str(new_val).strip()
 
 
 def build_dirty_payload(
-    existing_props: Dict[str, Any],
+    existing_props: PropsLike,
     candidate_data: Dict[str, Any],
     num_fields: Optional[List[str]] = None,
     select_fields: Optional[List[str]] = None,
     date_candidate_names: Optional[List[str]] = None,
     diagnostic_color_fn: Optional[Any] = None,
     iso_date_str: Optional[str] = None,
+    text_fields: Optional[List[str]] = None,
+    relation_fields: Optional[List[str]] = None,
+    multi_select_fields: Optional[List[str]] = None,
 ) -> Optional[Dict[str, Any]]:
     """
     [Smart Dirty Checking 엔진]
     기존 노션 속성과 신규 수집 데이터를 대조하여, '실질적으로 변경된 속성'만 추출합니다.
     변경된 항목이 전혀 없는 경우 None을 반환하여 불필요한 Notion API I/O를 100% Skip합니다.
+    - text_fields: 문자열 (title/rich_text, 빈 문자열이면 비움)
+    - relation_fields: 연결할 페이지 ID 목록 (빈 목록이면 연결 해제)
+    - multi_select_fields: 옵션 이름 목록
     """
     if num_fields is None:
         num_fields = []
@@ -777,7 +1584,7 @@ def build_dirty_payload(
         if new_val is None:
             continue
             
-        old_val = extract_prop_raw_value(existing_props[field])
+        old_val = _prop_raw(existing_props, field)
         if is_value_different(old_val, new_val):
             dirty_props[field] = {"number": new_val}
             has_meaningful_change = True
@@ -790,9 +1597,9 @@ def build_dirty_payload(
         if not new_val:
             continue
 
-        old_val = extract_prop_raw_value(existing_props[field])
+        old_val = _prop_raw(existing_props, field)
         if is_value_different(old_val, new_val):
-            p_type = existing_props[field].get("type", "select")
+            p_type = _prop_type(existing_props, field, "select")
             if p_type == "status":
                 dirty_props[field] = {"status": {"name": str(new_val)}}
             elif p_type == "rich_text":
@@ -810,11 +1617,54 @@ def build_dirty_payload(
                 dirty_props[field] = {"select": {"name": str(new_val)}}
             has_meaningful_change = True
 
-    # 3. 실질 데이터 변경이 없을 경우 API 호출 차단 (Skip)
+    # 3. 텍스트(Title / RichText) 검사 및 변경 감지
+    for field in text_fields or []:
+        if field not in existing_props:
+            continue
+        new_val = candidate_data.get(field)
+        if new_val is None:
+            continue
+
+        new_text = str(new_val).strip()
+        old_val = _prop_raw(existing_props, field) or ""
+        if is_value_different(old_val, new_text):
+            p_type = "title" if _prop_type(existing_props, field) == "title" else "rich_text"
+            dirty_props[field] = {p_type: [{"text": {"content": new_text}}] if new_text else []}
+            has_meaningful_change = True
+
+    # 4. 관계형(Relation) 검사 및 변경 감지 (순서 무관 ID 집합 비교)
+    for field in relation_fields or []:
+        if field not in existing_props:
+            continue
+        new_val = candidate_data.get(field)
+        if new_val is None:
+            continue
+
+        new_ids = [str(v) for v in (new_val if isinstance(new_val, (list, tuple)) else [new_val]) if v]
+        old_ids = _prop_raw(existing_props, field) or []
+        if is_value_different(old_ids, sorted(_normalize_page_id(v) for v in new_ids)):
+            dirty_props[field] = {"relation": [{"id": v} for v in new_ids]}
+            has_meaningful_change = True
+
+    # 5. 다중 선택(Multi-select) 검사 및 변경 감지
+    for field in multi_select_fields or []:
+        if field not in existing_props:
+            continue
+        new_val = candidate_data.get(field)
+        if new_val is None:
+            continue
+
+        new_names = [str(v).strip() for v in (new_val if isinstance(new_val, (list, tuple)) else [new_val]) if str(v).strip()]
+        old_names = _prop_raw(existing_props, field) or []
+        if is_value_different(old_names, new_names):
+            dirty_props[field] = {"multi_select": [{"name": v} for v in new_names]}
+            has_meaningful_change = True
+
+    # 6. 실질 데이터 변경이 없을 경우 API 호출 차단 (Skip)
     if not has_meaningful_change:
         return None
 
-    # 4. 실질 데이터 변경이 확인된 경우에만 날짜 속성 주입
+    # 7. 실질 데이터 변경이 확인된 경우에만 날짜 속성 주입
     set_page_date_property(
         dirty_props,
         existing_props,
@@ -825,10 +1675,352 @@ def build_dirty_payload(
     return dirty_props
 
 
+# ==============================================================================
+# 5-2. 노션 DB 로컬 스냅샷 저장소 (last_edited_time 하이워터마크 증분 동기화)
+# ==============================================================================
+SNAPSHOT_DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".notion_snapshot.sqlite3")
+SNAPSHOT_FULL_REFRESH_HOURS = float(os.environ.get("NOTION_SNAPSHOT_FULL_REFRESH_HOURS", "24"))
+SNAPSHOT_SAFETY_MARGIN_SEC = 120
+
+
+class NotionSnapshotStore:
+    """
+    데이터베이스별 마지막으로 확인한 페이지 JSON을 SQLite 파일에 보관하는 로컬 스냅샷 저장소입니다.
+    - 증분 갱신: 직전 스캔 시작 시각(하이워터마크) 이후 수정된 페이지만 last_edited_time 필터로 수신
+    - 전체 갱신: 스냅샷이 없거나 NOTION_SNAPSHOT_FULL_REFRESH_HOURS(기본 24시간)가 지나면 전량 재수신
+    - 휴지통(in_trash)·아카이브 페이지 제거: 증분 응답에 archived/in_trash 표시가 실려 온 페이지는 그 자리에서 삭제하고,
+      쿼리 결과에서 빠져 응답에 실리지 않은 페이지는 쓰기가 '아카이브됨(400)·없음(404)'으로 거부될 때
+      forget_page로 모든 스냅샷에서 삭제합니다 (safe_page_update / async_safe_page_update)
+    한계:
+    - 동기화 스크립트 자신의 쓰기도 last_edited_time을 갱신하므로, 직전 실행에서 값을 바꾼 페이지는 다음 증분 갱신에서
+      다시 수신됩니다. 증분 이득은 쓰기가 드문 마스터·벤치마크 DB에서 크고, 매 실행 대부분을 갱신하는 가격 DB에서는 작습니다.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " snapshot_key TEXT NOT NULL,"
+                " page_id TEXT NOT NULL,"
+                " last_edited_time TEXT,"
+                " page_json TEXT NOT NULL,"
+                " PRIMARY KEY (snapshot_key, page_id))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state ("
+                " snapshot_key TEXT PRIMARY KEY,"
+                " high_water_mark TEXT NOT NULL,"
+                " full_synced_at REAL NOT NULL)"
+            )
+
+    def _get_state(self, snapshot_key: str) -> Optional[Tuple[str, float]]:
+        """저장된 하이워터마크와 마지막 전체 갱신 시각을 반환합니다."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT high_water_mark, full_synced_at FROM sync_state WHERE snapshot_key = ?",
+                (snapshot_key,),
+            ).fetchone()
+        return (str(row[0]), float(row[1])) if row else None
+
+    def refresh(
+        self,
+        client: Any,
+        database_id: str,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        retry_delay: float = 0.05,
+        query_filter: Optional[Dict[str, Any]] = None,
+        properties: Optional[List[str]] = None,
+    ) -> Tuple[int, int, bool]:
+        """
+        노션에서 변경분(또는 전량)을 받아 스냅샷을 갱신합니다.
+        query_filter가 있으면 필터별로 별도 스냅샷을 유지하며, 증분 쿼리는 last_edited_time 조건과 AND로 결합합니다.
+        (필터 조건에서 벗어난 페이지는 다음 전체 갱신까지 남아 있을 수 있으므로 호출 측의 최종 판별은 유지해야 합니다)
+        properties를 주면 해당 속성만 수신·보관하는 축약 스냅샷을 별도 키로 유지합니다.
+        Returns:
+            (수신 페이지 수, 갱신 후 로컬 보관 페이지 수, 전체 갱신 여부)
+        """
+        snapshot_key = self.snapshot_key(database_id, query_filter, properties)
+        filter_properties = resolve_property_ids(client, database_id, properties) if properties else None
+        state = self._get_state(snapshot_key)
+        now_ts = time.time()
+        full = state is None or (now_ts - state[1]) > SNAPSHOT_FULL_REFRESH_HOURS * 3600
+
+        # 스캔 도중 수정된 페이지를 놓치지 않도록 '스캔 시작 시각 - 안전 여유'를 다음 하이워터마크로 사용
+        scan_started = datetime.now(timezone.utc) - timedelta(seconds=SNAPSHOT_SAFETY_MARGIN_SEC)
+        next_hwm = scan_started.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+        refresh_filter = query_filter
+        if not full and state is not None:
+            refresh_filter = _and_filters(
+                {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": state[0]}}, query_filter
+            )
+
+        fetched = 0
+        with self._lock, self._conn:
+            if full:
+                self._conn.execute("DELETE FROM pages WHERE snapshot_key = ?", (snapshot_key,))
+
+            for page in _iter_database_pages(
+                client, database_id, page_size=page_size, retry_delay=retry_delay,
+                query_filter=refresh_filter, filter_properties=filter_properties
+            ):
+                fetched += 1
+                pid = page.get("id")
+                if not pid:
+                    continue
+                if page.get("archived") or page.get("in_trash"):
+                    self._conn.execute(
+                        "DELETE FROM pages WHERE snapshot_key = ? AND page_id = ?", (snapshot_key, pid)
+                    )
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pages (snapshot_key, page_id, last_edited_time, page_json) VALUES (?, ?, ?, ?)",
+                    (snapshot_key, pid, page.get("last_edited_time"), json.dumps(page, ensure_ascii=False)),
+                )
+
+            full_synced_at = now_ts if full or state is None else state[1]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (snapshot_key, high_water_mark, full_synced_at) VALUES (?, ?, ?)",
+                (snapshot_key, next_hwm, full_synced_at),
+            )
+            total = self._conn.execute(
+                "SELECT COUNT(*) FROM pages WHERE snapshot_key = ?", (snapshot_key,)
+            ).fetchone()[0]
+
+        return fetched, int(total), full
+
+    def forget_page(self, page_id: str) -> int:
+        """휴지통·아카이브로 이동한 페이지를 모든 스냅샷 키에서 삭제하고 삭제한 행 수를 반환합니다."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM pages WHERE REPLACE(LOWER(page_id), '-', '') = ?", (_normalize_page_id(page_id),)
+            )
+        return cursor.rowcount
+
+    @staticmethod
+    def snapshot_key(
+        database_id: str,
+        query_filter: Optional[Dict[str, Any]] = None,
+        properties: Optional[List[str]] = None,
+    ) -> str:
+        """DB ID와 필터·속성 목록 서명(정렬된 JSON의 SHA-1 앞 12자리)으로 스냅샷 키를 만듭니다."""
+        if not query_filter and not properties:
+            return database_id
+        scope: Any = query_filter if not properties else {"filter": query_filter, "properties": sorted(set(properties))}
+        signature = hashlib.sha1(json.dumps(scope, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+        return f"{database_id}#{signature}"
+
+    def iter_pages(self, snapshot_key: str, chunk_size: int = 500) -> Iterable[Dict[str, Any]]:
+        """로컬 스냅샷에 보관된 페이지를 하나씩 역직렬화하여 yield합니다."""
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, page_json FROM pages WHERE snapshot_key = ? AND rowid > ? ORDER BY rowid LIMIT ?",
+                    (snapshot_key, last_rowid, chunk_size),
+                ).fetchall()
+            if not rows:
+                break
+            for rowid, page_json in rows:
+                last_rowid = rowid
+                yield json.loads(page_json)
+
+
+_SNAPSHOT_STORE: Optional[NotionSnapshotStore] = None
+_SNAPSHOT_STORE_LOCK = threading.Lock()
+
+
+def get_snapshot_store() -> Optional[NotionSnapshotStore]:
+    """프로세스 공용 스냅샷 저장소를 반환합니다. NOTION_SNAPSHOT=off 이거나 파일을 열 수 없으면 None을 반환합니다."""
+    global _SNAPSHOT_STORE
+    if os.environ.get("NOTION_SNAPSHOT", "").lower() in ("off", "false", "0"):
+        return None
+    with _SNAPSHOT_STORE_LOCK:
+        if _SNAPSHOT_STORE is None:
+            try:
+                _SNAPSHOT_STORE = NotionSnapshotStore()
+            except sqlite3.Error as exc:
+                print(f"   ⚠️ 노션 스냅샷 저장소를 열 수 없습니다 (전체 스캔으로 진행): {exc}")
+                return None
+        return _SNAPSHOT_STORE
+
+
+def _is_page_gone_error(error: Exception) -> bool:
+    """페이지가 휴지통·아카이브로 이동했거나 삭제되어 노션이 쓰기를 거부한 응답인지 판별합니다."""
+    if not isinstance(error, HTTPResponseError):
+        return False
+    status = getattr(error, "status", None)
+    message = str(getattr(error, "message", None) or error).lower()
+    return status == 404 or (status == 400 and "archived" in message)
+
+
+def forget_snapshot_page(page_id: str, error: Exception) -> None:
+    """쓰기가 '페이지 없음·아카이브됨'으로 거부되면 로컬 스냅샷에서 해당 페이지를 제거합니다 (다음 실행부터 제공하지 않음)."""
+    if not _is_page_gone_error(error):
+        return
+    store = _SNAPSHOT_STORE
+    if store is None:
+        return
+    try:
+        removed = store.forget_page(page_id)
+    except sqlite3.Error as exc:
+        print(f"   ⚠️ 노션 스냅샷에서 삭제된 페이지를 제거하지 못했습니다 ({page_id}): {exc}")
+        return
+    if removed:
+        print(f"   🗑️ [Snapshot] 휴지통·아카이브 페이지 제거: {page_id}")
+
+
+def _and_filters(base: Dict[str, Any], extra: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """두 노션 필터를 AND로 결합합니다. extra가 이미 AND 복합 필터면 중첩 깊이를 늘리지 않도록 평탄화합니다."""
+    if not extra:
+        return base
+    if "and" in extra:
+        return {"and": [base] + list(extra["and"])}
+    return {"and": [base, extra]}
+
+
+def _paginate_snapshot(
+    client: Any,
+    database_id: str,
+    page_size: int,
+    retry_delay: float,
+    query_filter: Optional[Dict[str, Any]],
+    properties: Optional[List[str]] = None,
+) -> Iterable[Dict[str, Any]]:
+    """스냅샷을 갱신한 뒤 로컬 사본에서 페이지를 yield합니다 (저장소 사용 불가 시 직접 스캔)."""
+    store = get_snapshot_store()
+    if store is None:
+        filter_properties = resolve_property_ids(client, database_id, properties) if properties else None
+        yield from _iter_database_pages(
+            client, database_id, page_size=page_size, retry_delay=retry_delay,
+            query_filter=query_filter, filter_properties=filter_properties
+        )
+        return
+
+    try:
+        fetched, total, full = store.refresh(
+            client, database_id, page_size=page_size, retry_delay=retry_delay,
+            query_filter=query_filter, properties=properties
+        )
+    except sqlite3.Error as exc:
+        print(f"   ⚠️ 노션 스냅샷 갱신 실패 (전체 스캔으로 폴백): {exc}")
+        filter_properties = resolve_property_ids(client, database_id, properties) if properties else None
+        yield from _iter_database_pages(
+            client, database_id, page_size=page_size, retry_delay=retry_delay,
+            query_filter=query_filter, filter_properties=filter_properties
+        )
+        return
+
+    mode = "전체 갱신" if full else "증분 갱신"
+    scope = " (서버 필터 적용)" if query_filter else ""
+    if properties:
+        scope += f" (속성 {len(properties)}개 축약)"
+    print(f"   ⚡ [Snapshot] {mode}{scope}: 노션 수신 {fetched}건 / 로컬 제공 {total}건")
+    yield from store.iter_pages(store.snapshot_key(database_id, query_filter, properties))
+
+
+def paginate_database_cached(
+    client: Any,
+    database_id: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    retry_delay: float = 0.05,
+    query_filter: Optional[Dict[str, Any]] = None,
+    properties: Optional[List[str]] = None,
+) -> Iterable[Dict[str, Any]]:
+    """
+    로컬 스냅샷을 last_edited_time 기준으로 증분 갱신한 뒤, 전체 페이지를 로컬 사본에서 yield합니다.
+    paginate_database와 동일한 시그니처의 드롭인 대체 함수이며, 저장소 오류 시 전체 스캔으로 폴백합니다.
+    query_filter가 노션에서 거부되면(400) 필터 없는 스냅샷으로 폴백합니다.
+    """
+    yield from _with_filter_fallback(
+        lambda flt: _paginate_snapshot(client, database_id, page_size, retry_delay, flt, properties),
+        query_filter,
+    )
+
+
+def paginate_database_records(
+    client: Any,
+    database_id: str,
+    properties: List[str],
+    page_size: int = DEFAULT_PAGE_SIZE,
+    retry_delay: float = 0.05,
+    query_filter: Optional[Dict[str, Any]] = None,
+) -> Iterable[PageRecord]:
+    """
+    paginate_database_cached로 받은 페이지를 즉시 PageRecord로 축약하여 yield합니다.
+    properties에 적은 속성만 filter_properties로 요청하므로 노션 응답 크기와 파싱 비용이 작업이 읽는 속성 수에 비례하고,
+    원본 JSON은 레코드 생성 직후 버려지므로 all_pages 목록의 메모리 사용량도 크게 줄어듭니다.
+    """
+    for page in paginate_database_cached(
+        client, database_id, page_size=page_size, retry_delay=retry_delay,
+        query_filter=query_filter, properties=properties
+    ):
+        yield PageRecord.from_page(page, properties)
+
+
 # ==============================================================================
 # 6. 한국투자증권(KIS) API 인증 관리 (지능형 디스크 캐싱)
 # ==============================================================================
 TOKEN_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".kis_token_cache.json")
+TOKEN_LOCK_FILE = f"{TOKEN_CACHE_FILE}.lock"
+# 만료까지 이 시간(초) 미만이면 재사용하지 않고 즉시 재발급
+KIS_TOKEN_MIN_REMAINING_SEC = 600
+# 만료까지 이 시간(초) 이내로 남은 토큰은 그대로 쓰면서 백그라운드 스레드가 미리 재발급
+KIS_TOKEN_REFRESH_AHEAD_SEC = float(os.environ.get("KIS_TOKEN_REFRESH_AHEAD_SEC", "3600"))
+
+# 프로세스 내 토큰 메모 (캐시 키 → 캐시 엔트리). 디스크 재조회 없이 스레드 간 공유
+_TOKEN_MEMO: Dict[str, Dict[str, Any]] = {}
+_TOKEN_MEMO_LOCK = threading.Lock()
+# 신규 발급/디스크 갱신 구간 직렬화 (KIS는 토큰 발급을 1분에 1회로 제한하므로 중복 발급 방지)
+_TOKEN_ISSUE_LOCK = threading.Lock()
+_TOKEN_REFRESHING: Set[str] = set()
+
+
+@contextmanager
+def _token_file_lock(timeout: float = 30.0) -> Iterator[None]:
+    """
+    여러 프로세스가 토큰 캐시를 동시에 읽고 쓰지 않도록 잠금 파일에 advisory lock을 겁니다.
+    (POSIX는 fcntl, Windows는 msvcrt 사용. 잠금을 지원하지 않거나 timeout 초과 시 잠금 없이 진행)
+    """
+    try:
+        handle = open(TOKEN_LOCK_FILE, "a+")
+    except OSError:
+        yield
+        return
+
+    locked = False
+    deadline = time.monotonic() + timeout
+    while sys.platform == "win32" or fcntl is not None:
+        try:
+            if sys.platform == "win32":
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            elif fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            locked = True
+            break
+        except OSError:
+            if time.monotonic() >= deadline:
+                print("   ⚠️ KIS 토큰 캐시 잠금 대기 시간 초과 - 잠금 없이 진행합니다.")
+                break
+            time.sleep(0.1)
+
+    try:
+        yield
+    finally:
+        if locked:
+            try:
+                if sys.platform == "win32":
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+                elif fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            except OSError:
+                pass
+        handle.close()
 
 
 def _load_token_cache() -> Dict[str, Any]:
@@ -843,84 +2035,173 @@ def _load_token_cache() -> Dict[str, Any]:
 
 
 def _save_token_cache(cache_data: Dict[str, Any]) -> None:
-    """KIS 토큰 정보를 로컬 캐시 파일에 안전하게 저장합니다."""
+    """KIS 토큰 정보를 임시 파일에 쓴 뒤 교체(atomic rename)하여, 동시 읽기 중에도 손상된 파일이 보이지 않게 저장합니다."""
+    tmp_path = f"{TOKEN_CACHE_FILE}.{os.getpid()}.tmp"
     try:
-        with open(TOKEN_CACHE_FILE, "w", encoding="utf-8") as f:
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(cache_data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, TOKEN_CACHE_FILE)
     except Exception:
-        pass
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
 
 
-def _request_kis_token(
+def _token_cache_key(url_base: str, app_key: str) -> str:
+    return f"{url_base}_{app_key[:6]}"
+
+
+def _token_remaining_sec(entry: Optional[Dict[str, Any]]) -> float:
+    """캐시 엔트리의 만료까지 남은 초를 반환합니다 (엔트리가 없거나 토큰이 비어 있으면 0)."""
+    if not entry or not isinstance(entry, dict) or not entry.get("token"):
+        return 0.0
+    return float(entry.get("expires_at", 0)) - time.time()
+
+
+def _issue_kis_token(
+    cache_key: str,
     url_base: str,
     app_key: str,
     app_secret: str,
-    max_retries: int = 2,
-    base_delay: float = 1.5,
-    env_name: str = "모의투자"
-) -> Optional[str]:
-    """한투 API 액세스 토큰을 발급받거나 유효한 캐시 토큰을 반환합니다."""
-    if not app_key or not app_secret:
-        return None
-
-    # 1. 캐시 검증: 만료 10분 전까지는 기존 토큰 즉시 재사용
-    cache_key = f"{url_base}_{app_key[:6]}"
-    cache_data = _load_token_cache()
-    cached_entry = cache_data.get(cache_key)
-
-    if cached_entry and isinstance(cached_entry, dict):
-        cached_token = cached_entry.get("token")
-        expires_at = cached_entry.get("expires_at", 0)
-        remaining_sec = expires_at - time.time()
-        if cached_token and remaining_sec > 600:
-            remaining_min = int(remaining_sec) // 60
-            print(f"   ⚡ [{env_name}] 유효한 캐시 토큰 재사용 (만료까지 {remaining_min}분 남음)")
-            return str(cached_token)
-
-    # 2. 신규 토큰 발급 요청
+    max_retries: int,
+    base_delay: float,
+    env_name: str
+) -> Optional[Dict[str, Any]]:
+    """토큰을 신규 발급하여 디스크 캐시와 메모에 반영합니다. (_TOKEN_ISSUE_LOCK과 파일 잠금을 잡은 상태에서 호출)"""
     url = f"{url_base}/oauth2/tokenP"
     body = {"grant_type": "client_credentials", "appkey": app_key, "appsecret": app_secret}
 
     for attempt in range(1, max_retries + 1):
         try:
+            BACKOFF.wait("kis")
             res = requests.post(url, json=body, timeout=8)
             if res.status_code in RETRY_STATUS_CODES and attempt < max_retries:
-                delay = base_delay * (2 ** (attempt - 1))
-                print(f"   ⚠️ [{env_name}] KIS 토큰 재시도 {attempt}/{max_retries} - status={res.status_code}, {delay}초 대기")
-                time.sleep(delay)
-                continue
+                delay = BACKOFF.next_delay("kis", attempt, base_delay, res.status_code, res.headers)
+                if delay is not None:
+                    print(f"   ⚠️ [{env_name}] KIS 토큰 재시도 {attempt}/{max_retries} - status={res.status_code}, {delay:.1f}초 대기")
+                    time.sleep(delay)
+                    continue
 
             res.raise_for_status()
             res_json = res.json()
             token = res_json.get("access_token")
             expires_in = res_json.get("expires_in", 86400)
-            
+
             if token:
-                # 캐시 저장 (안전 버퍼 포함)
-                cache_data[cache_key] = {
+                entry = {
                     "token": token,
                     "expires_at": time.time() + float(expires_in),
                     "created_at": kst_isoformat(),
                     "env_name": env_name
                 }
+                # 다른 키의 엔트리를 덮어쓰지 않도록 잠금 구간 안에서 최신 파일을 다시 읽어 병합
+                cache_data = _load_token_cache()
+                cache_data[cache_key] = entry
                 _save_token_cache(cache_data)
-                return str(token)
+                with _TOKEN_MEMO_LOCK:
+                    _TOKEN_MEMO[cache_key] = entry
+                return entry
             else:
                 print(f"   ⚠️ [{env_name}] KIS 토큰 응답에서 access_token을 찾을 수 없음")
         except Exception as exc:
-            if attempt < max_retries:
-                delay = base_delay * (2 ** (attempt - 1))
-                print(f"   ⚠️ [{env_name}] KIS 토큰 통신 실패 (시도 {attempt}/{max_retries}): {exc}, {delay}초 대기")
+            delay = BACKOFF.next_delay("kis", attempt, base_delay) if attempt < max_retries else None
+            if delay is not None:
+                print(f"   ⚠️ [{env_name}] KIS 토큰 통신 실패 (시도 {attempt}/{max_retries}): {exc}, {delay:.1f}초 대기")
                 time.sleep(delay)
             else:
                 print(f"   ❌ [{env_name}] KIS 토큰 발급 최종 실패: {exc}")
+                break
     return None
 
 
-def get_kis_auth_context(max_retries: int = 2, base_delay: float = 1.5) -> Optional[Dict[str, Any]]:
+def _refresh_kis_token_background(cache_key: str, url_base: str, app_key: str, app_secret: str, env_name: str) -> None:
+    """만료가 가까운 토큰을 백그라운드 데몬 스레드에서 미리 재발급합니다 (키별 동시 1개)."""
+    with _TOKEN_MEMO_LOCK:
+        if cache_key in _TOKEN_REFRESHING:
+            return
+        _TOKEN_REFRESHING.add(cache_key)
+
+    def _refresh() -> None:
+        try:
+            with _TOKEN_ISSUE_LOCK, _token_file_lock():
+                # 다른 프로세스가 이미 갱신했다면 디스크의 새 토큰을 채택
+                entry = _load_token_cache().get(cache_key)
+                if entry is not None and _token_remaining_sec(entry) > KIS_TOKEN_REFRESH_AHEAD_SEC:
+                    with _TOKEN_MEMO_LOCK:
+                        _TOKEN_MEMO[cache_key] = entry
+                    return
+                if _issue_kis_token(cache_key, url_base, app_key, app_secret, 2, 1.5, env_name):
+                    print(f"   🔄 [{env_name}] 만료 임박 토큰을 백그라운드에서 재발급했습니다.")
+        finally:
+            with _TOKEN_MEMO_LOCK:
+                _TOKEN_REFRESHING.discard(cache_key)
+
+    threading.Thread(target=_refresh, name="kis-token-refresh", daemon=True).start()
+
+
+def _request_kis_token(
+    url_base: str,
+    app_key: str,
+    app_secret: str,
+    max_retries: int = 2,
+    base_delay: float = 1.5,
+    env_name: str = "모의투자"
+) -> Optional[str]:
     """
-    한국투자증권(KIS) 실전투자(PROD) API 인증 컨텍스트를 반환합니다.
+    한투 API 액세스 토큰을 발급받거나 유효한 캐시 토큰을 반환합니다.
+    1) 프로세스 내 메모 → 2) 파일 잠금 후 디스크 캐시 → 3) 신규 발급 순으로 확인하며,
+    만료가 KIS_TOKEN_REFRESH_AHEAD_SEC 이내로 남은 토큰은 그대로 반환하고 백그라운드에서 미리 재발급합니다.
+    """
+    if not app_key or not app_secret:
+        return None
+
+    cache_key = _token_cache_key(url_base, app_key)
+
+    # 1. 메모 확인: 디스크 접근 없이 즉시 반환
+    with _TOKEN_MEMO_LOCK:
+        entry = _TOKEN_MEMO.get(cache_key)
+    remaining_sec = _token_remaining_sec(entry)
+    if entry and remaining_sec > KIS_TOKEN_MIN_REMAINING_SEC:
+        if remaining_sec < KIS_TOKEN_REFRESH_AHEAD_SEC:
+            _refresh_kis_token_background(cache_key, url_base, app_key, app_secret, env_name)
+        return str(entry["token"])
+
+    with _TOKEN_ISSUE_LOCK, _token_file_lock():
+        # 2. 잠금 획득 후 메모·디스크 캐시 재확인 (대기하는 동안 다른 스레드/프로세스가 발급했을 수 있음)
+        with _TOKEN_MEMO_LOCK:
+            entry = _TOKEN_MEMO.get(cache_key)
+        if entry is not None and _token_remaining_sec(entry) > KIS_TOKEN_MIN_REMAINING_SEC:
+            return str(entry["token"])
+        entry = _load_token_cache().get(cache_key)
+        remaining_sec = _token_remaining_sec(entry)
+        if entry and remaining_sec > KIS_TOKEN_MIN_REMAINING_SEC:
+            with _TOKEN_MEMO_LOCK:
+                _TOKEN_MEMO[cache_key] = entry
+            print(f"   ⚡ [{env_name}] 유효한 캐시 토큰 재사용 (만료까지 {int(remaining_sec) // 60}분 남음)")
+            if remaining_sec < KIS_TOKEN_REFRESH_AHEAD_SEC:
+                _refresh_kis_token_background(cache_key, url_base, app_key, app_secret, env_name)
+            return str(entry["token"])
+
+        # 3. 신규 토큰 발급 요청
+        entry = _issue_kis_token(cache_key, url_base, app_key, app_secret, max_retries, base_delay, env_name)
+        return str(entry["token"]) if entry else None
+
+
+def get_current_kis_token(kis_ctx: Dict[str, Any]) -> str:
     """
+    인증 컨텍스트의 토큰 대신, 백그라운드 재발급으로 메모에 더 최신 토큰이 있으면 그것을 반환합니다.
+    (만료 임박 여부도 함께 확인하므로 장시간 실행되는 모드에서도 토큰이 끊기지 않음)
+    """
+    refreshed = _request_kis_token(
+        kis_ctx.get("url_base", KIS_PROD_URL), kis_ctx.get("app_key", ""), kis_ctx.get("app_secret", ""),
+        env_name=kis_ctx.get("env_type", "PROD")
+    ) if kis_ctx.get("app_key") and kis_ctx.get("app_secret") else None
+    return refreshed or kis_ctx["token"]
+
+
+def _get_kis_app_credentials() -> Tuple[str, str]:
+    """환경 변수에서 KIS 실전투자 앱키/시크릿을 읽어옵니다 (미설정 시 빈 문자열)."""
     app_key = (
         os.environ.get("KIS_APP_KEY")
         or os.environ.get("KIS_PROD_APP_KEY")
@@ -933,7 +2214,14 @@ def get_kis_auth_context(max_retries: int = 2, base_delay: float = 1.5) -> Optio
         or os.environ.get("KIS_REAL_APP_SECRET")
         or ""
     ).strip()
+    return app_key, app_secret
+
 
+def get_kis_auth_context(max_retries: int = 2, base_delay: float = 1.5) -> Optional[Dict[str, Any]]:
+    """
+    한국투자증권(KIS) 실전투자(PROD) API 인증 컨텍스트를 반환합니다.
+    """
+    app_key, app_secret = _get_kis_app_credentials()
     if not app_key or not app_secret:
         print("⚠️ [KIS API] KIS_APP_KEY 또는 KIS_APP_SECRET이 설정되지 않았습니다.")
         return None
@@ -960,6 +2248,366 @@ def get_kis_auth_context(max_retries: int = 2, base_delay: float = 1.5) -> Optio
     return None
 
 
+def prefetch_kis_auth_context(max_retries: int = 2, base_delay: float = 1.5) -> "Future[Optional[Dict[str, Any]]]":
+    """
+    get_kis_auth_context를 백그라운드 스레드에서 미리 시작하고 Future를 반환합니다.
+    호출 측은 노션 클라이언트 생성·저널 재개 등을 먼저 진행한 뒤 .result()로 받아, 토큰 발급을 임계 경로에서 뺍니다.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kis-auth")
+    future = executor.submit(get_kis_auth_context, max_retries, base_delay)
+    executor.shutdown(wait=False)
+    return future
+
+
+def get_kis_ws_approval_key(max_retries: int = 2, base_delay: float = 1.5) -> Optional[str]:
+    """
+    실시간(WebSocket) 시세 구독에 필요한 접속키(approval_key)를 발급받습니다. (REST 액세스 토큰과 별개)
+    KIS_WS_APPROVAL_KEY 환경 변수가 있으면 발급 없이 그대로 사용합니다 (로컬 WebSocket 대역 서버 테스트용).
+    """
+    override = os.environ.get("KIS_WS_APPROVAL_KEY", "").strip()
+    if override:
+        return override
+    app_key, app_secret = _get_kis_app_credentials()
+    if not app_key or not app_secret:
+        print("⚠️ [KIS WebSocket] KIS_APP_KEY 또는 KIS_APP_SECRET이 설정되지 않았습니다.")
+        return None
+
+    url = f"{KIS_PROD_URL}/oauth2/Approval"
+    body = {"grant_type": "client_credentials", "appkey": app_key, "secretkey": app_secret}
+    for attempt in range(1, max_retries + 1):
+        try:
+            BACKOFF.wait("kis")
+            res = requests.post(url, json=body, timeout=8)
+            res.raise_for_status()
+            approval_key = res.json().get("approval_key")
+            if approval_key:
+                return str(approval_key)
+            print("   ⚠️ [KIS WebSocket] 접속키 응답에서 approval_key를 찾을 수 없음")
+        except Exception as exc:
+            delay = BACKOFF.next_delay("kis", attempt, base_delay) if attempt < max_retries else None
+            if delay is None:
+                print(f"   ❌ [KIS WebSocket] 접속키 발급 최종 실패: {exc}")
+                break
+            print(f"   ⚠️ [KIS WebSocket] 접속키 발급 실패 (시도 {attempt}/{max_retries}): {exc}, {delay:.1f}초 대기")
+            time.sleep(delay)
+    return None
+
+
+# ==============================================================================
+# 6-1. 한국투자증권(KIS) 공용 API 클라이언트 (프로세스 공용 속도 제한 + 호출 수 집계)
+# ==============================================================================
+# KIS가 초당 거래건수 초과 시 HTTP 500과 함께 돌려주는 메시지 코드 (429와 동일하게 전 워커 일시 정지)
+KIS_RATE_LIMIT_MSG_CODES = {"EGW00201"}
+
+
+class KISClient:
+    """
+    한투 REST 시세 API 호출을 한곳으로 모은 클라이언트입니다.
+    - 모든 호출이 프로세스 공용 KIS_BUCKET(초당 KIS_RPS건)을 통과하므로 워커 수와 무관하게 앱키 한도를 넘지 않습니다.
+    - 429/5xx와 초당 거래건수 초과(EGW00201)는 BACKOFF 코디네이터로 재시도하며, tr_id별 호출 수를 집계합니다.
+    """
+
+    def __init__(self, kis_ctx: Dict[str, Any], session: Optional[requests.Session] = None, bucket: Optional[TokenBucket] = None):
+        self.ctx = kis_ctx
+        self.session = session or get_shared_http_session("kis", pool_size=KIS_MAX_WORKERS)
+        self.bucket = bucket or KIS_BUCKET
+        self.calls: Dict[str, int] = {}
+        self._started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _count(self, tr_id: str) -> None:
+        with self._lock:
+            if self._started_at is None:
+                self._started_at = time.monotonic()
+            self.calls[tr_id] = self.calls.get(tr_id, 0) + 1
+
+    def _headers(self, tr_id: str) -> Dict[str, str]:
+        return {
+            "authorization": f"Bearer {get_current_kis_token(self.ctx)}",
+            "appkey": self.ctx["app_key"],
+            "appsecret": self.ctx["app_secret"],
+            "tr_id": tr_id,
+            "custtype": "P",
+        }
+
+    def get(
+        self,
+        path: str,
+        tr_id: str,
+        params: Dict[str, Any],
+        label: str = "",
+        require: Optional[str] = "output",
+        max_retries: int = 3,
+        base_delay: float = 2.0,
+        timeout: float = 10.0,
+        quiet: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        시세 API를 GET으로 호출하고 JSON 응답을 반환합니다. 최대 재시도 후에도 실패하면 None을 반환합니다.
+        - rt_cd가 "0"이 아니면(상장폐지·잘못된 코드 등 업무 거부) 재시도 예산을 쓰지 않고 즉시 None을 반환합니다.
+          (단, 초당 거래건수 초과(EGW00201)는 429와 같이 재시도)
+        - 정상 응답인데 require에 지정한 키(기본 output)가 비어 있으면 일시적 오류로 보고 재시도합니다.
+        """
+        url = f"{self.ctx['url_base']}{path}"
+        tag = f"[{label}] " if label else ""
+        attempt = 1
+        while True:
+            try:
+                BACKOFF.wait("kis")
+                self.bucket.acquire()
+                self._count(tr_id)
+                response = self.session.get(url, headers=self._headers(tr_id), params=params, timeout=timeout)
+
+                status = response.status_code
+                if status in RETRY_STATUS_CODES and attempt < max_retries:
+                    if status == 500:
+                        try:
+                            if response.json().get("msg_cd") in KIS_RATE_LIMIT_MSG_CODES:
+                                status = 429
+                        except ValueError:
+                            pass
+                    delay = BACKOFF.next_delay("kis", attempt, base_delay, status, response.headers)
+                    if delay is not None:
+                        if not quiet:
+                            print(f"   ⚠️ {tag}KIS API {response.status_code} 에러. {delay:.1f}초 대기 후 재시도 ({attempt}/{max_retries})")
+                        time.sleep(delay)
+                        attempt += 1
+                        continue
+
+                response.raise_for_status()
+                data = response.json()
+                if str(data.get("rt_cd", "0")) != "0":
+                    msg_cd = data.get("msg_cd")
+                    if msg_cd in KIS_RATE_LIMIT_MSG_CODES and attempt < max_retries:
+                        delay = BACKOFF.next_delay("kis", attempt, base_delay, 429, response.headers)
+                        if delay is not None:
+                            time.sleep(delay)
+                            attempt += 1
+                            continue
+                    if not quiet:
+                        print(f"   ⚠️ {tag}KIS 응답 거부 ({msg_cd}): {data.get('msg1', '')}".rstrip())
+                    return None
+                if require and not data.get(require):
+                    raise ValueError(f"응답 데이터({require})가 비어 있습니다.")
+                return data
+
+            except (requests.exceptions.RequestException, ValueError) as exc:
+                delay = BACKOFF.next_delay("kis", attempt, base_delay) if attempt < max_retries else None
+                if delay is not None:
+                    if not quiet:
+                        print(f"   ⚠️ {tag}KIS 통신 에러. {delay:.1f}초 대기 후 재시도 ({attempt}/{max_retries}): {exc}")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                if not quiet:
+                    print(f"❌ {tag}KIS API 요청 실패 (최대 재시도 초과): {exc}")
+                return None
+
+    def cached_quote(self, code: str) -> Optional[Dict[str, Any]]:
+        """디스크 시세 캐시에 유효한 현재가 응답(output)이 있으면 반환합니다 (API 호출 없음)."""
+        if not KIS_QUOTE_CACHE_ENABLED:
+            return None
+        return KIS_QUOTE_CACHE.get(code)
+
+    def get_quote(
+        self,
+        code: str,
+        label: str = "",
+        max_retries: int = 3,
+        base_delay: float = 2.0,
+        timeout: float = 10.0,
+        quiet: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        현재가(FHKST01010100) 응답 output 전체(가격, PER/PBR/EPS, 52주 고저, 대표시장, 업종명 등)를 반환합니다.
+        같은 세션에서 이미 받은 응답은 디스크 캐시(KIS_QUOTE_CACHE)에서 재사용합니다.
+        """
+        cached = self.cached_quote(code)
+        if cached is not None:
+            return cached
+        data = self.get(
+            "/uapi/domestic-stock/v1/quotations/inquire-price",
+            "FHKST01010100",
+            {"fid_cond_mrkt_div_code": "J", "fid_input_iscd": code},
+            label=label or code,
+            max_retries=max_retries,
+            base_delay=base_delay,
+            timeout=timeout,
+            quiet=quiet,
+        )
+        if not data:
+            return None
+        output = data["output"]
+        if KIS_QUOTE_CACHE_ENABLED:
+            KIS_QUOTE_CACHE.put(code, output)
+        return output
+
+    def summary(self) -> str:
+        """tr_id별 호출 수와 평균 호출 속도를 한 줄 요약 문자열로 반환합니다."""
+        with self._lock:
+            total = sum(self.calls.values())
+            if not total:
+                return "호출 없음"
+            elapsed = max(time.monotonic() - (self._started_at or time.monotonic()), 1e-6)
+            parts = ", ".join(f"{tr_id} {cnt}회" for tr_id, cnt in sorted(self.calls.items()))
+            return f"총 {total}회 ({parts}) | 평균 초당 {total / elapsed:.1f}건 (한도 {self.bucket.rate:g}건)"
+
+
+_KIS_CLIENTS: Dict[str, KISClient] = {}
+_KIS_CLIENTS_LOCK = threading.Lock()
+
+
+def get_kis_client(kis_ctx: Dict[str, Any]) -> KISClient:
+    """앱키별 프로세스 공용 KISClient를 반환합니다 (토큰이 갱신되면 인증 컨텍스트만 교체)."""
+    key = str(kis_ctx.get("app_key", ""))
+    with _KIS_CLIENTS_LOCK:
+        client = _KIS_CLIENTS.get(key)
+        if client is None:
+            client = KISClient(kis_ctx)
+            _KIS_CLIENTS[key] = client
+        elif client.ctx.get("token") != kis_ctx.get("token"):
+            client.ctx = kis_ctx
+        return client
+
+
+def report_kis_usage(logger: Optional[Any] = None) -> None:
+    """실행 종료 시 이번 프로세스가 소비한 KIS API 호출 수를 출력합니다."""
+    with _KIS_CLIENTS_LOCK:
+        clients = list(_KIS_CLIENTS.values())
+    if not clients:
+        return
+    for client in clients:
+        message = f"📊 [KIS 호출 리포트] {client.summary()} | {KIS_QUOTE_CACHE.summary()}"
+        if logger:
+            logger.info(message)
+        else:
+            print(message)
+
+
+# ==============================================================================
+# 6-2. 한투(KIS) 현재가 응답 디스크 캐시 (가격·재무·마스터 동기화 간 재사용)
+# ==============================================================================
+KIS_QUOTE_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".kis_quote_cache.json")
+KIS_QUOTE_CACHE_TTL_SEC = float(os.environ.get("KIS_QUOTE_CACHE_TTL_SEC", "300"))
+KIS_QUOTE_CACHE_ENABLED = os.environ.get("KIS_QUOTE_CACHE", "on").lower() not in ("off", "false", "0")
+# 정규장 시간(KST). 마감은 종가 단일가(15:30) 체결 확정까지 여유를 둠
+KR_MARKET_OPEN_HM = (9, 0)
+KR_MARKET_CLOSE_HM = (15, 40)
+
+
+def get_kr_last_close(now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    직전 정규장 마감 시각(KST)을 반환합니다. 정규장 진행 중이면 None을 반환합니다.
+    (장 마감 이후에는 다음 개장 전까지 시세가 바뀌지 않으므로 캐시 유효성의 기준점으로 사용)
+    """
+    now = now or get_kst_now()
+    open_today = now.replace(hour=KR_MARKET_OPEN_HM[0], minute=KR_MARKET_OPEN_HM[1], second=0, microsecond=0)
+    close_today = now.replace(hour=KR_MARKET_CLOSE_HM[0], minute=KR_MARKET_CLOSE_HM[1], second=0, microsecond=0)
+    if not is_market_holiday("KR", now)[0]:
+        if now >= close_today:
+            return close_today
+        if now >= open_today:
+            return None
+
+    day = close_today - timedelta(days=1)
+    for _ in range(14):
+        if not is_market_holiday("KR", day)[0]:
+            return day
+        day -= timedelta(days=1)
+    return day
+
+
+class KISQuoteCache:
+    """
+    한투 현재가(FHKST01010100 inquire-price) 응답의 output 딕셔너리 전체를 종목코드별로 보관하는 디스크 캐시입니다.
+    - 장중: 조회 후 KIS_QUOTE_CACHE_TTL_SEC(기본 300초) 동안만 재사용
+    - 장 마감 후/휴장일: 직전 마감 이후에 받은 응답이면 다음 개장 전까지 재사용
+    - 토큰 캐시(.kis_token_cache.json)와 같은 위치의 .kis_quote_cache.json에 저장되어 같은 세션의 후속 스크립트가 공유합니다.
+    """
+
+    def __init__(self, path: str = KIS_QUOTE_CACHE_FILE, ttl_sec: float = KIS_QUOTE_CACHE_TTL_SEC):
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._dirty = False
+        self._cutoff_cache: Tuple[float, Optional[float]] = (0.0, None)
+        self._lock = threading.Lock()
+
+    def _cutoff(self, now_ts: float) -> Optional[float]:
+        """장 마감 후라면 직전 마감 시각(epoch), 장중이면 None을 30초 단위로 메모이즈하여 반환합니다."""
+        computed_at, cutoff = self._cutoff_cache
+        if now_ts - computed_at > 30:
+            last_close = get_kr_last_close()
+            cutoff = last_close.timestamp() if last_close else None
+            self._cutoff_cache = (now_ts, cutoff)
+        return cutoff
+
+    def _is_fresh(self, entry: Dict[str, Any], now_ts: float) -> bool:
+        fetched_at = float(entry.get("fetched_at", 0))
+        cutoff = self._cutoff(now_ts)
+        if cutoff is None:
+            return now_ts - fetched_at <= self.ttl_sec
+        return fetched_at >= cutoff
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """최초 접근 시 파일을 읽고 만료된 항목은 버립니다. (락을 잡은 상태에서 호출)"""
+        if self._entries is None:
+            raw: Dict[str, Any] = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        raw = json.load(f)
+                except Exception:
+                    raw = {}
+            now_ts = time.time()
+            self._entries = {
+                code: entry for code, entry in raw.items()
+                if isinstance(entry, dict) and isinstance(entry.get("output"), dict) and self._is_fresh(entry, now_ts)
+            }
+        return self._entries
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        """유효한 캐시 응답(output)을 반환하고, 없거나 만료되었으면 None을 반환합니다."""
+        with self._lock:
+            entry = self._load().get(code)
+            if entry is not None and self._is_fresh(entry, time.time()):
+                self.hits += 1
+                return entry["output"]
+            self.misses += 1
+            return None
+
+    def put(self, code: str, output: Dict[str, Any]) -> None:
+        """새로 받은 응답을 캐시에 넣습니다. 파일 반영은 save()(프로세스 종료 시 자동 호출)에서 한 번에 수행합니다."""
+        with self._lock:
+            self._load()[code] = {"fetched_at": time.time(), "output": output}
+            if not self._dirty:
+                self._dirty = True
+                atexit.register(self.save)
+
+    def save(self) -> None:
+        """변경분이 있으면 임시 파일에 쓴 뒤 교체하여 중간에 끊겨도 손상된 캐시가 남지 않게 합니다."""
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as exc:
+                print(f"   ⚠️ KIS 시세 캐시 저장 실패 ({self.path}): {exc}")
+
+    def summary(self) -> str:
+        """캐시 적중/미스 건수를 한 줄 요약 문자열로 반환합니다."""
+        return f"시세 캐시 적중 {self.hits}건 / 미스 {self.misses}건"
+
+
+KIS_QUOTE_CACHE = KISQuoteCache()
+
+
 # ==============================================================================
 # 7. 벤치마크 및 키워드 매칭 엔진
 # ==============================================================================
@@ -1427,7 +3075,10 @@ def safe_append_blocks(
     max_retries: int = 3,
     retry_delay: float = 2.0
 ) -> bool:
-    """노션 페이지/블록에 자식 블록들을 80~100개 단위로 안전하게 나누어 추가합니다."""
+    """
+    노션 페이지/블록에 자식 블록들을 80~100개 단위로 안전하게 나누어 추가합니다.
+    블록 추가는 멱등이 아니므로 노션이 거절한 응답(409/429/503)만 재시도합니다 (타임아웃 재전송 시 블록 중복 방지).
+    """
     if not children:
         return True
     
@@ -1438,29 +3089,32 @@ def safe_append_blocks(
         success = False
         while attempt <= max_retries:
             try:
+                BACKOFF.wait("notion")
+                NOTION_WRITE_BUCKET.acquire()
                 client.blocks.children.append(block_id=block_id, children=chunk)
                 success = True
                 break
             except HTTPResponseError as error:
                 status = getattr(error, "status", None)
-                if status in RETRY_STATUS_CODES and attempt < max_retries:
-                    print(f"   ⚠️ Blocks append retry {attempt}/{max_retries} - status={status}: {error}")
-                    time.sleep(retry_delay * attempt)
+                delay = _notion_retry_delay(error, attempt, max_retries, retry_delay, idempotent=False)
+                if delay is not None:
+                    print(f"   ⚠️ Blocks append retry {attempt}/{max_retries} - status={status}: {error} ({delay:.1f}초 대기)")
+                    time.sleep(delay)
                     attempt += 1
                     continue
                 print(f"   ❌ Blocks append failed: {_format_notion_error(error)}")
                 break
             except Exception as error:
-                if attempt < max_retries:
-                    print(f"   ⚠️ Blocks append retry {attempt}/{max_retries}: {error}")
-                    time.sleep(retry_delay * attempt)
+                delay = _notion_retry_delay(error, attempt, max_retries, retry_delay, idempotent=False)
+                if delay is not None:
+                    print(f"   ⚠️ Blocks append retry {attempt}/{max_retries}: {error} ({delay:.1f}초 대기)")
+                    time.sleep(delay)
                     attempt += 1
                     continue
                 print(f"   ❌ Blocks append failed: {error}")
                 break
         if not success:
             return False
-        time.sleep(0.3)
     return True
 
 
@@ -1474,7 +3128,7 @@ def safe_create_page(
 ) -> Optional[Dict[str, Any]]:
     """
     재시도 로직과 100개 초과 블록 청크 분할을 지원하는 안전한 노션 페이지 생성 함수.
-    생성된 페이지 객체를 반환합니다.
+    생성된 페이지 객체를 반환합니다. 페이지 생성은 멱등이 아니므로 노션이 거절한 응답(409/429/503)만 재시도합니다.
     """
     children_to_send = children or []
     initial_children = children_to_send[:80]
@@ -1492,21 +3146,25 @@ def safe_create_page(
             if initial_children:
                 payload["children"] = initial_children
                 
+            BACKOFF.wait("notion")
+            NOTION_WRITE_BUCKET.acquire()
             page = cast(Dict[str, Any], client.pages.create(**payload))
             break
         except HTTPResponseError as error:
             status = getattr(error, "status", None)
-            if status in RETRY_STATUS_CODES and attempt < max_retries:
-                print(f"   ⚠️ Notion page create retry {attempt}/{max_retries} - status={status}: {error}")
-                time.sleep(retry_delay * attempt)
+            delay = _notion_retry_delay(error, attempt, max_retries, retry_delay, idempotent=False)
+            if delay is not None:
+                print(f"   ⚠️ Notion page create retry {attempt}/{max_retries} - status={status}: {error} ({delay:.1f}초 대기)")
+                time.sleep(delay)
                 attempt += 1
                 continue
             print(f"   ❌ Notion page create failed: {_format_notion_error(error)}")
             return None
         except Exception as error:
-            if attempt < max_retries:
-                print(f"   ⚠️ Notion page create retry {attempt}/{max_retries}: {error}")
-                time.sleep(retry_delay * attempt)
+            delay = _notion_retry_delay(error, attempt, max_retries, retry_delay, idempotent=False)
+            if delay is not None:
+                print(f"   ⚠️ Notion page create retry {attempt}/{max_retries}: {error} ({delay:.1f}초 대기)")
+                time.sleep(delay)
                 attempt += 1
                 continue
             print(f"   ❌ Notion page create failed: {error}")
@@ -1522,6 +3180,307 @@ def safe_create_page(
     return page
 
 
+# ==============================================================================
+# 8-1. 비동기 노션 쓰기 경로 (httpx.AsyncClient + 프로세스 공용 토큰 버킷)
+# ==============================================================================
+async def async_safe_page_update(
+    aclient: Any,
+    page_id: str,
+    properties: Dict[str, Any],
+    max_retries: int = 3,
+    retry_delay: float = 2.0,
+) -> bool:
+    """safe_page_update의 비동기 버전. NOTION_WRITE_BUCKET 속도에 맞춰 전송하며 재시도 규칙은 동일합니다."""
+    if not properties:
+        return False
+
+    attempt = 1
+    while True:
+        try:
+            await BACKOFF.wait_async("notion")
+            await NOTION_WRITE_BUCKET.acquire_async()
+            await aclient.pages.update(page_id=page_id, properties=properties)
+            return True
+        except HTTPResponseError as error:
+            status = getattr(error, "status", None)
+            delay = _notion_retry_delay(error, attempt, max_retries, retry_delay)
+            if delay is not None:
+                print(f"   ⚠️ Notion update retry {attempt}/{max_retries} - status={status}: {error} ({delay:.1f}초 대기)")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            print(f"   ❌ Notion update failed: {_format_notion_error(error)}")
+            forget_snapshot_page(page_id, error)
+            return False
+        except Exception as error:
+            delay = _notion_retry_delay(error, attempt, max_retries, retry_delay)
+            if delay is not None:
+                print(f"   ⚠️ Notion update retry {attempt}/{max_retries}: {error} ({delay:.1f}초 대기)")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            print(f"   ❌ Notion update failed: {error}")
+            return False
+
+
+async def async_safe_append_blocks(
+    aclient: Any,
+    block_id: str,
+    children: List[Dict[str, Any]],
+    batch_size: int = 80,
+    max_retries: int = 3,
+    retry_delay: float = 2.0
+) -> bool:
+    """
+    safe_append_blocks의 비동기 버전. 청크 간 고정 대기 없이 토큰 버킷으로만 속도를 제어합니다.
+    동기 버전과 같이 노션이 거절한 응답(409/429/503)만 재시도합니다 (타임아웃 재전송 시 블록 중복 방지).
+    """
+    if not children:
+        return True
+
+    for i in range(0, len(children), batch_size):
+        chunk = children[i : i + batch_size]
+        attempt = 1
+        success = False
+        while attempt <= max_retries:
+            try:
+                await BACKOFF.wait_async("notion")
+                await NOTION_WRITE_BUCKET.acquire_async()
+                await aclient.blocks.children.append(block_id=block_id, children=chunk)
+                success = True
+                break
+            except HTTPResponseError as error:
+                status = getattr(error, "status", None)
+                delay = _notion_retry_delay(error, attempt, max_retries, retry_delay, idempotent=False)
+                if delay is not None:
+                    print(f"   ⚠️ Blocks append retry {attempt}/{max_retries} - status={status}: {error} ({delay:.1f}초 대기)")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                print(f"   ❌ Blocks append failed: {_format_notion_error(error)}")
+                break
+            except Exception as error:
+                delay = _notion_retry_delay(error, attempt, max_retries, retry_delay, idempotent=False)
+                if delay is not None:
+                    print(f"   ⚠️ Blocks append retry {attempt}/{max_retries}: {error} ({delay:.1f}초 대기)")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                print(f"   ❌ Blocks append failed: {error}")
+                break
+        if not success:
+            return False
+    return True
+
+
+async def async_safe_create_page(
+    aclient: Any,
+    database_id: str,
+    properties: Dict[str, Any],
+    children: Optional[List[Dict[str, Any]]] = None,
+    max_retries: int = 3,
+    retry_delay: float = 2.0,
+) -> Optional[Dict[str, Any]]:
+    """
+    safe_create_page의 비동기 버전. 80개 초과 블록은 생성 후 async_safe_append_blocks로 이어 붙입니다.
+    페이지 생성은 멱등이 아니므로 노션이 거절한 응답(409/429/503)만 재시도합니다.
+    """
+    children_to_send = children or []
+    initial_children = children_to_send[:80]
+    remaining_children = children_to_send[80:]
+
+    attempt = 1
+    page: Optional[Dict[str, Any]] = None
+
+    while attempt <= max_retries:
+        try:
+            payload: Dict[str, Any] = {
+                "parent": {"database_id": database_id},
+                "properties": properties,
+            }
+            if initial_children:
+                payload["children"] = initial_children
+
+            await BACKOFF.wait_async("notion")
+            await NOTION_WRITE_BUCKET.acquire_async()
+            page = cast(Dict[str, Any], await aclient.pages.create(**payload))
+            break
+        except HTTPResponseError as error:
+            status = getattr(error, "status", None)
+            delay = _notion_retry_delay(error, attempt, max_retries, retry_delay, idempotent=False)
+            if delay is not None:
+                print(f"   ⚠️ Notion page create retry {attempt}/{max_retries} - status={status}: {error} ({delay:.1f}초 대기)")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            print(f"   ❌ Notion page create failed: {_format_notion_error(error)}")
+            return None
+        except Exception as error:
+            delay = _notion_retry_delay(error, attempt, max_retries, retry_delay, idempotent=False)
+            if delay is not None:
+                print(f"   ⚠️ Notion page create retry {attempt}/{max_retries}: {error} ({delay:.1f}초 대기)")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            print(f"   ❌ Notion page create failed: {error}")
+            return None
+
+    if page and remaining_children:
+        page_id = page.get("id")
+        if page_id:
+            ok = await async_safe_append_blocks(aclient, page_id, remaining_children)
+            if not ok:
+                print("   ⚠️ 나머지 블록 추가 중 일부 오류가 발생했습니다.")
+
+    return page
+
+
+# ==============================================================================
+# 8-2. 재개 가능한 배치 쓰기 저널 (타임아웃으로 중단된 쓰기 이어서 처리)
+# ==============================================================================
+WRITE_JOURNAL_DIR = os.path.dirname(os.path.abspath(__file__))
+# fsync 최소 간격(초). 0이면 기록마다 fsync. 매 기록은 flush되어 프로세스 강제 종료(타임아웃·Ctrl+C)에도 남고,
+# fsync는 OS 장애 대비용이므로 스트리밍 루프에서 건마다 디스크 동기화를 기다리지 않도록 묶어서 수행
+WRITE_JOURNAL_FSYNC_SEC = float(os.environ.get("NOTION_JOURNAL_FSYNC_SEC", "1.0"))
+
+
+class WriteJournal:
+    """
+    batch_update_pages 전송 대기 페이로드를 JSONL 파일(.notion_write_journal.<name>.jsonl)에 기록합니다.
+    - 전송 전 pending 레코드를 모두 기록하고, 성공한 페이지마다 done 레코드를 덧붙입니다.
+    - 배치가 끝나면 실패한 페이로드만 pending으로 남기고, 중간에 끊기면 다음 실행에서 load_pending으로 미완료분을 복원합니다.
+    - pending 레코드에는 기록 시점의 거래일(market 기준)을 session으로 남기며, 이전 거래일 레코드는 복원하지 않습니다
+      (금요일에 중단된 시세를 월요일에 재전송하고 그 페이지의 당일 수집을 건너뛰는 일을 막기 위함).
+    - 기록은 매번 flush하고, fsync는 fsync_interval초(기본 WRITE_JOURNAL_FSYNC_SEC)에 한 번만 수행합니다 (0이면 매번).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        directory: str = WRITE_JOURNAL_DIR,
+        market: str = "KR",
+        fsync_interval: Optional[float] = None,
+    ):
+        self.path = os.path.join(directory, f".notion_write_journal.{name}.jsonl")
+        self.session = get_listing_trading_date(market).isoformat()
+        self.stale_dropped = 0
+        self.fsync_interval = WRITE_JOURNAL_FSYNC_SEC if fsync_interval is None else max(0.0, fsync_interval)
+        self._last_fsync = 0.0
+        self._lock = threading.Lock()
+
+    def _append(self, records: Iterable[Dict[str, Any]]) -> None:
+        """레코드를 덧붙이고 flush합니다 (fsync는 fsync_interval 간격). 저널 기록 실패가 실제 쓰기를 막지 않도록 경고만 출력합니다."""
+        with self._lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    f.flush()
+                    now = time.monotonic()
+                    if now - self._last_fsync >= self.fsync_interval:
+                        os.fsync(f.fileno())
+                        self._last_fsync = now
+            except (OSError, TypeError, ValueError) as exc:
+                # TypeError/ValueError: JSON으로 직렬화할 수 없는 속성값 (해당 쓰기는 저널 없이 진행)
+                print(f"   ⚠️ 쓰기 저널 기록 실패 ({self.path}): {exc}")
+
+    def record_pending(self, payloads: List[Tuple[str, Dict[str, Any], str, str]]) -> None:
+        """전송 예정 페이로드를 pending 레코드로 기록합니다."""
+        self._append(
+            {"op": "pending", "session": self.session, "page_id": pid, "properties": props, "ticker": ticker, "name": name}
+            for pid, props, ticker, name in payloads
+        )
+
+    def mark_done(self, page_id: str) -> None:
+        """전송 성공한 페이지를 done 레코드로 기록합니다."""
+        self._append([{"op": "done", "page_id": page_id}])
+
+    def load_pending(self) -> List[Tuple[str, Dict[str, Any], str, str]]:
+        """
+        done 처리되지 않은 pending 페이로드를 기록 순서대로 반환합니다 (같은 페이지는 마지막 기록 기준).
+        현재 거래일(session)이 아닌 레코드는 버리고 stale_dropped에 건수를 남깁니다.
+        """
+        self.stale_dropped = 0
+        if not os.path.exists(self.path):
+            return []
+        pending: Dict[str, Tuple[str, Dict[str, Any], str, str]] = {}
+        with self._lock, open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 강제 종료로 마지막 줄이 잘린 경우 무시
+                    continue
+                pid = record.get("page_id")
+                if not pid:
+                    continue
+                if record.get("op") == "pending":
+                    pending.pop(pid, None)
+                    if record.get("session") != self.session:
+                        self.stale_dropped += 1
+                        continue
+                    pending[pid] = (pid, record.get("properties") or {}, record.get("ticker", ""), record.get("name", ""))
+                elif record.get("op") == "done":
+                    pending.pop(pid, None)
+        return list(pending.values())
+
+    def clear(self) -> None:
+        """
+        저널을 빈 파일로 비웁니다. (삭제하지 않는 이유: CI 캐시 저장 시 파일이 없으면 저장이 생략되어
+        다음 실행이 이미 재개된 과거 저널을 복원하게 되므로, 항상 최신 상태인 빈 파일을 남깁니다)
+        """
+        self.retain([])
+
+    def retain(self, payloads: List[Tuple[str, Dict[str, Any], str, str]]) -> None:
+        """저널을 주어진 페이로드(이번 실행에서 실패한 쓰기)만 pending으로 남긴 파일로 교체합니다. 빈 목록이면 빈 파일을 남깁니다."""
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    for pid, props, ticker, name in payloads:
+                        record = {"op": "pending", "session": self.session, "page_id": pid,
+                                  "properties": props, "ticker": ticker, "name": name}
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self._last_fsync = time.monotonic()
+            except (OSError, TypeError, ValueError) as exc:
+                print(f"   ⚠️ 쓰기 저널 정리 실패 ({self.path}): {exc}")
+
+
+def resume_pending_writes(
+    client: Any,
+    journal: WriteJournal,
+    max_workers: int = 6,
+    logger: Optional[Any] = None
+) -> Set[str]:
+    """
+    같은 거래일의 이전 실행에서 끝내지 못한 저널 페이로드를 먼저 전송하고, 성공한 page_id 집합을 반환합니다.
+    호출 측은 반환된 페이지를 이번 실행의 상류 데이터 수집 대상에서 제외할 수 있습니다.
+    """
+    pending = journal.load_pending()
+    if journal.stale_dropped:
+        message = f"🗑️ [Write Journal] 이전 거래일의 미완료 쓰기 {journal.stale_dropped}건은 재전송하지 않고 버립니다."
+        if logger:
+            logger.info(message)
+        else:
+            print(message)
+    if not pending:
+        journal.clear()
+        return set()
+
+    message = f"♻️ [Write Journal] 이전 실행의 미완료 쓰기 {len(pending)}건을 먼저 재개합니다."
+    if logger:
+        logger.info(message)
+    else:
+        print(message)
+
+    completed: Set[str] = set()
+    batch_update_pages(client, pending, max_workers=max_workers, logger=logger, journal=journal, on_success=completed.add)
+    return completed
+
+
 # ==============================================================================
 # 9. 공통 비즈니스 로직 및 퀀트/마스터 도메인 유틸리티 (SSOT Hub)
 # ==============================================================================
@@ -1662,7 +3621,7 @@ def load_benchmark_config(client: Any, benchmark_db_id: str, logger: Optional[An
         logger.info("🔍 지표지수 DB 동적 분석 및 매칭키워드 로드 시작...")
     config: Dict[str, Any] = {"ticker_to_id": {}, "benchmarks": []}
     try:
-        for page in paginate_database(client, benchmark_db_id, page_size=100, retry_delay=0.2):
+        for page in paginate_database_cached(client, benchmark_db_id, page_size=100, retry_delay=0.2):
             props = page.get("properties", {})
             ticker = get_page_text(props, ["티커", "Ticker", "이름", "Name"]).upper()
             if not ticker:
@@ -1694,12 +3653,16 @@ def load_benchmark_config(client: Any, benchmark_db_id: str, logger: Optional[An
 def batch_update_pages(
     client: Any,
     update_payloads: List[Tuple[str, Dict[str, Any], str, str]],
-    max_workers: int = 3,
-    delay: float = 0.05,
-    logger: Optional[Any] = None
+    max_workers: int = 6,
+    logger: Optional[Any] = None,
+    journal: Optional[WriteJournal] = None,
+    on_success: Optional[Callable[[str], None]] = None
 ) -> Tuple[int, int]:
     """
-    [(page_id, properties, ticker, name), ...] 형태의 페이로드를 받아 멀티스레드로 노션 DB에 안전하게 일괄 전송합니다.
+    [(page_id, properties, ticker, name), ...] 형태의 페이로드를 노션 DB에 일괄 전송합니다.
+    httpx.AsyncClient 기반 비동기 경로로 최대 max_workers건을 동시에 요청하며,
+    실제 전송 속도는 프로세스 공용 NOTION_WRITE_BUCKET(기본 초당 3건)이 결정하므로 청크 간 고정 대기가 없습니다.
+    journal을 주면 전송 전 전체 페이로드를 기록하고 성공 건마다 완료 표시하며, 배치가 끝나면 실패 건만 저널에 남깁니다.
     Returns:
         (success_count, fail_count)
     """
@@ -1707,42 +3670,296 @@ def batch_update_pages(
     if total_cnt == 0:
         return 0, 0
 
+    succeeded: Set[str] = set()
+
+    def _on_page_done(page_id: str) -> None:
+        succeeded.add(page_id)
+        if journal is not None:
+            journal.mark_done(page_id)
+        if on_success is not None:
+            on_success(page_id)
+
+    if journal is not None:
+        journal.record_pending(update_payloads)
+
     if logger:
-        logger.info(f"📝 총 {total_cnt}개 종목 노션 DB 반영 시작 (병렬 워커: {max_workers})...")
+        logger.info(f"📝 총 {total_cnt}개 종목 노션 DB 반영 시작 (동시 요청: {max_workers}, 속도 제한: 초당 {NOTION_WRITE_BUCKET.rate:g}건)...")
 
+    auth_token = _get_client_auth(client)
+    if auth_token:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            success_cnt, fail_cnt = asyncio.run(
+                _batch_update_pages_async(auth_token, update_payloads, max_workers, logger, _on_page_done)
+            )
+        else:
+            success_cnt, fail_cnt = _batch_update_pages_threaded(client, update_payloads, max_workers, logger, _on_page_done)
+    else:
+        success_cnt, fail_cnt = _batch_update_pages_threaded(client, update_payloads, max_workers, logger, _on_page_done)
+
+    if journal is not None:
+        journal.retain([p for p in update_payloads if p[0] not in succeeded])
+
+    if logger:
+        logger.info(f"✨ 노션 배치 업데이트 완료: 성공 {success_cnt}건 / 실패 {fail_cnt}건 (총 {total_cnt}건)")
+
+    return success_cnt, fail_cnt
+
+
+def _log_batch_result(logger: Optional[Any], idx: int, total_cnt: int, ticker: str, name: str, ok: bool) -> None:
+    """배치 업데이트 진행 상황을 25건 단위(및 실패 시 즉시)로 로깅합니다."""
+    if not logger:
+        return
+    if ok:
+        if idx % 25 == 0 or idx == total_cnt:
+            logger.info(f"   ✅ [{idx}/{total_cnt}] [Batch Sync] {ticker} ({name}) 성공")
+    else:
+        logger.warning(f"   ❌ [{idx}/{total_cnt}] [Batch Sync] {ticker} ({name}) 실패")
+
+
+async def _batch_update_pages_async(
+    auth_token: str,
+    update_payloads: List[Tuple[str, Dict[str, Any], str, str]],
+    max_workers: int,
+    logger: Optional[Any],
+    on_page_done: Callable[[str], None]
+) -> Tuple[int, int]:
+    """단일 AsyncClient와 세마포어로 동시 요청 수를 제한하며 전체 페이로드를 비동기 전송합니다."""
+    total_cnt = len(update_payloads)
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+    aclient = build_async_notion_client(auth_token)
+    counts = {"done": 0, "success": 0, "fail": 0}
+
+    async def _send(pid: str, props: Dict[str, Any], ticker: str, name: str) -> None:
+        async with semaphore:
+            try:
+                ok = await async_safe_page_update(aclient, pid, props)
+            except Exception as exc:
+                ok = False
+                if logger:
+                    logger.error(f"   ❌ [{ticker}] 트랜잭션 에러: {exc}")
+        counts["done"] += 1
+        counts["success" if ok else "fail"] += 1
+        if ok:
+            on_page_done(pid)
+        _log_batch_result(logger, counts["done"], total_cnt, ticker, name, ok)
+
+    try:
+        await asyncio.gather(*(_send(pid, props, ticker, name) for pid, props, ticker, name in update_payloads))
+    finally:
+        await aclient.aclose()
+
+    return counts["success"], counts["fail"]
+
+
+def _batch_update_pages_threaded(
+    client: Any,
+    update_payloads: List[Tuple[str, Dict[str, Any], str, str]],
+    max_workers: int,
+    logger: Optional[Any],
+    on_page_done: Callable[[str], None]
+) -> Tuple[int, int]:
+    """인증 토큰을 꺼낼 수 없는 클라이언트용 스레드 풀 폴백 (속도는 동일하게 NOTION_WRITE_BUCKET이 제어)."""
+    total_cnt = len(update_payloads)
     success_cnt = 0
     fail_cnt = 0
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
         futures = {
-            executor.submit(safe_page_update, client, pid, props): (ticker, name)
+            executor.submit(safe_page_update, client, pid, props): (pid, ticker, name)
             for pid, props, ticker, name in update_payloads
         }
 
         for idx, future in enumerate(as_completed(futures), 1):
-            ticker, name = futures[future]
+            pid, ticker, name = futures[future]
             try:
                 ok = future.result()
-                if ok:
-                    success_cnt += 1
-                    if logger and (idx % 25 == 0 or idx == total_cnt):
-                        logger.info(f"   ✅ [{idx}/{total_cnt}] [Batch Sync] {ticker} ({name}) 성공")
-                else:
-                    fail_cnt += 1
-                    if logger:
-                        logger.warning(f"   ❌ [{idx}/{total_cnt}] [Batch Sync] {ticker} ({name}) 실패")
             except Exception as exc:
-                fail_cnt += 1
+                ok = False
                 if logger:
                     logger.error(f"   ❌ [{ticker}] 트랜잭션 에러: {exc}")
+            if ok:
+                success_cnt += 1
+                on_page_done(pid)
+            else:
+                fail_cnt += 1
+            _log_batch_result(logger, idx, total_cnt, ticker, name, ok)
 
-            if delay > 0:
-                time.sleep(delay)
+    return success_cnt, fail_cnt
 
-    if logger:
-        logger.info(f"✨ 노션 배치 업데이트 완료: 성공 {success_cnt}건 / 실패 {fail_cnt}건 (총 {total_cnt}건)")
 
-    return success_cnt, fail_cnt
+_STREAM_END = object()
+
+
+def run_streaming_sync(
+    client: Any,
+    records: Iterable[Any],
+    build_fn: Callable[[Any], Any],
+    collect_workers: int = 4,
+    write_workers: int = 6,
+    queue_size: Optional[int] = None,
+    logger: Optional[Any] = None,
+    journal: Optional[WriteJournal] = None,
+    skip_ids: Optional[Set[str]] = None,
+    label_fn: Optional[Callable[[Any], str]] = None,
+    batch_size: int = 1
+) -> Dict[str, int]:
+    """
+    스캔 → 수집 → 노션 반영 3단계를 겹쳐 실행하는 스트리밍 파이프라인입니다.
+    - 스캔 스레드가 records(예: paginate_database_records)를 순회하며 수집 큐에 넣고,
+      collect_workers개 스레드가 build_fn으로 (page_id, properties, ticker, name) 페이로드를 만들어 쓰기 큐로 넘기며,
+      write_workers개 스레드가 safe_page_update로 즉시 반영합니다 (속도는 NOTION_WRITE_BUCKET이 제어).
+    - 두 큐 모두 크기가 제한되어 있어 느린 단계가 앞 단계를 자연스럽게 멈추게 하므로(backpressure) 메모리가 일정하게 유지됩니다.
+    - journal을 주면 쓰기 큐에 들어가는 페이로드를 pending으로, 성공 건을 done으로 기록하고 정상 종료 시 실패 건만 남깁니다.
+    - skip_ids에 포함된 페이지(저널 재개로 이미 반영된 페이지 등)는 수집 단계로 넘기지 않습니다.
+    - batch_size > 1이면 레코드를 batch_size개씩 묶어 넘기며, build_fn은 레코드 리스트를 받아 페이로드 리스트를 반환해야 합니다
+      (여러 종목을 한 번에 조회하는 벌크 시세 API용).
+    Returns:
+        {"scanned", "skipped", "collected", "errors", "success", "fail"} 건수 딕셔너리
+    """
+    collect_workers = max(1, collect_workers)
+    write_workers = max(1, write_workers)
+    collect_q: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size or collect_workers * 4)
+    write_q: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size or write_workers * 4)
+    stats = {"scanned": 0, "skipped": 0, "collected": 0, "errors": 0, "success": 0, "fail": 0}
+    stats_lock = threading.Lock()
+    scan_error: List[BaseException] = []
+    failed_payloads: List[Tuple[str, Dict[str, Any], str, str]] = []
+
+    def _log(message: str, warning: bool = False) -> None:
+        if logger:
+            (logger.warning if warning else logger.info)(message)
+        else:
+            print(message)
+
+    def _bump(key: str) -> int:
+        with stats_lock:
+            stats[key] += 1
+            return stats[key]
+
+    def _label(record: Any) -> str:
+        if label_fn is not None:
+            return label_fn(record)
+        if isinstance(record, PageRecord):
+            return record.text(["티커", "Ticker"]).upper() or record.id
+        return "UNKNOWN"
+
+    def _scan() -> None:
+        chunk: List[Any] = []
+        try:
+            for record in records:
+                _bump("scanned")
+                if skip_ids and getattr(record, "id", None) in skip_ids:
+                    _bump("skipped")
+                    continue
+                if batch_size <= 1:
+                    collect_q.put(record)
+                    continue
+                chunk.append(record)
+                if len(chunk) >= batch_size:
+                    collect_q.put(chunk)
+                    chunk = []
+        except BaseException as exc:
+            scan_error.append(exc)
+        finally:
+            if chunk:
+                collect_q.put(chunk)
+            for _ in range(collect_workers):
+                collect_q.put(_STREAM_END)
+
+    def _collect() -> None:
+        while True:
+            item = collect_q.get()
+            if item is _STREAM_END:
+                return
+            try:
+                if batch_size <= 1:
+                    payloads = [build_fn(item)]
+                else:
+                    payloads = list(build_fn(item) or [])
+            except Exception as exc:
+                _bump("errors")
+                if batch_size <= 1:
+                    label = _label(item)
+                else:
+                    label = f"{_label(item[0])}~{_label(item[-1])} {len(item)}건"
+                _log(f"❌ [{label}] 데이터 수집 중 예외 발생: {exc}", warning=True)
+                continue
+            for payload in payloads:
+                if not payload:
+                    continue
+                try:
+                    if journal is not None:
+                        journal.record_pending([payload])
+                except Exception as exc:
+                    # 수집 스레드가 죽으면 스캐너가 가득 찬 수집 큐에서 영원히 대기하므로 건별 예외로만 집계
+                    _bump("errors")
+                    _log(f"❌ [{payload[2]}] 쓰기 저널 기록 중 예외 발생: {exc}", warning=True)
+                    continue
+                _bump("collected")
+                write_q.put(payload)
+
+    def _write() -> None:
+        while True:
+            payload = write_q.get()
+            if payload is _STREAM_END:
+                return
+            pid, props, ticker, name = payload
+            try:
+                ok = safe_page_update(client, pid, props)
+            except Exception as exc:
+                ok = False
+                _log(f"   ❌ [{ticker}] 트랜잭션 에러: {exc}", warning=True)
+            if ok:
+                idx = _bump("success")
+                if journal is not None:
+                    journal.mark_done(pid)
+                if logger and idx % 25 == 0:
+                    logger.info(f"   ✅ [{idx}] [Stream Sync] {ticker} ({name}) 성공")
+            else:
+                _bump("fail")
+                with stats_lock:
+                    failed_payloads.append(payload)
+                _log(f"   ❌ [Stream Sync] {ticker} ({name}) 실패", warning=True)
+
+    _log(
+        f"🚰 [Stream Sync] 스캔·수집·반영 파이프라인 시작 "
+        f"(수집 {collect_workers}개 / 쓰기 {write_workers}개 스레드, 속도 제한: 초당 {NOTION_WRITE_BUCKET.rate:g}건)"
+    )
+
+    # 중단(Ctrl+C, 타임아웃) 시 프로세스 종료를 막지 않도록 데몬 스레드로 실행하며, 미완료 쓰기는 저널이 보존합니다.
+    scanner = threading.Thread(target=_scan, name="stream-scan", daemon=True)
+    collectors = [threading.Thread(target=_collect, name=f"stream-collect-{i}", daemon=True) for i in range(collect_workers)]
+    writers = [threading.Thread(target=_write, name=f"stream-write-{i}", daemon=True) for i in range(write_workers)]
+    for thread in [scanner] + collectors + writers:
+        thread.start()
+
+    scanner.join()
+    for thread in collectors:
+        thread.join()
+    for _ in writers:
+        write_q.put(_STREAM_END)
+    for thread in writers:
+        thread.join()
+
+    if scan_error:
+        raise scan_error[0]
+
+    if journal is not None:
+        journal.retain(failed_payloads)
+
+    _log(
+        f"✨ [Stream Sync] 완료: 스캔 {stats['scanned']}건 (저널 재개 제외 {stats['skipped']}건) / "
+        f"변경 감지 {stats['collected']}건 / 반영 성공 {stats['success']}건, 실패 {stats['fail']}건 / 수집 예외 {stats['errors']}건"
+    )
+    return stats
+
+
+QUANT_RESULT_KEYS = (
+    "ma200", "ma_supply", "trend", "mom_12m", "mom_diag", "drawdown_52w",
+    "vol_60d", "risk_grade", "smart_guide", "swing_high", "swing_low",
+)
 
 
 def calc_margin_of_safety(current_price: float, target_price: float) -> str:
@@ -1771,6 +3988,91 @@ def calc_52w_position(current_price: float, high_52w: float, low_52w: float) ->
     return round(pos, 4)
 
 
+def _finalize_quant_result(
+    curr_p: float,
+    ma_sup: float,
+    ma_200: float,
+    mom_12m: float,
+    drawdown_52w: Optional[float],
+    vol_60d: Optional[float],
+    swing_high: float,
+    swing_low: float,
+    is_kr: bool = False
+) -> Dict[str, Any]:
+    """5대 퀀트 엔진의 원시 집계값을 반올림하고 추세·모멘텀·위험도·스마트 가이드 라벨을 붙여 결과 딕셔너리로 만듭니다."""
+    digits = 0 if is_kr else 2
+    res: Dict[str, Any] = {
+        "ma200": round(ma_200, digits),
+        "ma_supply": round(ma_sup, digits),
+        "trend": None,
+        "mom_12m": round(mom_12m, 4),
+        "mom_diag": None,
+        "drawdown_52w": round(drawdown_52w, 4) if drawdown_52w is not None else None,
+        "vol_60d": round(vol_60d, 4) if vol_60d is not None else None,
+        "risk_grade": None,
+        "smart_guide": None,
+        "swing_high": round(swing_high, digits),
+        "swing_low": round(swing_low, digits),
+    }
+
+    # 1. 추세 판정 (수급선 + 200일선)
+    if is_kr:
+        if curr_p >= ma_sup and curr_p >= ma_200:
+            res["trend"] = "▲ 수급유입"
+        elif curr_p >= ma_200:
+            res["trend"] = "━ 박스권세"
+        else:
+            res["trend"] = "▼ 하락추세"
+    else:
+        if curr_p >= ma_sup and curr_p >= ma_200:
+            res["trend"] = "▲ 기관주도"
+        elif curr_p >= ma_200:
+            res["trend"] = "━ 눌림조정"
+        else:
+            res["trend"] = "▼ 하락추세"
+
+    # 2. 12M 모멘텀 5단계 진단
+    if mom_12m >= 0.50:
+        res["mom_diag"] = "▲ 주도대장"
+    elif mom_12m >= 0.20:
+        res["mom_diag"] = "▲ 실적지속"
+    elif mom_12m >= 0.05:
+        res["mom_diag"] = "▲ 시장동행"
+    elif mom_12m >= -0.10:
+        res["mom_diag"] = "━ 방향탐색"
+    else:
+        res["mom_diag"] = "▼ 자금이탈"
+
+    # 4. 위험도 등급 (60일 연환산 변동성)
+    if vol_60d is not None:
+        if vol_60d < 0.20:
+            res["risk_grade"] = "▲ 비중확대"
+        elif vol_60d < 0.35:
+            res["risk_grade"] = "━ 정상비중"
+        elif vol_60d < 0.60:
+            res["risk_grade"] = "▼ 비중조절"
+        else:
+            res["risk_grade"] = "▼ 소액접근"
+
+    # 5. 스마트 가이드 (표준 6종)
+    if curr_p >= ma_200:
+        if drawdown_52w is not None and drawdown_52w <= -0.20:
+            res["smart_guide"] = "▲ 분할매수"
+        elif curr_p >= ma_sup and mom_12m >= 0.50:
+            res["smart_guide"] = "▲ 추세탑승"
+        elif curr_p < ma_sup:
+            res["smart_guide"] = "━ 눌림지지"
+        else:
+            res["smart_guide"] = "▲ 상승유지"
+    else:
+        if drawdown_52w is not None and drawdown_52w <= -0.35:
+            res["smart_guide"] = "▼ 바닥확인"
+        else:
+            res["smart_guide"] = "▼ 하락관망"
+
+    return res
+
+
 def calculate_quant_indicators(
     df_chart: Any,
     current_price: Optional[float] = None,
@@ -1781,19 +4083,7 @@ def calculate_quant_indicators(
     GEMINI.md 5대 퀀트 엔진 수식에 따라 200일선, 수급선, 추세, 12M 모멘텀,
     모멘텀 진단, 52주 낙폭, 60일 변동성, 위험도 등급, 스마트 가이드, 스윙 고저점을 산출합니다.
     """
-    res: Dict[str, Any] = {
-        "ma200": None,
-        "ma_supply": None,
-        "trend": None,
-        "mom_12m": None,
-        "mom_diag": None,
-        "drawdown_52w": None,
-        "vol_60d": None,
-        "risk_grade": None,
-        "smart_guide": None,
-        "swing_high": None,
-        "swing_low": None,
-    }
+    res: Dict[str, Any] = dict.fromkeys(QUANT_RESULT_KEYS)
 
     if df_chart is None or getattr(df_chart, "empty", True):
         return res
@@ -1809,90 +4099,29 @@ def calculate_quant_indicators(
         ma_sup = float(c.rolling(supply_window).mean().iloc[-1]) if len(c) >= supply_window else float(c.mean())
         ma_200 = float(c.rolling(200).mean().iloc[-1]) if len(c) >= 200 else float(c.mean())
 
-        res["ma200"] = round(ma_200, 2 if not is_kr else 0)
-        res["ma_supply"] = round(ma_sup, 2 if not is_kr else 0)
-
-        # 1. 추세 판정 (수급선 + 200일선)
-        if is_kr:
-            if curr_p >= ma_sup and curr_p >= ma_200:
-                res["trend"] = "▲ 수급유입"
-            elif curr_p >= ma_200:
-                res["trend"] = "━ 박스권세"
-            else:
-                res["trend"] = "▼ 하락추세"
-        else:
-            if curr_p >= ma_sup and curr_p >= ma_200:
-                res["trend"] = "▲ 기관주도"
-            elif curr_p >= ma_200:
-                res["trend"] = "━ 눌림조정"
-            else:
-                res["trend"] = "▼ 하락추세"
-
-        # 2. 12M 모멘텀 및 5단계 진단
+        # 12M 모멘텀 (조회 구간 첫 종가 대비)
         start_p = float(c.iloc[0])
         mom_12m = ((curr_p - start_p) / start_p) if start_p > 0 else 0.0
-        res["mom_12m"] = round(mom_12m, 4)
-
-        if mom_12m >= 0.50:
-            res["mom_diag"] = "▲ 주도대장"
-        elif mom_12m >= 0.20:
-            res["mom_diag"] = "▲ 실적지속"
-        elif mom_12m >= 0.05:
-            res["mom_diag"] = "▲ 시장동행"
-        elif mom_12m >= -0.10:
-            res["mom_diag"] = "━ 방향탐색"
-        else:
-            res["mom_diag"] = "▼ 자금이탈"
 
-        # 3. 52주 최고가 대비 낙폭 (drawdown_52w)
+        # 52주 최고가 대비 낙폭 (drawdown_52w)
         peak_52w = float(high_52w_override) if high_52w_override and high_52w_override > 0 else (
             float(df_chart["High"].tail(252).max()) if "High" in df_chart.columns else float(c.tail(252).max())
         )
-        drawdown_52w = None
-        if peak_52w > 0:
-            drawdown_52w = (curr_p - peak_52w) / peak_52w
-            res["drawdown_52w"] = round(drawdown_52w, 4)
+        drawdown_52w = (curr_p - peak_52w) / peak_52w if peak_52w > 0 else None
 
-        # 4. 60일 연환산 변동성 및 위험도 등급
+        # 60일 연환산 변동성
         returns_60 = c.pct_change().tail(60).dropna()
-        if len(returns_60) >= 5:
-            vol_60d = float(returns_60.std() * math.sqrt(252))
-            res["vol_60d"] = round(vol_60d, 4)
-
-            if vol_60d < 0.20:
-                res["risk_grade"] = "▲ 비중확대"
-            elif vol_60d < 0.35:
-                res["risk_grade"] = "━ 정상비중"
-            elif vol_60d < 0.60:
-                res["risk_grade"] = "▼ 비중조절"
-            else:
-                res["risk_grade"] = "▼ 소액접근"
-
-        # 5. 스마트 가이드 (표준 6종)
-        if curr_p >= ma_200:
-            if drawdown_52w is not None and drawdown_52w <= -0.20:
-                res["smart_guide"] = "▲ 분할매수"
-            elif curr_p >= ma_sup and mom_12m >= 0.50:
-                res["smart_guide"] = "▲ 추세탑승"
-            elif curr_p < ma_sup:
-                res["smart_guide"] = "━ 눌림지지"
-            else:
-                res["smart_guide"] = "▲ 상승유지"
-        else:
-            if drawdown_52w is not None and drawdown_52w <= -0.35:
-                res["smart_guide"] = "▼ 바닥확인"
-            else:
-                res["smart_guide"] = "▼ 하락관망"
+        vol_60d = float(returns_60.std() * math.sqrt(252)) if len(returns_60) >= 5 else None
 
-        # 6. 최근 20영업일 스윙 고점/저점
+        # 최근 20영업일 스윙 고점/저점
         if "High" in df_chart.columns and "Low" in df_chart.columns:
             recent_20 = df_chart.tail(20)
-            res["swing_high"] = round(float(recent_20["High"].max()), 2 if not is_kr else 0)
-            res["swing_low"] = round(float(recent_20["Low"].min()), 2 if not is_kr else 0)
+            swing_high, swing_low = float(recent_20["High"].max()), float(recent_20["Low"].min())
         else:
             recent_20_c = c.tail(20)
-            res["swing_high"] = round(float(recent_20_c.max()), 2 if not is_kr else 0)
-            res["swing_low"] = round(float(recent_20_c.min()), 2 if not is_kr else 0)
+            swing_high, swing_low = float(recent_20_c.max()), float(recent_20_c.min())
+
+        res = _finalize_quant_result(curr_p, ma_sup, ma_200, mom_12m, drawdown_52w, vol_60d, swing_high, swing_low, is_kr)
 
     except Exception:
         pass
@@ -1900,4 +4129,951 @@ def calculate_quant_indicators(
     return res
 
 
-
\ No newline at end of file
+def calculate_quant_panel(
+    close: Any,
+    high: Any = None,
+    low: Any = None,
+    current_price: Any = None,
+    is_kr: bool = False,
+    high_52w_override: Any = None,
+    present: Any = None
+) -> Dict[str, Any]:
+    """
+    calculate_quant_indicators의 패널(일자 × 종목) 버전입니다. 정렬된 2차원 종가/고가/저가 행렬을 받아
+    전 종목의 200일선, 수급선, 12M 모멘텀, 52주 낙폭, 60일 변동성, 20일 스윙 고저점과 진단 라벨을
+    한 번의 NumPy 연산으로 산출하여 키별 길이 N(종목 수) 배열 딕셔너리로 반환합니다.
+    - 결측(NaN)은 상장 전·거래정지 구간으로 보고 종목별로 유효 봉만 아래쪽으로 모아 단일 종목 계산과 같은 창을 사용합니다.
+    - 단일 종목 엔진은 종가만 dropna하고 고가·저가 창(52주 고점, 20일 스윙)은 원본 일봉 행 기준이므로,
+      고가·저가는 유효 종가 행이 아니라 present(종목별 원본 일봉 존재 여부, 미지정 시 종가·고가·저가 중 하나라도 있는 행)로 모읍니다.
+    - current_price / high_52w_override는 길이 N 배열이며, 0 이하·NaN 항목은 미지정으로 취급합니다.
+    - 유효 봉이 하나도 없는 종목의 값은 None입니다.
+    """
+    import numpy as np
+
+    c_mat = np.asarray(close, dtype="float64")
+    if c_mat.ndim != 2:
+        raise ValueError("close 행렬은 (일자, 종목) 2차원이어야 합니다.")
+    n_cols = c_mat.shape[1]
+    col_idx = np.arange(n_cols)
+    digits = 0 if is_kr else 2
+
+    # 1. 종목별 유효 봉을 원래 순서대로 아래쪽으로 정렬 (tail 창 = 해당 종목의 최근 N개 유효 봉)
+    valid = ~np.isnan(c_mat)
+    order = np.argsort(valid, axis=0, kind="stable")
+    valid = np.take_along_axis(valid, order, axis=0)
+    c_mat = np.take_along_axis(c_mat, order, axis=0)
+
+    # 고가·저가는 종가가 비어 있어도 원본 일봉 행이면 창에 포함 (종가 NaN·고가 존재 행에서 단일 종목 엔진과 일치)
+    raw_h = None if high is None else np.asarray(high, dtype="float64")
+    raw_l = None if low is None else np.asarray(low, dtype="float64")
+    if present is None:
+        rows = ~np.isnan(np.asarray(close, dtype="float64"))
+        for raw in (raw_h, raw_l):
+            if raw is not None:
+                rows = rows | ~np.isnan(raw)
+    else:
+        rows = np.asarray(present, dtype=bool)
+    row_order = np.argsort(rows, axis=0, kind="stable")
+    rows = np.take_along_axis(rows, row_order, axis=0)
+
+    def _align(arr: Any) -> Any:
+        if arr is None:
+            return None
+        return np.where(rows, np.take_along_axis(arr, row_order, axis=0), np.nan)
+
+    h_mat, l_mat = _align(raw_h), _align(raw_l)
+    has_hl = np.zeros(n_cols, dtype=bool)
+    if h_mat is not None and l_mat is not None:
+        has_hl = (~np.isnan(h_mat)).any(axis=0) & (~np.isnan(l_mat)).any(axis=0)
+
+    def _override(values: Any) -> Any:
+        if values is None:
+            return np.full(n_cols, np.nan)
+        arr = np.asarray(values, dtype="float64")
+        return np.where(np.isfinite(arr) & (arr > 0), arr, np.nan)
+
+    def _tail_mean(window: int) -> Any:
+        tail = c_mat[-window:]
+        return np.nansum(tail, axis=0) / (~np.isnan(tail)).sum(axis=0)
+
+    def _tail_extreme(mat: Any, window: int, reducer: Any) -> Any:
+        return reducer.reduce(mat[-window:], axis=0)
+
+    cnt = valid.sum(axis=0)
+    has = cnt > 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        last_p = c_mat[-1]
+        curr_p = _override(current_price)
+        curr_p = np.where(np.isnan(curr_p), last_p, curr_p)
+
+        supply_window = 60 if is_kr else 50
+        ma_sup = _tail_mean(supply_window)
+        ma_200 = _tail_mean(200)
+
+        # 2. 12M 모멘텀 (조회 구간 첫 유효 종가 대비)
+        start_p = c_mat[np.clip(c_mat.shape[0] - cnt, 0, c_mat.shape[0] - 1), col_idx]
+        mom_12m = np.where(start_p > 0, (curr_p - start_p) / start_p, 0.0)
+
+        # 3. 52주 최고가 대비 낙폭
+        peak_src = np.where(has_hl, _tail_extreme(h_mat, 252, np.fmax), np.nan) if h_mat is not None else np.full(n_cols, np.nan)
+        peak_src = np.where(has_hl, peak_src, _tail_extreme(c_mat, 252, np.fmax))
+        peak_52w = _override(high_52w_override)
+        peak_52w = np.where(np.isnan(peak_52w), peak_src, peak_52w)
+        drawdown_52w = np.where(peak_52w > 0, (curr_p - peak_52w) / peak_52w, np.nan)
+
+        # 4. 60일 연환산 변동성 (최근 61개 유효 종가의 일간 수익률 표본표준편차)
+        tail_c = c_mat[-61:]
+        rets = tail_c[1:] / tail_c[:-1] - 1.0
+        n_rets = (~np.isnan(rets)).sum(axis=0)
+        mean_r = np.nansum(rets, axis=0) / n_rets
+        var_r = np.nansum((rets - mean_r) ** 2, axis=0) / (n_rets - 1)
+        vol_60d = np.where(n_rets >= 5, np.sqrt(var_r) * math.sqrt(252), np.nan)
+
+        # 6. 최근 20영업일 스윙 고점/저점
+        swing_src_h = _tail_extreme(c_mat, 20, np.fmax)
+        swing_src_l = _tail_extreme(c_mat, 20, np.fmin)
+        if h_mat is not None and l_mat is not None:
+            swing_src_h = np.where(has_hl, _tail_extreme(h_mat, 20, np.fmax), swing_src_h)
+            swing_src_l = np.where(has_hl, _tail_extreme(l_mat, 20, np.fmin), swing_src_l)
+
+    # 5. 진단 라벨 (단일 종목 엔진과 동일한 임계값을 벡터 조건으로 적용)
+    above_sup = curr_p >= ma_sup
+    above_200 = curr_p >= ma_200
+    trend_labels = ("▲ 수급유입", "━ 박스권세") if is_kr else ("▲ 기관주도", "━ 눌림조정")
+    trend = np.select([above_sup & above_200, above_200], list(trend_labels), default="▼ 하락추세")
+    mom_diag = np.select(
+        [mom_12m >= 0.50, mom_12m >= 0.20, mom_12m >= 0.05, mom_12m >= -0.10],
+        ["▲ 주도대장", "▲ 실적지속", "▲ 시장동행", "━ 방향탐색"],
+        default="▼ 자금이탈",
+    )
+    has_vol = ~np.isnan(vol_60d)
+    risk_grade = np.select(
+        [vol_60d < 0.20, vol_60d < 0.35, vol_60d < 0.60], ["▲ 비중확대", "━ 정상비중", "▼ 비중조절"], default="▼ 소액접근"
+    )
+    has_dd = ~np.isnan(drawdown_52w)
+    smart_guide = np.select(
+        [
+            above_200 & has_dd & (drawdown_52w <= -0.20),
+            above_200 & above_sup & (mom_12m >= 0.50),
+            above_200 & ~above_sup,
+            above_200,
+            has_dd & (drawdown_52w <= -0.35),
+        ],
+        ["▲ 분할매수", "▲ 추세탑승", "━ 눌림지지", "▲ 상승유지", "▼ 바닥확인"],
+        default="▼ 하락관망",
+    )
+
+    def _num(values: Any, ndigits: int, mask: Any = None) -> Any:
+        keep = has if mask is None else has & mask
+        out = np.full(n_cols, None, dtype=object)
+        out[keep] = [round(float(v), ndigits) for v in values[keep]]
+        return out
+
+    def _label(values: Any, mask: Any = None) -> Any:
+        keep = has if mask is None else has & mask
+        out = np.full(n_cols, None, dtype=object)
+        out[keep] = [str(v) for v in values[keep]]
+        return out
+
+    return {
+        "ma200": _num(ma_200, digits),
+        "ma_supply": _num(ma_sup, digits),
+        "trend": _label(trend),
+        "mom_12m": _num(mom_12m, 4),
+        "mom_diag": _label(mom_diag),
+        "drawdown_52w": _num(drawdown_52w, 4, has_dd),
+        "vol_60d": _num(vol_60d, 4, has_vol),
+        "risk_grade": _label(risk_grade, has_vol),
+        "smart_guide": _label(smart_guide),
+        "swing_high": _num(swing_src_h, digits),
+        "swing_low": _num(swing_src_l, digits),
+    }
+
+
+def calculate_quant_indicators_panel(
+    histories: Dict[str, Any],
+    current_prices: Optional[Dict[str, Optional[float]]] = None,
+    is_kr: bool = False,
+    high_52w_overrides: Optional[Dict[str, Optional[float]]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    종목별 일봉 DataFrame 딕셔너리를 일자 기준으로 정렬한 패널로 묶어 calculate_quant_panel을 한 번 호출하고,
+    calculate_quant_indicators와 같은 키 구조의 결과를 {티커: 결과} 딕셔너리로 반환합니다.
+    """
+    import numpy as np
+
+    results: Dict[str, Dict[str, Any]] = {}
+    frames: Dict[str, Any] = {}
+    for ticker, df in histories.items():
+        results[ticker] = dict.fromkeys(QUANT_RESULT_KEYS)
+        if df is not None and not getattr(df, "empty", True):
+            frames[ticker] = df
+    if not frames:
+        return results
+
+    # 일자 합집합을 만든 뒤 종목별 일봉을 searchsorted 위치로 한 번에 채워 넣음 (종목별 reindex 대비 정렬 비용 절감)
+    tickers = list(frames)
+    for ticker in tickers:
+        df = frames[ticker]
+        if df.index.has_duplicates:
+            frames[ticker] = df[~df.index.duplicated(keep="last")]
+    dates = np.unique(np.concatenate([frames[t].index.to_numpy() for t in tickers]))
+    shape = (len(dates), len(tickers))
+    c_mat, h_mat, l_mat = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+    present = np.zeros(shape, dtype=bool)
+    for col, ticker in enumerate(tickers):
+        df = frames[ticker]
+        rows = np.searchsorted(dates, df.index.to_numpy())
+        present[rows, col] = True
+        close = df["Close"] if "Close" in df.columns else df.iloc[:, 0]
+        c_mat[rows, col] = close.to_numpy(dtype="float64", na_value=np.nan)
+        if "High" in df.columns and "Low" in df.columns:
+            h_mat[rows, col] = df["High"].to_numpy(dtype="float64", na_value=np.nan)
+            l_mat[rows, col] = df["Low"].to_numpy(dtype="float64", na_value=np.nan)
+
+    panel = calculate_quant_panel(
+        c_mat,
+        high=h_mat,
+        low=l_mat,
+        current_price=[safe_float((current_prices or {}).get(t)) or np.nan for t in tickers],
+        is_kr=is_kr,
+        high_52w_override=[safe_float((high_52w_overrides or {}).get(t)) or np.nan for t in tickers],
+        present=present,
+    )
+    for pos, ticker in enumerate(tickers):
+        results[ticker] = {key: values[pos] for key, values in panel.items()}
+    return results
+
+
+# ==============================================================================
+# 9-1. 로컬 일봉(OHLCV) 컬럼형 저장소 (재무 동기화 간 증분 일봉 재사용)
+# ==============================================================================
+OHLCV_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ohlcv_store")
+OHLCV_STORE_ENABLED = os.environ.get("OHLCV_STORE", "on").lower() not in ("off", "false", "0")
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+# 증분 수신 시 저장된 마지막 구간과 겹쳐 받는 일수 (수정주가 반영·장중 미확정 봉 교체 확인용)
+OHLCV_OVERLAP_DAYS = 7
+OHLCV_ADJUST_TOLERANCE = 1e-3
+
+# Parquet 엔진(pyarrow, requirements.txt에 포함)이 없는 환경에서는 pickle 포맷으로 저장
+_OHLCV_EXT = ".parquet" if importlib.util.find_spec("pyarrow") is not None else ".pkl"
+
+
+class OHLCVStore:
+    """
+    종목별 일봉(Open/High/Low/Close/Volume)을 .ohlcv_store/{시장}/{티커}.parquet 로 보관하는 로컬 저장소입니다.
+    - 최초 실행(또는 보관 구간이 부족할 때): 조회 구간 전체를 한 번 수신
+    - 이후 실행: 마지막 보관일 - OHLCV_OVERLAP_DAYS 부터의 최근 구간만 수신하여 덧붙임
+    - 겹치는 구간의 종가가 달라졌다면(액면분할·배당 등 수정주가 재계산) 전체 구간을 다시 수신
+    fetch_fn(start: date)은 start 이후의 일봉 DataFrame(DatetimeIndex, OHLCV 컬럼)을 반환해야 합니다.
+    """
+
+    def __init__(self, root: str = OHLCV_STORE_DIR):
+        self.root = root
+        self.full_fetches = 0
+        self.incremental_fetches = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def _path(self, market: str, ticker: str) -> str:
+        safe_ticker = re.sub(r"[^0-9A-Za-z._-]", "_", ticker.strip().upper())
+        return os.path.join(self.root, market.upper(), f"{safe_ticker}{_OHLCV_EXT}")
+
+    @staticmethod
+    def _normalize(df: Any) -> Optional["pd.DataFrame"]:
+        """인덱스를 tz 없는 일자(00:00)로 맞추고 OHLCV 컬럼만 남겨 정렬·중복 제거합니다."""
+        import pandas as pd
+
+        if df is None or getattr(df, "empty", True):
+            return None
+        out = df[[col for col in OHLCV_COLUMNS if col in df.columns]].copy()
+        idx = pd.DatetimeIndex(out.index)
+        if idx.tz is not None:
+            idx = idx.tz_localize(None)
+        out.index = pd.DatetimeIndex(idx.to_series().dt.normalize())
+        out = out[~out.index.duplicated(keep="last")].sort_index()
+        return out.astype("float64")
+
+    def _load(self, path: str) -> Any:
+        import pandas as pd
+
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_pickle(path)
+        except Exception:
+            return None
+
+    def _save(self, path: str, df: Any) -> None:
+        """임시 파일에 쓴 뒤 교체하여 중간에 끊겨도 손상된 파일이 남지 않게 합니다."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            if path.endswith(".parquet"):
+                df.to_parquet(tmp_path)
+            else:
+                df.to_pickle(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            print(f"   ⚠️ 일봉 저장소 기록 실패 ({path}): {exc}")
+
+    @staticmethod
+    def _overlap_matches(stored: "pd.DataFrame", fresh: "pd.DataFrame") -> bool:
+        """겹치는 일자의 종가가 허용 오차 안에서 같은지 확인합니다. (마지막 보관일은 장중 미확정 봉일 수 있어 제외)"""
+        common = stored.index[:-1].intersection(fresh.index)
+        if len(common) == 0 or "Close" not in stored.columns or "Close" not in fresh.columns:
+            return len(common) == 0
+        old_c = stored.loc[common, "Close"]
+        new_c = fresh.loc[common, "Close"]
+        rel_diff = ((new_c - old_c).abs() / old_c.abs().where(old_c != 0)).fillna(0)
+        return bool((rel_diff <= OHLCV_ADJUST_TOLERANCE).all())
+
+    def _refresh(
+        self,
+        stored: Optional["pd.DataFrame"],
+        start: date,
+        fetch_fn: Callable[[date], Any],
+    ) -> Optional["pd.DataFrame"]:
+        """보관분에 최근 구간을 덧붙이거나(증분) 전체 구간을 새로 받아 병합 결과를 반환합니다. 받은 것이 없으면 보관분을 그대로 반환합니다."""
+        import pandas as pd
+
+        # 보관분이 조회 시작일 근처(주말·연휴 여유 7일)부터 있을 때만 증분 수신
+        if stored is not None and cast("pd.Timestamp", stored.index[0]).date() <= start + timedelta(days=7):
+            fetch_from = cast("pd.Timestamp", stored.index[-1]).date() - timedelta(days=OHLCV_OVERLAP_DAYS)
+            fresh = self._normalize(fetch_fn(fetch_from))
+            if fresh is None:
+                return stored
+            if self._overlap_matches(stored, fresh):
+                with self._lock:
+                    self.incremental_fetches += 1
+                return cast("pd.DataFrame", pd.concat([stored[stored.index < fresh.index[0]], fresh]))
+
+        fresh = self._normalize(fetch_fn(start))
+        if fresh is None:
+            return stored
+        with self._lock:
+            self.full_fetches += 1
+        return fresh
+
+    def get_history(
+        self,
+        market: str,
+        ticker: str,
+        lookback_days: int,
+        fetch_fn: Callable[[date], Any],
+    ) -> Any:
+        """
+        최근 lookback_days 일의 일봉을 반환합니다. 보관분이 있으면 부족한 최근 구간만 fetch_fn으로 받아 덧붙입니다.
+        수신 실패 시에는 보관분을(없으면 None을) 그대로 반환합니다.
+        """
+        import pandas as pd
+
+        start = (get_kst_now() - timedelta(days=lookback_days)).date()
+        if not OHLCV_STORE_ENABLED:
+            return self._normalize(fetch_fn(start))
+
+        path = self._path(market, ticker)
+        stored = self._normalize(self._load(path))
+        merged = stored
+        try:
+            merged = self._refresh(stored, start, fetch_fn)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+
+        if merged is None:
+            return None
+        if merged is not stored:
+            self._save(path, merged[merged.index >= merged.index[-1] - timedelta(days=max(lookback_days, 400))])
+        return merged[merged.index >= pd.Timestamp(start)]
+
+    def summary(self) -> str:
+        """전체/증분 수신 및 실패 건수를 한 줄 요약 문자열로 반환합니다."""
+        return (
+            f"일봉 저장소 전체 수신 {self.full_fetches}건 / 증분 수신 {self.incremental_fetches}건"
+            f" / 실패 {self.failures}건"
+        )
+
+
+OHLCV_STORE = OHLCVStore()
+
+
+# ==============================================================================
+# 9-2. 종목별 퀀트 지표 롤링 상태 (새 일봉 1개당 O(1) 증분 갱신)
+# ==============================================================================
+QUANT_STATE_ENABLED = os.environ.get("QUANT_STATE", "on").lower() not in ("off", "false", "0")
+QUANT_STATE_VERSION = 2
+# 누적 합·분산의 부동소수점 오차가 쌓이지 않도록 일정 커밋 횟수마다 창 전체로 재계산(재앵커링)
+QUANT_STATE_REANCHOR_EVERY = 64
+_QUANT_VOL_WINDOW = 60
+_QUANT_PEAK_WINDOW = 252
+_QUANT_SWING_WINDOW = 20
+
+
+class RollingQuantState:
+    """
+    종목 1개의 확정 일봉에 대한 롤링 상태입니다. calculate_quant_indicators와 같은 창을 다음 자료구조로 유지합니다.
+    - 수급선/200일선: 창 덱 + 누적 합 (신규 봉 가산, 창 밖 봉 감산)
+    - 60일 변동성: 최근 60개 일간 수익률의 Welford 평균·제곱편차합 (추가·제거 모두 O(1))
+    - 52주 고점 / 20일 스윙 고저점: 단조 덱 (덱 앞이 창 내 최댓값·최솟값)
+    - 12M 모멘텀 시작가: 조회 구간(캘린더) 안의 종가 덱
+    종가 창은 종가가 있는 봉만 세고, 고가·저가 창은 단일 종목 엔진처럼 원본 일봉 행 단위로 세되 NaN 값만 건너뜁니다.
+    마지막 일봉은 장중 미확정일 수 있으므로 커밋하지 않고 evaluate()에서 덮어보기(peek)로만 반영하며,
+    다음 실행에서 확정값으로 커밋됩니다.
+    """
+
+    def __init__(self, is_kr: bool = False):
+        self.version = QUANT_STATE_VERSION
+        self.is_kr = is_kr
+        self.supply_window = 60 if is_kr else 50
+        self.seq = -1                       # 원본 일봉 행 순번 (고가·저가 창 기준)
+        self.last_ord: Optional[int] = None  # 마지막으로 커밋한 종가의 일자 서수
+        self.last_close: Optional[float] = None
+        self.last_row_ord: Optional[int] = None  # 마지막으로 커밋한 행의 일자 서수 (종가가 NaN일 수 있음)
+        self.last_row_close: Optional[float] = None
+        self.window: Any = deque()          # (일자 서수, 종가) - 조회 구간 전체
+        self.sup: Any = deque()             # (일자 서수, 종가) - 최근 supply_window개
+        self.sup_sum = 0.0
+        self.ma200: Any = deque()           # (일자 서수, 종가) - 최근 200개
+        self.ma200_sum = 0.0
+        self.rets: Any = deque()            # (직전 일자 서수, 수익률) - 최근 60개
+        self.ret_mean = 0.0
+        self.ret_m2 = 0.0
+        self.peak: Any = deque()            # (순번, 일자 서수, 고가) - 단조 감소
+        self.swing_hi: Any = deque()        # (순번, 일자 서수, 고가) - 단조 감소
+        self.swing_lo: Any = deque()        # (순번, 일자 서수, 저가) - 단조 증가
+        self.commits_since_anchor = 0
+
+    # ---- Welford 증분 평균·분산 ----
+    @staticmethod
+    def _welford_add(n: int, mean: float, m2: float, x: float) -> Tuple[float, float]:
+        delta = x - mean
+        mean += delta / (n + 1)
+        return mean, m2 + delta * (x - mean)
+
+    @staticmethod
+    def _welford_remove(n: int, mean: float, m2: float, x: float) -> Tuple[float, float]:
+        if n <= 1:
+            return 0.0, 0.0
+        new_mean = mean - (x - mean) / (n - 1)
+        return new_mean, m2 - (x - mean) * (x - new_mean)
+
+    # ---- 단조 덱 ----
+    @staticmethod
+    def _mono_push(dq: Any, seq: int, ordinal: int, value: Optional[float], window: int, is_max: bool) -> None:
+        """창 밖 원소를 먼저 내보낸 뒤 value를 넣습니다. value가 None(NaN)이면 순번만 진행하고 덱에는 넣지 않습니다."""
+        while dq and dq[0][0] <= seq - window:
+            dq.popleft()
+        if value is None:
+            return
+        while dq and (dq[-1][2] <= value if is_max else dq[-1][2] >= value):
+            dq.pop()
+        dq.append((seq, ordinal, value))
+
+    def _mono_peek(self, dq: Any, value: Optional[float], window: int, is_max: bool) -> float:
+        """다음 봉(value)을 넣었다고 가정한 창의 극값을 상태 변경 없이 반환합니다. (창에서 빠질 수 있는 것은 덱 앞 1개뿐, 값이 없으면 NaN)"""
+        front = dq[0][2] if dq else None
+        if dq and dq[0][0] <= self.seq + 1 - window:
+            front = dq[1][2] if len(dq) > 1 else None
+        values = [v for v in (front, value) if v is not None]
+        if not values:
+            return float("nan")
+        return max(values) if is_max else min(values)
+
+    def evict_before(self, start_ord: int) -> None:
+        """조회 구간 시작일 이전 봉을 모든 창에서 제거합니다. (시작일은 실행마다 늦어지므로 제거는 영구 반영)"""
+        while self.window and self.window[0][0] < start_ord:
+            self.window.popleft()
+        while self.sup and self.sup[0][0] < start_ord:
+            self.sup_sum -= self.sup.popleft()[1]
+        while self.ma200 and self.ma200[0][0] < start_ord:
+            self.ma200_sum -= self.ma200.popleft()[1]
+        while self.rets and self.rets[0][0] < start_ord:
+            self.ret_mean, self.ret_m2 = self._welford_remove(len(self.rets), self.ret_mean, self.ret_m2, self.rets[0][1])
+            self.rets.popleft()
+        for dq in (self.peak, self.swing_hi, self.swing_lo):
+            while dq and dq[0][1] < start_ord:
+                dq.popleft()
+
+    def push(self, ordinal: int, close: Optional[float], high: Optional[float], low: Optional[float]) -> None:
+        """확정 일봉 1개를 커밋합니다. (O(1), 재앵커링 시점만 창 길이만큼) 종가가 None이면 고가·저가 창만 진행합니다."""
+        self.seq += 1
+        self._mono_push(self.peak, self.seq, ordinal, high, _QUANT_PEAK_WINDOW, True)
+        self._mono_push(self.swing_hi, self.seq, ordinal, high, _QUANT_SWING_WINDOW, True)
+        self._mono_push(self.swing_lo, self.seq, ordinal, low, _QUANT_SWING_WINDOW, False)
+        self.last_row_ord, self.last_row_close = ordinal, close
+        if close is None:
+            return
+
+        self.window.append((ordinal, close))
+        self.sup.append((ordinal, close))
+        self.sup_sum += close
+        if len(self.sup) > self.supply_window:
+            self.sup_sum -= self.sup.popleft()[1]
+        self.ma200.append((ordinal, close))
+        self.ma200_sum += close
+        if len(self.ma200) > 200:
+            self.ma200_sum -= self.ma200.popleft()[1]
+
+        if self.last_close and self.last_ord is not None:
+            ret = close / self.last_close - 1.0
+            self.ret_mean, self.ret_m2 = self._welford_add(len(self.rets), self.ret_mean, self.ret_m2, ret)
+            self.rets.append((self.last_ord, ret))
+            if len(self.rets) > _QUANT_VOL_WINDOW:
+                self.ret_mean, self.ret_m2 = self._welford_remove(len(self.rets), self.ret_mean, self.ret_m2, self.rets[0][1])
+                self.rets.popleft()
+        self.last_ord, self.last_close = ordinal, close
+
+        self.commits_since_anchor += 1
+        if self.commits_since_anchor >= QUANT_STATE_REANCHOR_EVERY:
+            self.reanchor()
+
+    def reanchor(self) -> None:
+        """누적 합과 Welford 통계를 창 전체로 다시 계산하여 부동소수점 오차 누적을 없앱니다."""
+        self.sup_sum = math.fsum(v for _, v in self.sup)
+        self.ma200_sum = math.fsum(v for _, v in self.ma200)
+        n = len(self.rets)
+        self.ret_mean = math.fsum(r for _, r in self.rets) / n if n else 0.0
+        self.ret_m2 = math.fsum((r - self.ret_mean) ** 2 for _, r in self.rets) if n else 0.0
+        self.commits_since_anchor = 0
+
+    def evaluate(
+        self,
+        close: Optional[float],
+        high: Optional[float],
+        low: Optional[float],
+        current_price: Optional[float] = None,
+        high_52w_override: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        커밋된 상태에 미확정 마지막 봉(close/high/low)을 덮어본 결과로 퀀트 지표를 O(1)에 산출합니다. (상태는 변경하지 않음)
+        마지막 봉의 종가가 None이면 종가 창은 커밋된 상태 그대로 사용합니다 (단일 종목 엔진의 dropna와 동일).
+        """
+        last_close = close if close is not None else self.last_close
+        if last_close is None:
+            return dict.fromkeys(QUANT_RESULT_KEYS)
+        curr_p = float(current_price) if current_price and current_price > 0 else last_close
+
+        def _peek_mean(dq: Any, total: float, window: int) -> float:
+            if close is None:
+                return total / len(dq) if dq else last_close
+            if len(dq) >= window:
+                return (total - dq[0][1] + close) / window
+            return (total + close) / (len(dq) + 1)
+
+        ma_sup = _peek_mean(self.sup, self.sup_sum, self.supply_window)
+        ma_200 = _peek_mean(self.ma200, self.ma200_sum, 200)
+
+        start_p = self.window[0][1] if self.window else last_close
+        mom_12m = ((curr_p - start_p) / start_p) if start_p > 0 else 0.0
+
+        vol_60d = None
+        n, mean, m2 = len(self.rets), self.ret_mean, self.ret_m2
+        if close is not None and self.last_close:
+            if n >= _QUANT_VOL_WINDOW:
+                mean, m2 = self._welford_remove(n, mean, m2, self.rets[0][1])
+                n -= 1
+            mean, m2 = self._welford_add(n, mean, m2, close / self.last_close - 1.0)
+            n += 1
+        if n >= 5:
+            vol_60d = math.sqrt(max(m2, 0.0) / (n - 1)) * math.sqrt(252)
+
+        peak_52w = float(high_52w_override) if high_52w_override and high_52w_override > 0 else (
+            self._mono_peek(self.peak, high, _QUANT_PEAK_WINDOW, True)
+        )
+        drawdown_52w = (curr_p - peak_52w) / peak_52w if peak_52w > 0 else None
+        swing_high = self._mono_peek(self.swing_hi, high, _QUANT_SWING_WINDOW, True)
+        swing_low = self._mono_peek(self.swing_lo, low, _QUANT_SWING_WINDOW, False)
+
+        return _finalize_quant_result(curr_p, ma_sup, ma_200, mom_12m, drawdown_52w, vol_60d, swing_high, swing_low, self.is_kr)
+
+
+class RollingQuantStore:
+    """
+    OHLCVStore 옆(.ohlcv_store/{시장}/{티커}.qstate)에 종목별 RollingQuantState를 보관하고,
+    새로 들어온 확정 일봉만 커밋하여 퀀트 지표를 종목당 O(1)로 갱신합니다.
+    상태가 없거나 커밋된 마지막 봉이 일봉 저장소와 달라졌으면(수정주가 재계산 등) 해당 종목은 패널 엔진으로 계산하고 상태를 다시 만듭니다.
+    """
+
+    def __init__(self, ohlcv_store: OHLCVStore):
+        self.ohlcv_store = ohlcv_store
+        self.incremental = 0
+        self.rebuilt = 0
+        self._lock = threading.Lock()
+
+    def _path(self, market: str, ticker: str) -> str:
+        return os.path.splitext(self.ohlcv_store._path(market, ticker))[0] + ".qstate"
+
+    def _load(self, path: str, is_kr: bool) -> Optional[RollingQuantState]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except Exception:
+            return None
+        if not isinstance(state, RollingQuantState) or state.version != QUANT_STATE_VERSION or state.is_kr != is_kr:
+            return None
+        return state
+
+    def _save(self, path: str, state: RollingQuantState) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            print(f"   ⚠️ 퀀트 롤링 상태 저장 실패 ({path}): {exc}")
+
+    @staticmethod
+    def _candles(hist: Any) -> Tuple[List[int], List[Optional[float]], List[Optional[float]], List[Optional[float]]]:
+        """
+        일봉 DataFrame을 (일자 서수, 종가, 고가, 저가) 리스트로 꺼내며 NaN은 None으로 바꿉니다.
+        calculate_quant_indicators와 같이 고저가가 있으면 원본 행을 모두 남기고(종가 NaN 행 포함),
+        고저가가 없으면 종가가 있는 봉만 남겨 종가로 대체합니다.
+        """
+        def _num(value: Any) -> Optional[float]:
+            return None if value is None or value != value else float(value)
+
+        closes = hist["Close"] if "Close" in hist.columns else hist.iloc[:, 0]
+        has_hl = "High" in hist.columns and "Low" in hist.columns
+        highs = hist["High"] if has_hl else closes
+        lows = hist["Low"] if has_hl else closes
+        ords: List[int] = []
+        cs: List[Optional[float]] = []
+        hs: List[Optional[float]] = []
+        ls: List[Optional[float]] = []
+        for ts, c, h, l in zip(hist.index, closes.tolist(), highs.tolist(), lows.tolist()):
+            if not has_hl and _num(c) is None:
+                continue
+            ords.append(ts.toordinal())
+            cs.append(_num(c))
+            hs.append(_num(h))
+            ls.append(_num(l))
+        return ords, cs, hs, ls
+
+    def _advance(
+        self, state: RollingQuantState, hist: Any
+    ) -> Optional[Tuple[Optional[float], Optional[float], Optional[float]]]:
+        """
+        커밋된 마지막 봉 이후의 확정 봉을 커밋하고, 미확정 마지막 봉 (종가, 고가, 저가)를 반환합니다.
+        커밋된 마지막 봉이 일봉 저장소에 없거나 값이 달라졌으면 None을 반환합니다.
+        """
+        import pandas as pd
+
+        if state.last_row_ord is None or hist.index[-1].toordinal() <= state.last_row_ord:
+            return None
+        last_ts = pd.Timestamp(date.fromordinal(state.last_row_ord))
+        pos = int(hist.index.searchsorted(last_ts))
+        if pos >= len(hist) or hist.index[pos] != last_ts:
+            return None
+        ords, cs, hs, ls = self._candles(hist.iloc[pos:])
+        if not ords or ords[0] != state.last_row_ord:
+            return None
+        first_close, committed_close = cs[0], state.last_row_close
+        if (first_close is None) != (committed_close is None):
+            return None
+        if first_close is not None and committed_close is not None and (
+            abs(first_close - committed_close) > 1e-9 * max(1.0, abs(first_close))
+        ):
+            return None
+        state.evict_before(hist.index[0].toordinal())
+        for ordinal, c, h, l in zip(ords[1:-1], cs[1:-1], hs[1:-1], ls[1:-1]):
+            state.push(ordinal, c, h, l)
+        return cs[-1], hs[-1], ls[-1]
+
+    def _rebuild(self, hist: Any, is_kr: bool) -> Optional[RollingQuantState]:
+        """일봉 저장소의 조회 구간 전체(마지막 미확정 봉 제외)로 상태를 새로 만듭니다."""
+        ords, cs, hs, ls = self._candles(hist)
+        if len(ords) < 2 or all(c is None for c in cs):
+            return None
+        state = RollingQuantState(is_kr)
+        for ordinal, c, h, l in zip(ords[:-1], cs[:-1], hs[:-1], ls[:-1]):
+            state.push(ordinal, c, h, l)
+        state.reanchor()
+        return state
+
+    def evaluate_batch(
+        self,
+        market: str,
+        histories: Dict[str, Any],
+        current_prices: Optional[Dict[str, Optional[float]]] = None,
+        is_kr: bool = False,
+        high_52w_overrides: Optional[Dict[str, Optional[float]]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        종목별 일봉에 대한 퀀트 지표를 {티커: 결과}로 반환합니다.
+        롤링 상태를 이어갈 수 있는 종목은 증분 갱신으로, 나머지는 calculate_quant_indicators_panel로 한 번에 계산한 뒤 상태를 재생성합니다.
+        """
+        if not QUANT_STATE_ENABLED:
+            return calculate_quant_indicators_panel(histories, current_prices, is_kr=is_kr, high_52w_overrides=high_52w_overrides)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        misses: Dict[str, Any] = {}
+        for ticker, hist in histories.items():
+            if hist is None or getattr(hist, "empty", True):
+                misses[ticker] = hist
+                continue
+            path = self._path(market, ticker)
+            state = self._load(path, is_kr)
+            pending = self._advance(state, hist) if state is not None else None
+            if state is None or pending is None:
+                misses[ticker] = hist
+                continue
+            results[ticker] = state.evaluate(
+                *pending,
+                current_price=safe_float((current_prices or {}).get(ticker)),
+                high_52w_override=safe_float((high_52w_overrides or {}).get(ticker)),
+            )
+            self._save(path, state)
+            with self._lock:
+                self.incremental += 1
+
+        if misses:
+            results.update(calculate_quant_indicators_panel(misses, current_prices, is_kr=is_kr, high_52w_overrides=high_52w_overrides))
+            for ticker, hist in misses.items():
+                if hist is None or getattr(hist, "empty", True):
+                    continue
+                state = self._rebuild(hist, is_kr)
+                if state is not None:
+                    self._save(self._path(market, ticker), state)
+                    with self._lock:
+                        self.rebuilt += 1
+        return results
+
+    def summary(self) -> str:
+        """증분 갱신/재생성 건수를 한 줄 요약 문자열로 반환합니다."""
+        return f"퀀트 롤링 상태 증분 갱신 {self.incremental}건 / 재생성 {self.rebuilt}건"
+
+
+QUANT_STATE_STORE = RollingQuantStore(OHLCV_STORE)
+
+
+# ==============================================================================
+# 9-3. 야후 펀더멘털(EPS·BPS·추정치) 디스크 캐시 (필드군별 TTL)
+# ==============================================================================
+YAHOO_FUNDAMENTALS_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".yahoo_fundamentals_cache.json")
+YAHOO_FUNDAMENTALS_ENABLED = os.environ.get("YAHOO_FUNDAMENTALS_CACHE", "on").lower() not in ("off", "false", "0")
+# 기초 필드(EPS·BPS·추정 EPS·주당배당금) 재조회 주기. 실적 발표일이 지나면 주기와 무관하게 다음 실행에서 재조회
+YAHOO_FUNDAMENTALS_TTL_SEC = float(os.environ.get("YAHOO_FUNDAMENTALS_TTL_SEC", str(7 * 86400)))
+# 실적 발표 후 야후 추정치·EPS 반영까지의 여유
+YAHOO_EARNINGS_REFRESH_LAG_SEC = 86400
+YAHOO_FUNDAMENTAL_FIELDS = (
+    "trailingEps", "forwardEps", "bookValue", "dividendRate", "dividendYield",
+    "trailingPE", "forwardPE", "priceToBook", "fiftyTwoWeekHigh", "fiftyTwoWeekLow",
+    "earningsTimestamp", "earningsTimestampStart",
+)
+
+
+class YahooFundamentalsCache:
+    """
+    Ticker.info 중 분기에 몇 번만 바뀌는 기초 필드(EPS·BPS·추정 EPS·주당배당금 등)를 티커별로 보관하는 디스크 캐시입니다.
+    - 기초 필드: YAHOO_FUNDAMENTALS_TTL_SEC(기본 7일) 동안 재사용, 보관 이후 실적 발표일(+1일)이 지났으면 즉시 만료
+    - 밸류에이션(PER·추정PER·PBR·배당수익률): 캐시하지 않고 호출 측이 매일 현재가와 기초 필드로 다시 계산
+    이로써 대부분의 일일 실행은 가장 느리고 제한이 잦은 .info 호출을 건너뜁니다.
+    """
+
+    def __init__(self, path: str = YAHOO_FUNDAMENTALS_CACHE_FILE, ttl_sec: float = YAHOO_FUNDAMENTALS_TTL_SEC):
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, entry: Dict[str, Any], now_ts: float) -> bool:
+        fetched_at = float(entry.get("fetched_at", 0))
+        if now_ts - fetched_at > self.ttl_sec:
+            return False
+        fields = entry.get("fields") or {}
+        for key in ("earningsTimestampStart", "earningsTimestamp"):
+            earnings_ts = safe_float(fields.get(key))
+            if earnings_ts and fetched_at < earnings_ts + YAHOO_EARNINGS_REFRESH_LAG_SEC <= now_ts:
+                return False
+        return True
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """최초 접근 시 파일을 읽고 만료된 항목은 버립니다. (락을 잡은 상태에서 호출)"""
+        if self._entries is None:
+            raw: Dict[str, Any] = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        raw = json.load(f)
+                except Exception:
+                    raw = {}
+            now_ts = time.time()
+            self._entries = {
+                ticker: entry for ticker, entry in raw.items()
+                if isinstance(entry, dict) and isinstance(entry.get("fields"), dict) and self._is_fresh(entry, now_ts)
+            }
+        return self._entries
+
+    def get(self, ticker: str) -> Optional[Dict[str, Any]]:
+        """유효한 기초 필드 딕셔너리를 반환하고, 없거나 만료되었으면 None을 반환합니다."""
+        if not YAHOO_FUNDAMENTALS_ENABLED:
+            return None
+        with self._lock:
+            entry = self._load().get(ticker.upper())
+            if entry is not None and self._is_fresh(entry, time.time()):
+                self.hits += 1
+                return entry["fields"]
+            self.misses += 1
+            return None
+
+    def put(self, ticker: str, info: Dict[str, Any]) -> Dict[str, Any]:
+        """Ticker.info에서 기초 필드만 골라 보관하고 그 딕셔너리를 반환합니다. 파일 반영은 save()(프로세스 종료 시 자동 호출)에서 수행합니다."""
+        fields = {key: info.get(key) for key in YAHOO_FUNDAMENTAL_FIELDS if info.get(key) is not None}
+        if not YAHOO_FUNDAMENTALS_ENABLED:
+            return fields
+        with self._lock:
+            self._load()[ticker.upper()] = {"fetched_at": time.time(), "fields": fields}
+            if not self._dirty:
+                self._dirty = True
+                atexit.register(self.save)
+        return fields
+
+    def save(self) -> None:
+        """변경분이 있으면 임시 파일에 쓴 뒤 교체하여 중간에 끊겨도 손상된 캐시가 남지 않게 합니다."""
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as exc:
+                print(f"   ⚠️ 야후 펀더멘털 캐시 저장 실패 ({self.path}): {exc}")
+
+    def summary(self) -> str:
+        """캐시 적중/미스 건수를 한 줄 요약 문자열로 반환합니다."""
+        return f"펀더멘털 캐시 적중 {self.hits}건 / .info 조회 {self.misses}건"
+
+
+YAHOO_FUNDAMENTALS_CACHE = YahooFundamentalsCache()
+
+
+# ==============================================================================
+# 9-4. FDR 상장 종목 목록(StockListing) 거래일별 디스크 캐시 (워크플로우 간 하루 1회 수신)
+# ==============================================================================
+FDR_LISTING_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fdr_listing_cache")
+FDR_LISTING_CACHE_ENABLED = os.environ.get("FDR_LISTING_CACHE", "on").lower() not in ("off", "false", "0")
+# 목록별 기준 시장 (거래일 판정용). 여기에 없는 목록은 한국 시장 거래일을 기준으로 함
+FDR_LISTING_MARKETS = {
+    "NASDAQ": "US", "NYSE": "US", "AMEX": "US", "S&P500": "US", "ETF/US": "US",
+}
+
+
+def get_listing_trading_date(market: str = "KR", now: Optional[datetime] = None) -> date:
+    """현지 시각 기준 가장 최근 거래일(오늘이 거래일이면 오늘)을 반환합니다. 상장 목록 캐시의 일자 키로 사용합니다."""
+    tz = ZoneInfo("America/New_York") if market.upper() == "US" else ZoneInfo("Asia/Seoul")
+    day = (now or datetime.now(timezone.utc)).astimezone(tz)
+    for _ in range(14):
+        if not is_market_holiday(market, day)[0]:
+            break
+        day -= timedelta(days=1)
+    return day.date()
+
+
+class FDRListingCache:
+    """
+    fdr.StockListing 결과를 .fdr_listing_cache/{목록명}_{거래일}.parquet 로 보관하는 디스크 캐시입니다.
+    - 같은 거래일에는 가격·마스터·벤치마크 등 모든 동기화가 한 번 받은 목록을 재사용하고, 거래일이 바뀌면 새로 수신합니다.
+    - fresh_after를 넘기면 그 시각 이전에 받은 목록은 재수신합니다 (예: 장 마감 후 확정 종가가 필요한 시세 스냅샷).
+    - 수신한 목록은 같은 프로세스 안에서도 메모리에 보관해 중복 요청(NASDAQ 2회 등)을 없앱니다.
+    """
+
+    def __init__(self, root: str = FDR_LISTING_CACHE_DIR):
+        self.root = root
+        self.hits = 0
+        self.downloads = 0
+        self._memory: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _base_path(self, name: str, trading_date: date) -> str:
+        safe_name = re.sub(r"[^0-9A-Za-z_-]", "_", name.upper())
+        return os.path.join(self.root, f"{safe_name}_{trading_date:%Y%m%d}")
+
+    def _load(self, base: str) -> Tuple[Optional[float], Any]:
+        import pandas as pd
+
+        for ext in (".parquet", ".pkl"):
+            path = base + ext
+            if not os.path.exists(path):
+                continue
+            try:
+                df = pd.read_parquet(path) if ext == ".parquet" else pd.read_pickle(path)
+                return os.path.getmtime(path), df
+            except Exception:
+                continue
+        return None, None
+
+    def _save(self, base: str, df: Any) -> None:
+        """Parquet으로 저장하고, 열 타입이 섞여 Parquet 변환이 안 되면 pickle로 저장합니다. 이전 거래일 파일은 정리합니다."""
+        os.makedirs(self.root, exist_ok=True)
+        prefix = os.path.basename(base).rsplit("_", 1)[0] + "_"
+        for fname in os.listdir(self.root):
+            if fname.startswith(prefix) and not fname.startswith(os.path.basename(base)):
+                try:
+                    os.remove(os.path.join(self.root, fname))
+                except OSError:
+                    pass
+
+        tmp_path = f"{base}.{threading.get_ident()}.tmp"
+        last_exc: Optional[Exception] = None
+        for ext in ((".parquet", ".pkl") if _OHLCV_EXT == ".parquet" else (".pkl",)):
+            try:
+                if ext == ".parquet":
+                    df.to_parquet(tmp_path)
+                else:
+                    df.to_pickle(tmp_path)
+                os.replace(tmp_path, base + ext)
+                stale = base + (".pkl" if ext == ".parquet" else ".parquet")
+                if os.path.exists(stale):
+                    os.remove(stale)
+                return
+            except Exception as exc:
+                last_exc = exc
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"   ⚠️ 상장 목록 캐시 기록 실패 ({base}): {last_exc}")
+
+    def get(self, name: str, fresh_after: Optional[datetime] = None) -> Any:
+        """
+        name 목록(KRX, KRX-DESC, ETF/KR, NASDAQ, NYSE, S&P500 등)의 DataFrame 사본을 반환합니다.
+        캐시에 없거나 fresh_after 이전에 받은 목록이면 fdr.StockListing으로 수신하며, 수신 실패 시 예외를 그대로 전달합니다.
+        """
+        trading_date = get_listing_trading_date(FDR_LISTING_MARKETS.get(name.upper(), "KR"))
+        base = self._base_path(name, trading_date)
+        min_ts = fresh_after.timestamp() if fresh_after else 0.0
+
+        with self._lock:
+            fetched_ts, df = self._memory.get(base, (None, None))
+            if df is None and FDR_LISTING_CACHE_ENABLED:
+                fetched_ts, df = self._load(base)
+            if df is not None and fetched_ts is not None and fetched_ts >= min_ts:
+                self._memory[base] = (fetched_ts, df)
+                self.hits += 1
+                return df.copy()
+
+        import FinanceDataReader as fdr
+
+        df = fdr.StockListing(name)
+        with self._lock:
+            self.downloads += 1
+            self._memory[base] = (time.time(), df)
+            if FDR_LISTING_CACHE_ENABLED and df is not None and not df.empty:
+                self._save(base, df)
+        return df.copy() if df is not None else df
+
+    def summary(self) -> str:
+        """캐시 적중/수신 건수를 한 줄 요약 문자열로 반환합니다."""
+        return f"상장 목록 캐시 적중 {self.hits}건 / FDR 수신 {self.downloads}건"
+
+
+FDR_LISTINGS = FDRListingCache()
\ No newline at end of file
@@ -3,7 +3,7 @@ update_benchmark_db.py
 =======================
 노션(Notion) 지표지수(벤치마크) DB를 분석/갱신하고,
 상장주식 마스터 DB와의 산업BM/시장BM 매핑 커버리지를 진단(Health Check)합니다.
-- 데이터 소스: FinanceDataReader (KRX, ETF/KR, S&P500) + yfinance
+- 데이터 소스: FinanceDataReader (KRX, ETF/KR, S&P500) + 야후 quoteSummary
 - 지표 정합성: 국가(KR/US), 구분(시장/산업/기타), 매칭키워드 자동 보정
 - 헬스체크: 상장주식 마스터 DB 전 종목 대상 벤치마크 매칭율 및 미매칭 샘플 리포팅
 """
@@ -21,8 +21,6 @@ from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
-import yfinance as yf
-import FinanceDataReader as fdr
 
 # Windows 콘솔 인코딩 안전화
 if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
@@ -32,19 +30,22 @@ if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
         pass
 
 from notion_utils import (
+    BACKOFF,
     build_notion_client,
     get_env_var,
-    paginate_database,
+    paginate_database_cached,
     safe_page_update,
     make_rich_text,
     kst_isoformat,
     get_page_text,
     is_kr_ticker,
-    get_http_session,
     extract_short_brand_name,
     match_keyword,
     find_best_bm,
     parse_keywords,
+    get_yahoo_client,
+    YAHOO_NAME_MODULES,
+    FDR_LISTINGS,
 )
 
 
@@ -79,29 +80,28 @@ SPECIAL_BM_US = {"GLD", "USO", "EWY"}
 
 
 # ==============================================================================
-# 2. 지표 자동화 엔진 (FDR + YFinance 인메모리 메타데이터)
+# 2. 지표 자동화 엔진 (FDR + 야후 quoteSummary 인메모리 메타데이터)
 # ==============================================================================
 class BenchmarkAutomationEngine:
-    """FinanceDataReader 및 yfinance 기반 고속 인메모리 종목 메타데이터 엔진"""
+    """FinanceDataReader 및 야후 quoteSummary 기반 고속 인메모리 종목 메타데이터 엔진"""
 
     def __init__(self, client: Optional[Any] = None):
         logger.info("📡 지표지수 DB 전담 엔진 초기화 중...")
-        self.session = get_http_session()
 
         try:
-            self.df_kr = fdr.StockListing('KRX').set_index('Code')
+            self.df_kr = FDR_LISTINGS.get('KRX').set_index('Code')
         except Exception as e:
             logger.warning(f"⚠️ KRX 로드 실패: {e}")
             self.df_kr = pd.DataFrame()
 
         try:
-            self.kr_etf = fdr.StockListing('ETF/KR').set_index('Symbol').to_dict('index')
+            self.kr_etf = FDR_LISTINGS.get('ETF/KR').set_index('Symbol').to_dict('index')
         except Exception as e:
             logger.warning(f"⚠️ ETF/KR 로드 실패: {e}")
             self.kr_etf = {}
 
         try:
-            self.df_sp500 = fdr.StockListing('S&P500').set_index('Symbol').to_dict('index')
+            self.df_sp500 = FDR_LISTINGS.get('S&P500').set_index('Symbol').to_dict('index')
         except Exception as e:
             logger.warning(f"⚠️ S&P500 로드 실패: {e}")
             self.df_sp500 = {}
@@ -110,7 +110,7 @@ class BenchmarkAutomationEngine:
         self.inv_ticker_to_id: Dict[str, str] = {}
         if client and INVESTMENT_DATABASE_ID:
             try:
-                for page in paginate_database(client, INVESTMENT_DATABASE_ID, page_size=100, retry_delay=0.2):
+                for page in paginate_database_cached(client, INVESTMENT_DATABASE_ID, page_size=100, retry_delay=0.2):
                     p_props = page.get("properties", {})
                     t_str = get_page_text(p_props, ["티커", "Ticker", "종목코드"]).upper().strip()
                     if t_str:
@@ -133,8 +133,7 @@ class BenchmarkAutomationEngine:
             return extract_short_brand_name(self.df_sp500[clean_t].get('Name', clean_t))
 
         try:
-            yf_item = yf.Ticker(clean_t, session=self.session)
-            info = yf_item.info
+            info = get_yahoo_client().get_info(clean_t, YAHOO_NAME_MODULES)
             name = info.get("longName") or info.get("shortName") or clean_t
             return extract_short_brand_name(name)
         except Exception:
@@ -231,7 +230,7 @@ def run_master_db_health_check(
     unmatched_kr_list: List[Tuple[str, str, str]] = []
     unmatched_us_list: List[Tuple[str, str, str]] = []
 
-    for page in paginate_database(client, MASTER_DATABASE_ID, page_size=100):
+    for page in paginate_database_cached(client, MASTER_DATABASE_ID, page_size=100):
         props = page.get("properties", {})
         ticker = get_page_text(props, ["티커", "Ticker"]).upper().strip()
         name = get_page_text(props, ["종목명", "Name"])
@@ -289,7 +288,7 @@ def main() -> None:
     client = build_notion_client(NOTION_TOKEN, use_httpx=True, timeout=60.0)
     engine = BenchmarkAutomationEngine(client=client)
 
-    pages = [p for p in paginate_database(client, BENCHMARK_DATABASE_ID, page_size=100)]
+    pages = [p for p in paginate_database_cached(client, BENCHMARK_DATABASE_ID, page_size=100)]
     logger.info(f"📋 지표지수 DB에서 총 {len(pages)}개의 지표 항목을 로드했습니다.")
 
     benchmark_list = []
@@ -305,8 +304,12 @@ def main() -> None:
     # 마스터 DB와의 헬스체크 실행
     run_master_db_health_check(client, benchmark_list, engine)
 
+    logger.info(f"   📦 {FDR_LISTINGS.summary()}")
     logger.info("✨ [지표지수 DB 동기화 및 헬스체크 프로세스 완료]")
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        BACKOFF.report(logger)
@@ -13,7 +13,6 @@ update_etf_holdings_kr.py
 # ==============================================================================
 import os
 import sys
-import time
 import json
 import re
 from typing import Any, List, Dict, Optional, Tuple
@@ -31,17 +30,22 @@ if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
         pass
 
 from notion_utils import (
+    BACKOFF,
     build_notion_client,
     get_env_var,
-    paginate_database,
+    paginate_database_cached,
     get_page_text,
     kst_isoformat,
     set_page_date_property,
-    get_kis_auth_context,
+    prefetch_kis_auth_context,
+    get_kis_client,
+    report_kis_usage,
     extract_short_brand_name,
     search_foreign_ticker,
-    get_http_session,
     is_kr_ticker,
+    safe_databases_query,
+    safe_page_update,
+    safe_create_page,
 )
 
 
@@ -59,8 +63,6 @@ MASTER_DB_ID = os.environ.get("MASTER_DATABASE_ID") or os.environ.get("MASTER_DB
 ETF_DB_ID = os.environ.get("ETF_DB_ID") or os.environ.get("ETF_DATABASE_ID") or get_env_var("ETF_DB_ID")
 BENCHMARK_DB_ID = os.environ.get("BENCHMARK_DATABASE_ID") or os.environ.get("BENCHMARK_DB_ID")
 
-SESSION = get_http_session()
-
 
 # ==============================================================================
 # 2. 데이터 정제 및 파생자산 필터링
@@ -127,20 +129,19 @@ def get_etf_composition_kis(kis_ctx: Optional[Dict[str, Any]], clean_ticker: str
     """한투 API (모의/실전 자동 Fallback): 한국 ETF 구성종목 코드 및 CU 수량 수집 (선물/현금 제외)"""
     if not kis_ctx or not isinstance(kis_ctx, dict) or not kis_ctx.get("token"):
         return []
-    url = f"{kis_ctx['url_base']}/uapi/etfetn/v1/quotations/inquire-component-stock-price"
-    headers = {
-        "authorization": f"Bearer {kis_ctx['token']}",
-        "appkey": kis_ctx["app_key"],
-        "appsecret": kis_ctx["app_secret"],
-        "tr_id": "FHKST121600C0",
-        "custtype": "P"
-    }
     params = {"FID_COND_MRKT_DIV_CODE": "J", "FID_INPUT_ISCD": clean_ticker, "FID_COND_SCR_DIV_CODE": "11216"}
     holdings = []
     try:
-        res = SESSION.get(url, headers=headers, params=params, timeout=10)
-        if res.status_code == 200:
-            data = res.json()
+        data = get_kis_client(kis_ctx).get(
+            "/uapi/etfetn/v1/quotations/inquire-component-stock-price",
+            "FHKST121600C0",
+            params,
+            label=clean_ticker,
+            require=None,
+            max_retries=2,
+            quiet=True,
+        )
+        if data:
             for item in data.get("output2") or []:
                 raw_ticker = str(item.get("stck_shrn_iscd") or "").strip()
                 name = (item.get("hts_kor_isnm") or "").strip()
@@ -195,7 +196,7 @@ class StockMatchEngine:
     def _load_cache(self) -> None:
         print(f"📦 투자주 DB({INVESTMENT_DB_ID}) 목록을 메모리에 로드합니다...", flush=True)
         count_inv = 0
-        for page in paginate_database(self.client, INVESTMENT_DB_ID, page_size=100):
+        for page in paginate_database_cached(self.client, INVESTMENT_DB_ID, page_size=100):
             pid = page["id"]
             props = page.get("properties", {})
             t_prop = props.get("티커", {}).get("title", [])
@@ -231,7 +232,10 @@ class StockMatchEngine:
                 "종목명": {"rich_text": [{"text": {"content": name}}]} if name else {}
             }
             props = {k: v for k, v in props.items() if v}
-            new_page = self.client.pages.create(parent={"database_id": INVESTMENT_DB_ID}, properties=props)
+            new_page = safe_create_page(self.client, INVESTMENT_DB_ID, props)
+            if not new_page:
+                print(f"      ⚠️ [투자주 DB 등록 실패] {name}({ticker})", flush=True)
+                return None
             new_id = new_page["id"]
 
             item_info = {"id": new_id, "ticker": ticker, "name": name}
@@ -243,7 +247,6 @@ class StockMatchEngine:
                 self.inv_name_to_page[name.replace(" ", "")] = item_info
 
             print(f"      ✨ [투자주 DB 자동등록] {name}({ticker}) 완료", flush=True)
-            time.sleep(0.02)
             return new_id
         except Exception as exc:
             print(f"      ⚠️ [투자주 DB 등록 실패] {name}({ticker}): {exc}", flush=True)
@@ -336,7 +339,7 @@ def get_target_etfs(client: Any, db_cache: StockMatchEngine) -> List[Dict[str, s
     parent_ids: set = set()
 
     # 1. ETF DB에서 사용자가 입력/연결한 부모 ETF ID 역스캔
-    for page in paginate_database(client, ETF_DB_ID, page_size=100):
+    for page in paginate_database_cached(client, ETF_DB_ID, page_size=100):
         for rel in page.get("properties", {}).get("ETF(투자DB)", {}).get("relation", []):
             if rel.get("id"):
                 parent_ids.add(rel["id"])
@@ -399,29 +402,13 @@ def sync_etf_holdings_upsert(
     start_cursor = None
     while True:
         try:
-            params: Dict[str, Any] = {
-                "database_id": ETF_DB_ID,
-                "filter": {"property": "ETF(투자DB)", "relation": {"contains": etf_page_id}},
-                "page_size": 100
-            }
-            if start_cursor:
-                params["start_cursor"] = start_cursor
-            if hasattr(client, "databases") and hasattr(client.databases, "query"):
-                res = client.databases.query(**params)
-            elif hasattr(client, "data_sources") and hasattr(client.data_sources, "query"):
-                db_info = client.databases.retrieve(database_id=ETF_DB_ID)
-                data_sources = db_info.get("data_sources", [])
-                ds_id = data_sources[0]["id"] if data_sources else ETF_DB_ID
-                ds_params = {
-                    "data_source_id": ds_id,
-                    "filter": params.get("filter"),
-                    "page_size": params.get("page_size", 100)
-                }
-                if start_cursor:
-                    ds_params["start_cursor"] = start_cursor
-                res = client.data_sources.query(**ds_params)
-            else:
-                res = client.databases.query(**params)
+            res = safe_databases_query(
+                client,
+                ETF_DB_ID,
+                start_cursor=start_cursor,
+                page_size=100,
+                query_filter={"property": "ETF(투자DB)", "relation": {"contains": etf_page_id}},
+            )
             existing_pages.extend(res.get("results", []))
             if not res.get("has_more"):
                 break
@@ -538,12 +525,10 @@ def sync_etf_holdings_upsert(
 
             if need_update:
                 set_page_date_property(update_props, page_props, candidate_names=["업데이트", "마지막 업데이트", "업데이트 일자"], iso_date_str=now_kst)
-                try:
-                    client.pages.update(page_id=pid, properties=update_props)
+                if safe_page_update(client, pid, update_props):
                     updated_cnt += 1
-                    time.sleep(0.01)
-                except Exception as e:
-                    print(f"      ❌ {item_name} 수정 실패: {e}", flush=True)
+                else:
+                    print(f"      ❌ {item_name} 수정 실패", flush=True)
 
         else:
             # CASE B: 신규 편입 종목 ➔ 생성(Create)
@@ -561,13 +546,12 @@ def sync_etf_holdings_upsert(
             if item_qty is not None:
                 new_props["수량"] = {"number": item_qty}
 
-            try:
-                new_p = client.pages.create(parent={"database_id": ETF_DB_ID}, properties=new_props)
+            new_p = safe_create_page(client, ETF_DB_ID, new_props)
+            if new_p:
                 created_cnt += 1
                 matched_page_ids.add(new_p["id"])
-                time.sleep(0.01)
-            except Exception as e:
-                print(f"      ❌ {item_name} 생성 실패: {e}", flush=True)
+            else:
+                print(f"      ❌ {item_name} 생성 실패", flush=True)
 
     # 3. 편출된 종목 처리 (상태: 편출, 수량: 0, 편출일: 오늘 기록 ➔ Soft Delete)
     to_exclude_ids = list(all_existing_ids - matched_page_ids)
@@ -588,12 +572,10 @@ def sync_etf_holdings_upsert(
 
             set_page_date_property(exclude_props, page_props, candidate_names=["업데이트", "마지막 업데이트", "업데이트 일자"], iso_date_str=now_kst)
 
-            try:
-                client.pages.update(page_id=pid, properties=exclude_props)
+            if safe_page_update(client, pid, exclude_props):
                 return True
-            except Exception as e:
-                print(f"      ⚠️ 편출 상태 업데이트 실패 ({info.get('name', pid)}): {e}", flush=True)
-                return False
+            print(f"      ⚠️ 편출 상태 업데이트 실패 ({info.get('name', pid)})", flush=True)
+            return False
 
         with ThreadPoolExecutor(max_workers=3) as executor:
             results = list(executor.map(_exclude_page, to_exclude_ids))
@@ -607,14 +589,16 @@ def sync_etf_holdings_upsert(
 # ==============================================================================
 def main() -> None:
     print("🚀 [ETF 구성종목 자동 수집 및 증분 Upsert 파이프라인] 가동 시작", flush=True)
+    # KIS 토큰 확보를 노션 DB 캐시 적재와 겹쳐 백그라운드에서 진행
+    kis_future = prefetch_kis_auth_context()
     notion = build_notion_client(NOTION_TOKEN)
 
-    kis_ctx = get_kis_auth_context()
-    if not kis_ctx:
-        print("⚠️ KIS 토큰 발급 실패: WiseReport 수집 전용 모드로 진행합니다.", flush=True)
-
     db_cache = StockMatchEngine(notion)
     target_etfs = get_target_etfs(notion, db_cache)
+
+    kis_ctx = kis_future.result()
+    if not kis_ctx:
+        print("⚠️ KIS 토큰 발급 실패: WiseReport 수집 전용 모드로 진행합니다.", flush=True)
     if not target_etfs:
         print("⚠️ 갱신 대상 ETF가 없습니다.", flush=True)
         return
@@ -664,4 +648,8 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        BACKOFF.report()
+        report_kis_usage()
\ No newline at end of file
@@ -15,13 +15,10 @@ update_finance_kr.py
 # ==============================================================================
 import os
 import sys
-import time
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-import requests
 import numpy as np
 import pandas as pd
 import FinanceDataReader as fdr
@@ -36,17 +33,23 @@ if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
 from notion_utils import (
     build_notion_client,
     get_env_var,
-    get_page_text,
-    paginate_database,
-    safe_page_update,
-    RETRY_STATUS_CODES,
+    paginate_database_records,
+    PageRecord,
+    build_market_filter,
+    UPDATE_DATE_CANDIDATES,
+    BACKOFF,
     set_page_date_property,
-    get_kis_auth_context,
-    get_http_session,
+    prefetch_kis_auth_context,
+    get_kis_client,
+    report_kis_usage,
+    KIS_MAX_WORKERS,
     is_kr_ticker,
     safe_float,
-    calculate_quant_indicators,
-    batch_update_pages,
+    QUANT_STATE_STORE,
+    OHLCV_STORE,
+    run_streaming_sync,
+    WriteJournal,
+    resume_pending_writes,
     build_dirty_payload,
     is_market_holiday,
 )
@@ -63,90 +66,77 @@ DATABASE_ID = (
     or get_env_var("DATABASE_ID")
 )
 
-SESSION = get_http_session()
+# 퀀트 지표 계산용 일봉 조회 구간 (200일선·12M 모멘텀 산출에 필요한 영업일 확보)
+CHART_LOOKBACK_DAYS = 400
+# 퀀트 지표를 패널(일자 × 종목) 단위로 한 번에 계산할 수집 묶음 크기
+FINANCE_PANEL_BATCH_SIZE = int(os.environ.get("FINANCE_PANEL_BATCH_SIZE", "25"))
+
+# FDR 일봉을 기다리는 워커가 있어도 KIS 초당 한도가 비지 않도록 KIS 워커 수만큼 수집
+COLLECT_WORKERS = KIS_MAX_WORKERS
+
+FINANCE_NUM_FIELDS = [
+    "현재가", "PER", "PBR", "EPS", "BPS", "배당수익률", "업종PER",
+    "직전고점", "직전저점", "60일 변동성", "52주 낙폭", "낙폭율", "200일선", "60일선", "수급선", "12M 모멘텀"
+]
+FINANCE_SELECT_FIELDS = ["추세", "스마트 가이드", "모멘텀 진단", "위험도 등급"]
+SCAN_PROPERTIES = ["티커", "Ticker", "종목명", "Name"] + FINANCE_NUM_FIELDS + FINANCE_SELECT_FIELDS + UPDATE_DATE_CANDIDATES
 
 
 # ==============================================================================
 # 2. 한국투자증권 다단계 재무/기술 지표 수집부
 # ==============================================================================
-def get_finance_data(
+def fetch_finance_inputs(
     ticker: str,
     kis_ctx: Dict[str, Any],
     max_retries: int = 4,
     base_delay: float = 3.0
-) -> Dict[str, Any]:
-    """한투 API에서 국내 주식 재무 데이터(기본정보, 투자의견, 일봉차트 직전고저점)를 조회합니다."""
+) -> Optional[Tuple[Dict[str, Any], Any]]:
+    """
+    한투 API 기본정보(현재가·PER·PBR·52주 고저 등)와 퀀트 지표용 1년치 일봉을 조회하여 (기본정보 output, 일봉 DataFrame)으로 반환합니다.
+    기본정보를 받지 못하면 None을 반환합니다.
+    """
     if not kis_ctx or not isinstance(kis_ctx, dict) or not kis_ctx.get("token"):
-        return {}
+        return None
 
     clean_ticker = ticker.split(".")[0].strip()
-    token = kis_ctx["token"]
-    url_base = kis_ctx["url_base"]
-    app_key = kis_ctx["app_key"]
-    app_secret = kis_ctx["app_secret"]
-
-    headers = {
-        "authorization": f"Bearer {token}",
-        "appkey": app_key,
-        "appsecret": app_secret,
-        "custtype": "P",
-    }
+    kis = get_kis_client(kis_ctx)
 
-    # 1단계: 기본 정보 조회 (필수 - 지수 백오프 재시도 적용)
-    output = {}
-    for attempt in range(1, max_retries + 1):
-        try:
-            response = SESSION.get(
-                url=f"{url_base}/uapi/domestic-stock/v1/quotations/inquire-price",
-                headers={**headers, "tr_id": "FHKST01010100"},
-                params={"fid_cond_mrkt_div_code": "J", "fid_input_iscd": clean_ticker},
-                timeout=10,
-            )
-            if response.status_code in RETRY_STATUS_CODES:
-                if attempt < max_retries:
-                    delay = base_delay * (2 ** (attempt - 1))
-                    print(f"   ⚠️ [{ticker}] KIS API(기본정보) {response.status_code} 에러. {delay}초 대기 후 재시도 ({attempt}/{max_retries})")
-                    time.sleep(delay)
-                    continue
-            response.raise_for_status()
-            output = response.json().get("output", {})
-            if not output:
-                raise ValueError("응답 데이터(output)가 비어 있습니다.")
-            break
-        except (requests.exceptions.RequestException, ValueError) as exc:
-            if attempt < max_retries:
-                delay = base_delay * (2 ** (attempt - 1))
-                print(f"   ⚠️ [{ticker}] KIS 기본정보 통신 에러. {delay}초 대기 후 재시도 ({attempt}/{max_retries}): {exc}")
-                time.sleep(delay)
-                continue
-            print(f"❌ [{ticker}] KIS API(기본정보) 요청 실패 (최대 재시도 초과): {exc}")
-            return {}
-
-    time.sleep(0.1)
-
-    # 2단계: 1년치 일봉 데이터(FDR)로 직전고저점 및 5대 퀀트 지표(200일선, 추세, 12M모멘텀, 52주낙폭, 60일변동성) 계산
-    curr_p = safe_float(output.get("stck_prpr"))
-    w52_h = safe_float(output.get("w52_hgpr"))
-    df_chart = None
+    # 1단계: 기본 정보 조회 (필수 - 속도 제한 및 지수 백오프 재시도는 공용 KISClient가 수행)
+    # (같은 세션에 이미 받은 현재가 응답은 디스크 시세 캐시에서 재사용)
+    output = kis.get_quote(clean_ticker, label=f"{ticker} 기본정보", max_retries=max_retries, base_delay=base_delay)
+    if not output:
+        return None
+
+    # 2단계: 1년치 일봉 데이터(FDR) - 직전고저점 및 5대 퀀트 지표(200일선, 추세, 12M모멘텀, 52주낙폭, 60일변동성) 계산용
+    # (로컬 일봉 저장소에 보관된 구간은 재사용하고 마지막 보관일 이후의 최근 일봉만 FDR로 수신)
+    df_chart = OHLCV_STORE.get_history(
+        "KR", clean_ticker, CHART_LOOKBACK_DAYS,
+        lambda start: fdr.DataReader(clean_ticker, start.strftime("%Y-%m-%d")),
+    )
+    return output, df_chart
 
-    try:
-        fdr_start = (datetime.now(ZoneInfo("Asia/Seoul")) - timedelta(days=400)).strftime("%Y-%m-%d")
-        df_chart = fdr.DataReader(clean_ticker, fdr_start)
-    except Exception:
-        pass
 
-    # 공통 5대 퀀트 엔진 호출
-    quant = calculate_quant_indicators(df_chart, current_price=curr_p, is_kr=True, high_52w_override=w52_h)
+def assemble_finance_data(
+    ticker: str,
+    kis_ctx: Dict[str, Any],
+    output: Dict[str, Any],
+    quant: Dict[str, Any]
+) -> Dict[str, Any]:
+    """기본정보와 5대 퀀트 엔진 결과를 노션 재무 필드로 조립합니다. (일봉이 없으면 KIS 일봉 API로 스윙 고저점·변동성 보완)"""
+    clean_ticker = ticker.split(".")[0].strip()
+    kis = get_kis_client(kis_ctx)
+    curr_p = safe_float(output.get("stck_prpr"))
+    w52_h = safe_float(output.get("w52_hgpr"))
 
     # FDR 실패 시 KIS 일봉 API로 폴백
     if quant["swing_high"] is None:
         try:
             end_date = datetime.now(ZoneInfo("Asia/Seoul")).strftime("%Y%m%d")
             start_date = (datetime.now(ZoneInfo("Asia/Seoul")) - timedelta(days=120)).strftime("%Y%m%d")
-            response = SESSION.get(
-                url=f"{url_base}/uapi/domestic-stock/v1/quotations/inquire-daily-itemchartprice",
-                headers={**headers, "tr_id": "FHKST03010100"},
-                params={
+            chart = kis.get(
+                "/uapi/domestic-stock/v1/quotations/inquire-daily-itemchartprice",
+                "FHKST03010100",
+                {
                     "FID_COND_MRKT_DIV_CODE": "J",
                     "FID_INPUT_ISCD": clean_ticker,
                     "FID_INPUT_DATE_1": start_date,
@@ -154,10 +144,13 @@ def get_finance_data(
                     "FID_PERIOD_DIV_CODE": "D",
                     "FID_ORG_ADJ_PRC": "0"
                 },
-                timeout=10,
+                label=f"{ticker} 일봉",
+                require=None,
+                max_retries=1,
+                quiet=True,
             )
-            if response.status_code == 200:
-                output3 = response.json().get("output2", [])
+            if chart:
+                output3 = chart.get("output2", [])
                 if isinstance(output3, list) and output3:
                     candles = list(reversed(output3))
                     recent_candles = candles[-20:]
@@ -213,32 +206,17 @@ def get_diagnostic_color(text: str) -> str:
     return "default"
 
 
-def build_finance_update_for_page(
-    page: Dict[str, Any],
-    kis_ctx: Dict[str, Any]
-) -> Optional[Tuple[str, str, Dict[str, Any], str]]:
-    """개별 노션 페이지의 티커를 추출하여 데이터를 수집하고 변경된 경우에만 구조화합니다."""
-    props = page.get("properties", {})
-    ticker = get_page_text(props, ["티커", "Ticker"]).upper()
-    if not ticker or not is_kr_ticker(ticker):
-        return None
-
-    data = get_finance_data(ticker, kis_ctx)
-    if not data:
-        print(f"⚠️ [{ticker}] 재무 데이터 미수신")
-        return None
-
-    num_fields = [
-        "현재가", "PER", "PBR", "EPS", "BPS", "배당수익률", "업종PER",
-        "직전고점", "직전저점", "60일 변동성", "52주 낙폭", "낙폭율", "200일선", "60일선", "수급선", "12M 모멘텀"
-    ]
-    select_fields = ["추세", "스마트 가이드", "모멘텀 진단", "위험도 등급"]
-
+def _build_finance_payload(
+    page: PageRecord,
+    ticker: str,
+    data: Dict[str, Any]
+) -> Optional[Tuple[str, Dict[str, Any], str, str]]:
+    """수집된 재무 데이터를 기존 페이지 값과 비교하여 변경된 속성만 담은 페이로드를 만듭니다."""
     dirty_props = build_dirty_payload(
-        existing_props=props,
+        existing_props=page,
         candidate_data=data,
-        num_fields=num_fields,
-        select_fields=select_fields,
+        num_fields=FINANCE_NUM_FIELDS,
+        select_fields=FINANCE_SELECT_FIELDS,
         diagnostic_color_fn=get_diagnostic_color
     )
 
@@ -253,77 +231,70 @@ def build_finance_update_for_page(
     vol_str = f"{data['60일 변동성']*100:.1f}%" if data.get('60일 변동성') is not None else 'None'
     print(f"   ✅ [Collect] {ticker} 완료 (현재가: {curr_price_str}원, 직전고점: {swing_high_str}, 직전저점: {swing_low_str}, 60일변동성: {vol_str})")
 
-    return (page["id"], ticker, dirty_props, preview)
+    return (page.id, dirty_props, ticker, preview)
 
 
-# ==============================================================================
-# 4. 배치 수집 및 노션 다중 스레드 반영
-# ==============================================================================
-def batch_collect_finance_data(
-    pages: List[Dict[str, Any]],
-    kis_ctx: Dict[str, Any],
-    max_workers: int = 3
-) -> List[Tuple[str, str, Dict[str, Any], str]]:
-    """여러 페이지의 국내 주식 재무 데이터를 병렬로 수집합니다."""
-    updates: List[Tuple[str, str, Dict[str, Any], str]] = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(build_finance_update_for_page, page, kis_ctx): page for page in pages}
-        
-        for fut in as_completed(futures):
-            try:
-                result = fut.result()
-                if result:
-                    updates.append(result)
-            except Exception as exc:
-                page = futures[fut]
-                ticker = get_page_text(page.get("properties", {}), ["티커", "Ticker"]).upper() or "UNKNOWN"
-                print(f"❌ [{ticker}] 데이터 수집 중 예외 발생: {exc}")
-    
-    return updates
+def build_finance_updates_for_chunk(
+    pages: List[PageRecord],
+    kis_ctx: Dict[str, Any]
+) -> List[Tuple[str, Dict[str, Any], str, str]]:
+    """
+    페이지 묶음의 기본정보·일봉을 수집한 뒤 퀀트 지표는 종목별 롤링 상태(없으면 패널 엔진)로
+    묶음 전체를 한 번에 계산하고, 변경된 페이지의 페이로드만 반환합니다.
+    """
+    collected: List[Tuple[PageRecord, str, Dict[str, Any]]] = []
+    histories: Dict[str, Any] = {}
+    current_prices: Dict[str, Optional[float]] = {}
+    high_52w: Dict[str, Optional[float]] = {}
+    for page in pages:
+        ticker = page.text(["티커", "Ticker"]).upper()
+        if not ticker or not is_kr_ticker(ticker):
+            continue
+        inputs = fetch_finance_inputs(ticker, kis_ctx)
+        if not inputs:
+            print(f"⚠️ [{ticker}] 재무 데이터 미수신")
+            continue
+        output, df_chart = inputs
+        collected.append((page, ticker, output))
+        histories[ticker] = df_chart
+        current_prices[ticker] = safe_float(output.get("stck_prpr"))
+        high_52w[ticker] = safe_float(output.get("w52_hgpr"))
+
+    # 공통 5대 퀀트 엔진 호출 (롤링 상태가 있는 종목은 새 일봉만 O(1) 증분 반영, 나머지는 묶음 단위 패널 계산)
+    quants = QUANT_STATE_STORE.evaluate_batch("KR", histories, current_prices, is_kr=True, high_52w_overrides=high_52w)
+    payloads: List[Tuple[str, Dict[str, Any], str, str]] = []
+    for page, ticker, output in collected:
+        data = assemble_finance_data(ticker, kis_ctx, output, quants[ticker])
+        payload = _build_finance_payload(page, ticker, data)
+        if payload:
+            payloads.append(payload)
+    return payloads
 
 
-def batch_update_finance_pages(
+# ==============================================================================
+# 4. 스트리밍 수집 및 노션 반영 파이프라인
+# ==============================================================================
+def stream_finance_updates(
     notion_client: Any,
-    updates: List[Tuple[str, str, Dict[str, Any], str]],
-    batch_size: int = 10,
-    delay_between_batches: float = 0.3
-) -> None:
-    """수집된 재무 정보를 배치화하여 노션에 안전하게 반영합니다."""
-    if not updates:
-        return
-    
-    print(f"📦 [{len(updates)}개 항목] 재무 정보 배치 업데이트 시작 (배치 크기: {batch_size})")
-    success_count = 0
-    fail_count = 0
-    
-    for batch_idx, i in enumerate(range(0, len(updates), batch_size), 1):
-        chunk = updates[i : i + batch_size]
-        print(f"   📤 배치 {batch_idx}/{(len(updates) + batch_size - 1) // batch_size} 처리 중 ({len(chunk)}개)...")
-        
-        with ThreadPoolExecutor(max_workers=min(len(chunk), 5)) as exe:
-            futures = {}
-            for pid, ticker, props, preview in chunk:
-                fut = exe.submit(safe_page_update, notion_client, pid, props)
-                futures[fut] = (pid, ticker, preview)
-            
-            for fut in as_completed(futures):
-                pid, ticker, preview = futures[fut]
-                try:
-                    ok = fut.result()
-                    if ok:
-                        print(f"      ✅ [Finance] {ticker} | {preview}...")
-                        success_count += 1
-                    else:
-                        print(f"      ❌ [Finance] {ticker} - 업데이트 실패")
-                        fail_count += 1
-                except Exception as exc:
-                    print(f"      ❌ [Finance] {ticker} - 예외 발생: {exc}")
-                    fail_count += 1
-        
-        if batch_idx < (len(updates) + batch_size - 1) // batch_size:
-            time.sleep(delay_between_batches)
-    
-    print(f"\n✨ 재무 정보 배치 업데이트 완료: 성공 {success_count}개, 실패 {fail_count}개")
+    records: Iterable[PageRecord],
+    kis_ctx: Dict[str, Any],
+    journal: Optional[WriteJournal] = None,
+    skip_ids: Optional[Set[str]] = None
+) -> Dict[str, int]:
+    """
+    노션 스캔 결과를 흘려보내며 재무 데이터를 병렬 수집하고, 변경된 페이로드는 즉시 노션에 반영합니다.
+    (FINANCE_PANEL_BATCH_SIZE개씩 묶어 수집 후 퀀트 지표를 패널 단위로 한 번에 계산)
+    """
+    return run_streaming_sync(
+        notion_client,
+        records,
+        lambda chunk: build_finance_updates_for_chunk(chunk, kis_ctx),
+        collect_workers=COLLECT_WORKERS,
+        write_workers=6,
+        journal=journal,
+        skip_ids=skip_ids,
+        batch_size=FINANCE_PANEL_BATCH_SIZE,
+    )
 
 
 # ==============================================================================
@@ -338,43 +309,41 @@ def main() -> None:
         print(f"🛑 [KRX 휴장일 감지] 오늘은 {reason}입니다. 불필요한 API 호출 및 리소스를 절약하기 위해 작업을 즉시 종료합니다. (강제실행: FORCE_RUN=true 또는 --force)")
         return
 
+    # KIS 토큰 확보를 노션 클라이언트 생성·저널 재개와 겹쳐 백그라운드에서 진행
+    kis_future = prefetch_kis_auth_context()
     notion = build_notion_client(NOTION_TOKEN)
-    kis_ctx = get_kis_auth_context()
+
+    # 직전 실행이 타임아웃 등으로 중단되었다면 저널에 남은 미완료 쓰기를 먼저 재개
+    journal = WriteJournal("finance_kr")
+    resumed_ids = resume_pending_writes(notion, journal)
+
+    kis_ctx = kis_future.result()
     if not kis_ctx:
         print("❌ KIS 인증 컨텍스트를 가져오지 못했습니다. 환경 변수를 확인하세요.")
         return
 
     print(f"🚀 한투 재무 정보 대량 업데이트 시작 (활성 서버: {kis_ctx['env_type']} - {kis_ctx['url_base']})")
-    all_pages = []
-    
-    print("📋 노션 데이터베이스 스캔 중...")
-    for page in paginate_database(notion, DATABASE_ID, page_size=100, retry_delay=0.05):
-        all_pages.append(page)
-    
-    print(f"📊 총 {len(all_pages)}개 항목 발견")
-    
-    batch_collect_size = 15
-    updates: List[Tuple[str, str, Dict[str, Any], str]] = []
-    
-    for batch_idx, i in enumerate(range(0, len(all_pages), batch_collect_size), 1):
-        batch = all_pages[i : i + batch_collect_size]
-        print(f"\n🔄 데이터 수집 배치 {batch_idx}/{(len(all_pages) + batch_collect_size - 1) // batch_collect_size} ({len(batch)}개 항목)")
-        
-        batch_updates = batch_collect_finance_data(batch, kis_ctx, max_workers=6)
-        updates.extend(batch_updates)
-        
-        if i + batch_collect_size < len(all_pages):
-            time.sleep(0.2)
-    
-    if updates:
-        print(f"\n📝 {len(updates)}개 항목을 노션에 업데이트합니다...")
-        batch_update_finance_pages(notion, updates, batch_size=10, delay_between_batches=0.1)
-    else:
+    # 스캔·수집·반영을 겹쳐 실행 (전체 소요 시간이 가장 느린 단계에 수렴)
+    print("📋 노션 데이터베이스 스캔과 동시에 재무 데이터 수집을 시작합니다...")
+    records = paginate_database_records(notion, DATABASE_ID, SCAN_PROPERTIES, page_size=100, retry_delay=0.05, query_filter=build_market_filter("KR"))
+    stats = stream_finance_updates(
+        notion,
+        records,
+        kis_ctx=kis_ctx,
+        journal=journal,
+        skip_ids=resumed_ids,
+    )
+    if stats["collected"] == 0:
         print("⚠️ 업데이트할 항목이 없습니다.")
 
+    print(f"   📦 {OHLCV_STORE.summary()} / {QUANT_STATE_STORE.summary()}")
     print("✨ 국내 주식 재무 정보 업데이트 프로세스가 완료되었습니다.")
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        BACKOFF.report()
+        report_kis_usage()
 
\ No newline at end of file
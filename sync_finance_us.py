@@ -17,8 +17,7 @@ import sys
 import time
 import logging
 from datetime import datetime, timedelta, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import yfinance as yf
 import numpy as np
@@ -32,18 +31,27 @@ if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
         pass
 
 from notion_utils import (
+    BACKOFF,
     build_notion_client,
     get_env_var,
-    get_page_text,
     kst_isoformat,
     set_page_date_property,
-    paginate_database,
-    safe_page_update,
-    get_http_session,
+    paginate_database_records,
+    PageRecord,
+    build_market_filter,
+    UPDATE_DATE_CANDIDATES,
+    run_streaming_sync,
+    WriteJournal,
+    resume_pending_writes,
+    get_yahoo_session,
     is_kr_ticker,
     safe_float,
     is_valid_num,
-    calculate_quant_indicators,
+    QUANT_STATE_STORE,
+    OHLCV_STORE,
+    YAHOO_FUNDAMENTALS_CACHE,
+    YAHOO_FUNDAMENTAL_MODULES,
+    get_yahoo_client,
     build_dirty_payload,
     is_market_holiday,
 )
@@ -60,7 +68,20 @@ DATABASE_ID = (
     or get_env_var("DATABASE_ID")
 )
 
-SESSION = get_http_session()
+# 종목마다 quoteSummary·일봉 등 야후 호출이 여러 건이라 429를 피하도록 4개로 제한
+COLLECT_WORKERS = 4
+
+# 퀀트 지표 계산용 일봉 조회 구간 (기존 period="1y"와 동일한 1년)
+CHART_LOOKBACK_DAYS = 366
+# 퀀트 지표를 패널(일자 × 종목) 단위로 한 번에 계산할 수집 묶음 크기
+FINANCE_PANEL_BATCH_SIZE = int(os.environ.get("FINANCE_PANEL_BATCH_SIZE", "25"))
+
+FINANCE_NUM_FIELDS = [
+    "PER", "추정PER", "EPS", "추정EPS", "PBR", "BPS", "배당수익률",
+    "직전고점", "직전저점", "200일선", "50일선", "수급선", "12M 모멘텀", "52주 낙폭", "낙폭율", "60일 변동성"
+]
+FINANCE_SELECT_FIELDS = ["추세", "스마트 가이드", "모멘텀 진단", "위험도 등급"]
+SCAN_PROPERTIES = ["티커", "Ticker", "종목명", "Name"] + FINANCE_NUM_FIELDS + FINANCE_SELECT_FIELDS + UPDATE_DATE_CANDIDATES
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger("FinanceSyncUS")
@@ -69,13 +90,13 @@ logger = logging.getLogger("FinanceSyncUS")
 # ==============================================================================
 # 2. 해외 주식 재무 데이터 수집부 (Yahoo Finance)
 # ==============================================================================
-def get_stock_financials(
+def fetch_stock_financials(
     ticker: str,
     max_retries: int = 3,
     base_delay: float = 2.0
-) -> Dict[str, Any]:
+) -> Tuple[Dict[str, Any], Any]:
     """
-    Yahoo Finance에서 해외 주식 재무 데이터 및 5대 퀀트 지표를 조회합니다.
+    Yahoo Finance에서 해외 주식 재무 데이터와 퀀트 지표용 1년치 일봉을 조회하여 (재무 딕셔너리, 일봉 DataFrame)으로 반환합니다.
     네트워크 에러나 타임아웃이 발생하면 지수 백오프 후 최대 3번까지 재시도합니다.
     """
     res: Dict[str, Any] = {
@@ -85,53 +106,37 @@ def get_stock_financials(
         "직전고점": None, "직전저점": None,
         "200일선": None, "추세": None, "12M 모멘텀": None, "52주 낙폭": None, "60일 변동성": None,
     }
-    
+    hist = None
+
     attempt = 1
     while attempt <= max_retries:
         try:
-            stock = yf.Ticker(ticker, session=SESSION)
+            stock = yf.Ticker(ticker, session=get_yahoo_session())
             
-            # 1. fast_info에서 52주 가격 정보 먼저 추출 (고속)
+            # 1. fast_info에서 현재가 및 52주 가격 정보 먼저 추출 (고속)
             f_info = stock.fast_info
+            last_price = safe_float(f_info.get('last_price'))
             res["52주 최고가"] = safe_float(f_info.get('year_high'))
             res["52주 최저가"] = safe_float(f_info.get('year_low'))
 
-            # 2. 나머지 재무 정보는 info에서 추출
-            info = stock.info
-            if info:
-                res.update({
-                    "PER": safe_float(info.get("trailingPE")),
-                    "추정PER": safe_float(info.get("forwardPE")),
-                    "EPS": safe_float(info.get("trailingEps")),
-                    "추정EPS": safe_float(info.get("forwardEps")),
-                    "PBR": safe_float(info.get("priceToBook")),
-                    "BPS": safe_float(info.get("bookValue")),
-                    "52주 최고가": safe_float(info.get("fiftyTwoWeekHigh")) or res["52주 최고가"],
-                    "52주 최저가": safe_float(info.get("fiftyTwoWeekLow")) or res["52주 최저가"],
-                })
-                div_yield = safe_float(info.get("dividendYield"))
-                if div_yield is not None:
-                    res["배당수익률"] = div_yield * 100
-
-            # 3. 1년치 일봉 시계열로 직전고저점 및 5대 퀀트 지표 계산
-            hist = stock.history(period="1y")
-            if not hist.empty:
-                quant = calculate_quant_indicators(hist, is_kr=False)
-                res["직전고점"] = safe_float(quant["swing_high"])
-                res["직전저점"] = safe_float(quant["swing_low"])
-                res["50일선"] = safe_float(quant["ma_supply"])
-                res["수급선"] = safe_float(quant["ma_supply"])
-                res["200일선"] = safe_float(quant["ma200"])
-                res["추세"] = quant["trend"]
-                res["12M 모멘텀"] = safe_float(quant["mom_12m"])
-                res["모멘텀 진단"] = quant["mom_diag"]
-                res["52주 낙폭"] = safe_float(quant["drawdown_52w"])
-                res["낙폭율"] = safe_float(quant["drawdown_52w"])
-                res["60일 변동성"] = safe_float(quant["vol_60d"])
-                res["위험도 등급"] = quant["risk_grade"]
-                res["스마트 가이드"] = quant["smart_guide"]
-
-            return res
+            # 2. 기초 필드(EPS·BPS·추정치)는 펀더멘털 캐시 우선, 만료(주간/실적 발표) 시에만 quoteSummary 조회
+            # (Ticker.info 대신 기초 필드가 담긴 모듈만 요청)
+            fundamentals = YAHOO_FUNDAMENTALS_CACHE.get(ticker)
+            if fundamentals is None:
+                info = get_yahoo_client().get_info(ticker, YAHOO_FUNDAMENTAL_MODULES)
+                fundamentals = YAHOO_FUNDAMENTALS_CACHE.put(ticker, info) if info else {}
+            if fundamentals:
+                res.update(derive_valuation_fields(fundamentals, last_price))
+                res["52주 최고가"] = res["52주 최고가"] or safe_float(fundamentals.get("fiftyTwoWeekHigh"))
+                res["52주 최저가"] = res["52주 최저가"] or safe_float(fundamentals.get("fiftyTwoWeekLow"))
+
+            # 3. 1년치 일봉 시계열 (직전고저점 및 5대 퀀트 지표 계산용)
+            # (로컬 일봉 저장소에 보관된 구간은 재사용하고 마지막 보관일 이후의 최근 일봉만 수신)
+            hist = OHLCV_STORE.get_history(
+                "US", ticker, CHART_LOOKBACK_DAYS,
+                lambda start: stock.history(start=start.isoformat(), auto_adjust=True),
+            )
+            return res, hist
             
         except (ConnectionError, TimeoutError) as exc:
             if attempt < max_retries:
@@ -141,7 +146,7 @@ def get_stock_financials(
                 attempt += 1
                 continue
             logger.warning(f"   ❌ [{ticker}] 네트워크 에러 (최대 재시도 초과): {exc}")
-            return res
+            return res, hist
             
         except Exception as exc:
             if attempt < max_retries:
@@ -151,8 +156,60 @@ def get_stock_financials(
                 attempt += 1
                 continue
             logger.warning(f"   ❌ [{ticker}] 데이터 수집 실패 (시도 {attempt}/{max_retries}): {exc}")
-            return res
-    
+            return res, hist
+
+    return res, hist
+
+
+def derive_valuation_fields(fundamentals: Dict[str, Any], price: Optional[float]) -> Dict[str, Any]:
+    """
+    기초 필드(EPS·BPS·추정 EPS·주당배당금)와 당일 현재가로 PER·추정PER·PBR·배당수익률을 계산합니다.
+    현재가가 없거나 EPS·BPS가 0 이하라 계산할 수 없으면 보관된 야후 비율값을 그대로 사용합니다.
+    """
+    eps = safe_float(fundamentals.get("trailingEps"))
+    fwd_eps = safe_float(fundamentals.get("forwardEps"))
+    bps = safe_float(fundamentals.get("bookValue"))
+    div_rate = safe_float(fundamentals.get("dividendRate"))
+
+    def _ratio(denominator: Optional[float], fallback_key: str) -> Optional[float]:
+        if price and price > 0 and denominator and denominator > 0:
+            return round(price / denominator, 2)
+        return safe_float(fundamentals.get(fallback_key))
+
+    div_yield = safe_float(fundamentals.get("dividendYield"))
+    if price and price > 0 and div_rate is not None:
+        div_yield = round(div_rate / price * 100, 2)
+    elif div_yield is not None:
+        div_yield = div_yield * 100
+
+    return {
+        "PER": _ratio(eps, "trailingPE"),
+        "추정PER": _ratio(fwd_eps, "forwardPE"),
+        "EPS": eps,
+        "추정EPS": fwd_eps,
+        "PBR": _ratio(bps, "priceToBook"),
+        "BPS": bps,
+        "배당수익률": div_yield,
+    }
+
+
+def apply_quant_fields(res: Dict[str, Any], quant: Dict[str, Any]) -> Dict[str, Any]:
+    """5대 퀀트 엔진 결과를 노션 재무 필드명으로 옮겨 담습니다. (일봉이 없어 산출값이 없으면 그대로 둠)"""
+    if quant.get("ma200") is None:
+        return res
+    res["직전고점"] = safe_float(quant["swing_high"])
+    res["직전저점"] = safe_float(quant["swing_low"])
+    res["50일선"] = safe_float(quant["ma_supply"])
+    res["수급선"] = safe_float(quant["ma_supply"])
+    res["200일선"] = safe_float(quant["ma200"])
+    res["추세"] = quant["trend"]
+    res["12M 모멘텀"] = safe_float(quant["mom_12m"])
+    res["모멘텀 진단"] = quant["mom_diag"]
+    res["52주 낙폭"] = safe_float(quant["drawdown_52w"])
+    res["낙폭율"] = safe_float(quant["drawdown_52w"])
+    res["60일 변동성"] = safe_float(quant["vol_60d"])
+    res["위험도 등급"] = quant["risk_grade"]
+    res["스마트 가이드"] = quant["smart_guide"]
     return res
 
 
@@ -172,109 +229,82 @@ def get_diagnostic_color(text: str) -> str:
     return "default"
 
 
-def build_finance_update_for_page(
-    page: Dict[str, Any]
-) -> Optional[Tuple[str, str, Dict[str, Any], str]]:
-    """개별 해외 주식 페이지의 재무 데이터를 수집하고 변경된 경우에만 업데이트 정보를 반환합니다."""
-    props = page.get("properties", {})
-    ticker = get_page_text(props, ["티커", "Ticker"]).upper()
-    if not ticker or is_kr_ticker(ticker):
-        return None
+def _build_finance_payload(
+    page: PageRecord,
+    ticker: str,
+    fin_data: Dict[str, Any]
+) -> Optional[Tuple[str, Dict[str, Any], str, str]]:
+    """수집된 재무 데이터를 기존 페이지 값과 비교하여 변경된 속성만 담은 페이로드를 만듭니다."""
+    dirty_props = build_dirty_payload(
+        existing_props=page,
+        candidate_data=fin_data,
+        num_fields=FINANCE_NUM_FIELDS,
+        select_fields=FINANCE_SELECT_FIELDS,
+        diagnostic_color_fn=get_diagnostic_color
+    )
 
-    number_keys = [
-        "PER", "추정PER", "EPS", "추정EPS", "PBR", "BPS", "배당수익률",
-        "직전고점", "직전저점", "200일선", "50일선", "수급선", "12M 모멘텀", "52주 낙폭", "낙폭율", "60일 변동성"
-    ]
-    select_keys = ["추세", "스마트 가이드", "모멘텀 진단", "위험도 등급"]
-    
-    try:
-        fin_data = get_stock_financials(ticker)
-        dirty_props = build_dirty_payload(
-            existing_props=props,
-            candidate_data=fin_data,
-            num_fields=number_keys,
-            select_fields=select_keys,
-            diagnostic_color_fn=get_diagnostic_color
-        )
-
-        if not dirty_props:
-            return None
-        
-        preview = ", ".join([f"{k}={v}" for k, v in list(fin_data.items())[:3]])
-        return (page["id"], ticker, dirty_props, preview)
-        
-    except Exception as e:
-        logger.warning(f"❌ [{ticker}] 데이터 수집 중 에러: {e}")
+    if not dirty_props:
         return None
 
+    preview = ", ".join([f"{k}={v}" for k, v in list(fin_data.items())[:3]])
+    return (page.id, dirty_props, ticker, preview)
 
-# ==============================================================================
-# 4. 배치 수집 및 노션 다중 스레드 반영
-# ==============================================================================
-def batch_collect_us_finance_data(
-    pages: List[Dict[str, Any]],
-    max_workers: int = 5
-) -> List[Tuple[str, str, Dict[str, Any], str]]:
-    """여러 페이지의 해외 주식 재무 데이터를 병렬로 수집합니다."""
-    updates: List[Tuple[str, str, Dict[str, Any], str]] = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(build_finance_update_for_page, page): page for page in pages}
-        
-        for fut in as_completed(futures):
-            try:
-                result = fut.result()
-                if result:
-                    updates.append(result)
-            except Exception as exc:
-                page = futures[fut]
-                ticker = get_page_text(page.get("properties", {}), ["티커", "Ticker"]).upper() or "UNKNOWN"
-                logger.warning(f"❌ [{ticker}] 데이터 수집 중 에러: {exc}")
-    
-    return updates
+
+def build_finance_updates_for_chunk(
+    pages: List[PageRecord]
+) -> List[Tuple[str, Dict[str, Any], str, str]]:
+    """
+    페이지 묶음의 재무 데이터·일봉을 수집한 뒤 퀀트 지표는 종목별 롤링 상태(없으면 패널 엔진)로
+    묶음 전체를 한 번에 계산하고, 변경된 페이지의 페이로드만 반환합니다.
+    """
+    collected: List[Tuple[PageRecord, str, Dict[str, Any]]] = []
+    histories: Dict[str, Any] = {}
+    for page in pages:
+        ticker = page.text(["티커", "Ticker"]).upper()
+        if not ticker or is_kr_ticker(ticker):
+            continue
+        try:
+            res, hist = fetch_stock_financials(ticker)
+        except Exception as e:
+            logger.warning(f"❌ [{ticker}] 데이터 수집 중 에러: {e}")
+            continue
+        collected.append((page, ticker, res))
+        histories[ticker] = hist
+
+    # 롤링 상태가 있는 종목은 새 일봉만 O(1) 증분 반영, 나머지는 묶음 단위 패널 계산
+    quants = QUANT_STATE_STORE.evaluate_batch("US", histories, is_kr=False)
+    payloads: List[Tuple[str, Dict[str, Any], str, str]] = []
+    for page, ticker, res in collected:
+        payload = _build_finance_payload(page, ticker, apply_quant_fields(res, quants[ticker]))
+        if payload:
+            payloads.append(payload)
+    return payloads
 
 
-def batch_update_us_finance_pages(
+# ==============================================================================
+# 4. 스트리밍 수집 및 노션 반영 파이프라인
+# ==============================================================================
+def stream_finance_updates(
     notion_client: Any,
-    updates: List[Tuple[str, str, Dict[str, Any], str]],
-    batch_size: int = 10,
-    delay_between_batches: float = 0.1
-) -> None:
-    """배치 단위로 노션 해외 주식 재무 정보 페이지를 업데이트합니다."""
-    if not updates:
-        return
-    
-    logger.info(f"📦 [{len(updates)}개 항목] 해외 주식 재무 정보 배치 업데이트 시작 (배치 크기: {batch_size})")
-    success_count = 0
-    fail_count = 0
-    
-    for batch_idx, i in enumerate(range(0, len(updates), batch_size), 1):
-        chunk = updates[i : i + batch_size]
-        logger.info(f"   📤 배치 {batch_idx}/{(len(updates) + batch_size - 1) // batch_size} 처리 중 ({len(chunk)}개)...")
-        
-        with ThreadPoolExecutor(max_workers=min(len(chunk), 5)) as exe:
-            futures = {}
-            for pid, ticker, props, preview in chunk:
-                fut = exe.submit(safe_page_update, notion_client, pid, props)
-                futures[fut] = (pid, ticker, preview)
-            
-            for fut in as_completed(futures):
-                pid, ticker, preview = futures[fut]
-                try:
-                    ok = fut.result()
-                    if ok:
-                        logger.info(f"      ✅ [Global: {ticker}] {preview}...")
-                        success_count += 1
-                    else:
-                        logger.warning(f"      ❌ [Global: {ticker}] 업데이트 실패")
-                        fail_count += 1
-                except Exception as exc:
-                    logger.warning(f"      ❌ [Global: {ticker}] 예외 발생: {exc}")
-                    fail_count += 1
-        
-        if batch_idx < (len(updates) + batch_size - 1) // batch_size:
-            time.sleep(delay_between_batches)
-    
-    logger.info(f"\n✨ 해외 주식 재무 정보 배치 업데이트 완료: 성공 {success_count}개, 실패 {fail_count}개")
+    records: Iterable[PageRecord],
+    journal: Optional[WriteJournal] = None,
+    skip_ids: Optional[Set[str]] = None
+) -> Dict[str, int]:
+    """
+    노션 스캔 결과를 흘려보내며 재무 데이터를 병렬 수집하고, 변경된 페이로드는 즉시 노션에 반영합니다.
+    (FINANCE_PANEL_BATCH_SIZE개씩 묶어 수집 후 퀀트 지표를 패널 단위로 한 번에 계산)
+    """
+    return run_streaming_sync(
+        notion_client,
+        records,
+        build_finance_updates_for_chunk,
+        collect_workers=COLLECT_WORKERS,
+        write_workers=6,
+        logger=logger,
+        journal=journal,
+        skip_ids=skip_ids,
+        batch_size=FINANCE_PANEL_BATCH_SIZE,
+    )
 
 
 # ==============================================================================
@@ -290,40 +320,34 @@ def main() -> None:
         return
 
     notion_client = build_notion_client(NOTION_TOKEN)
+
+    # 직전 실행이 타임아웃 등으로 중단되었다면 저널에 남은 미완료 쓰기를 먼저 재개
+    journal = WriteJournal("finance_us", market="US")
+    resumed_ids = resume_pending_writes(notion_client, journal, logger=logger)
+
     kst = timezone(timedelta(hours=9))
     logger.info(f"🌍 [해외 주식 재무 업데이트] 시작 - {datetime.now(kst)}")
     
-    all_pages = []
-    
-    logger.info("📋 노션 데이터베이스 스캔 중...")
-    for page in paginate_database(notion_client, DATABASE_ID, page_size=100, retry_delay=0.05):
-        all_pages.append(page)
-    
-    logger.info(f"📊 총 {len(all_pages)}개 항목 발견")
-    
-    batch_collect_size = 20
-    updates: List[Tuple[str, str, Dict[str, Any], str]] = []
-    
-    for batch_idx, i in enumerate(range(0, len(all_pages), batch_collect_size), 1):
-        batch = all_pages[i : i + batch_collect_size]
-        logger.info(f"\n🔄 데이터 수집 배치 {batch_idx}/{(len(all_pages) + batch_collect_size - 1) // batch_collect_size} ({len(batch)}개 항목)")
-        
-        batch_updates = batch_collect_us_finance_data(batch, max_workers=4)
-        updates.extend(batch_updates)
-        
-        if i + batch_collect_size < len(all_pages):
-            time.sleep(0.5)
-    
-    if updates:
-        logger.info(f"\n📝 {len(updates)}개 항목을 노션에 업데이트합니다...")
-        batch_update_us_finance_pages(notion_client, updates, batch_size=10, delay_between_batches=0.1)
-    else:
+    # 스캔·수집·반영을 겹쳐 실행 (전체 소요 시간이 가장 느린 단계에 수렴)
+    logger.info("📋 노션 데이터베이스 스캔과 동시에 재무 데이터 수집을 시작합니다...")
+    records = paginate_database_records(notion_client, DATABASE_ID, SCAN_PROPERTIES, page_size=100, retry_delay=0.05, query_filter=build_market_filter("US"))
+    stats = stream_finance_updates(
+        notion_client,
+        records,
+        journal=journal,
+        skip_ids=resumed_ids,
+    )
+    if stats["collected"] == 0:
         logger.warning("⚠️ 업데이트할 항목이 없습니다.")
 
+    logger.info(f"   📦 {OHLCV_STORE.summary()} / {QUANT_STATE_STORE.summary()} / {YAHOO_FUNDAMENTALS_CACHE.summary()} / {get_yahoo_client().summary()}")
     logger.info("✨ 해외 주식 재무 정보 업데이트 프로세스가 완료되었습니다.")
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        BACKOFF.report(logger)
 
 
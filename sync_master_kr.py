@@ -19,7 +19,6 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any, Optional, Dict, List, Tuple
 
 import pandas as pd
-import FinanceDataReader as fdr
 
 # Windows 콘솔 인코딩 안전화
 if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
@@ -29,15 +28,17 @@ if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
         pass
 
 from notion_utils import (
+    BACKOFF,
     build_notion_client,
     get_env_var,
-    paginate_database,
+    paginate_database_cached,
     safe_page_update,
-    make_rich_text,
+    build_dirty_payload,
     kst_isoformat,
-    set_page_date_property,
-    get_kis_auth_context,
-    get_http_session,
+    prefetch_kis_auth_context,
+    get_kis_client,
+    report_kis_usage,
+    KIS_MAX_WORKERS,
     is_kr_ticker,
     get_page_text,
     match_keyword,
@@ -46,6 +47,7 @@ from notion_utils import (
     resolve_stock_taxonomy,
     load_benchmark_config,
     batch_update_pages,
+    FDR_LISTINGS,
 )
 
 
@@ -78,47 +80,34 @@ class StockAutomationEngineKR:
     def __init__(self, kis_ctx: Optional[Dict[str, Any]] = None):
         logger.info("📡 한국 주식 마스터 엔진 가동 (FDR + KIS API)...")
         self.kis_ctx = kis_ctx
-        self.session = get_http_session()
+        self.kis = get_kis_client(kis_ctx) if kis_ctx and kis_ctx.get("token") else None
 
-        # FDR 오픈 피드를 통한 초고속 메모리 로드
+        # FDR 오픈 피드를 통한 초고속 메모리 로드 (같은 거래일에 받은 목록은 디스크 캐시에서 재사용)
         try:
-            self.df_kr_desc = fdr.StockListing('KRX-DESC').set_index('Code')
+            self.df_kr_desc = FDR_LISTINGS.get('KRX-DESC').set_index('Code')
         except Exception as exc:
             logger.warning(f"⚠️ KRX-DESC 로드 실패 (KRX 기본으로 대체): {exc}")
-            self.df_kr_desc = fdr.StockListing('KRX').set_index('Code')
+            self.df_kr_desc = FDR_LISTINGS.get('KRX').set_index('Code')
 
         try:
-            self.kr_etf = fdr.StockListing('ETF/KR').set_index('Symbol').to_dict('index')
+            self.kr_etf = FDR_LISTINGS.get('ETF/KR').set_index('Symbol').to_dict('index')
         except Exception as exc:
             logger.warning(f"⚠️ ETF/KR 로드 실패: {exc}")
             self.kr_etf = {}
 
     def get_kis_market_info(self, clean_ticker: str) -> Optional[Dict[str, str]]:
         """한투 API(inquire-price)를 호출하여 공식 시장 및 K200/K150 소속 여부를 조회합니다."""
-        if not self.kis_ctx or not self.kis_ctx.get("token"):
+        if self.kis is None:
             return None
 
-        url = f"{self.kis_ctx['url_base']}/uapi/domestic-stock/v1/quotations/inquire-price"
-        headers = {
-            "authorization": f"Bearer {self.kis_ctx['token']}",
-            "appkey": self.kis_ctx["app_key"],
-            "appsecret": self.kis_ctx["app_secret"],
-            "tr_id": "FHKST01010100",
-            "custtype": "P",
+        # 가격·재무 동기화가 같은 세션에 받아 둔 현재가 응답이 있으면 디스크 시세 캐시에서 재사용
+        out = self.kis.get_quote(clean_ticker, max_retries=2, timeout=5, quiet=True)
+        if not out:
+            return None
+        return {
+            "rprs_market": out.get("rprs_mrkt_kor_name", ""),
+            "industry_name": out.get("bstp_kor_isnm", ""),
         }
-        params = {"fid_cond_mrkt_div_code": "J", "fid_input_iscd": clean_ticker}
-
-        try:
-            res = self.session.get(url, headers=headers, params=params, timeout=5)
-            if res.status_code == 200:
-                out = res.json().get("output", {})
-                return {
-                    "rprs_market": out.get("rprs_mrkt_kor_name", ""),
-                    "industry_name": out.get("bstp_kor_isnm", ""),
-                }
-        except Exception:
-            pass
-        return None
 
 
 # ==============================================================================
@@ -203,34 +192,45 @@ def process_page_kr(
     us_industry_bms = [bm for bm in config["benchmarks"] if bm["category"] == "산업" and bm["country"] == "US"]
     target_g_ind_t = find_best_bm(text_corpus, us_industry_bms)
 
-    update_props: Dict[str, Any] = {
-        "종목명": make_rich_text(stock_name),
-        "Market": {"select": {"name": tax["market"]}},
-        "국가": {"select": {"name": tax["country"]}},
-        "상품유형": {"select": {"name": tax["product_type"]}},
-        "자산군": {"select": {"name": tax["asset_class"]}},
-        "KR_섹터": make_rich_text(sec_val),
-        "KR_산업": make_rich_text(ind_val),
+    candidate: Dict[str, Any] = {
+        "종목명": stock_name,
+        "Market": tax["market"],
+        "국가": tax["country"],
+        "상품유형": tax["product_type"],
+        "자산군": tax["asset_class"],
+        "KR_섹터": sec_val,
+        "KR_산업": ind_val,
     }
-    set_page_date_property(update_props, props)
 
     if blue_chip_tags:
-        update_props["우량주"] = {"multi_select": [{"name": tag} for tag in blue_chip_tags]}
+        candidate["우량주"] = blue_chip_tags
 
     if target_m_t and target_m_t != clean_t and (m_id := config["ticker_to_id"].get(target_m_t)):
-        update_props["시장BM"] = {"relation": [{"id": m_id}]}
+        candidate["시장BM"] = [m_id]
     else:
-        update_props["시장BM"] = {"relation": []}
+        candidate["시장BM"] = []
 
     if target_k_ind_t and target_k_ind_t != clean_t and (k_id := config["ticker_to_id"].get(target_k_ind_t)):
-        update_props["K산업BM"] = {"relation": [{"id": k_id}]}
+        candidate["K산업BM"] = [k_id]
     else:
-        update_props["K산업BM"] = {"relation": []}
+        candidate["K산업BM"] = []
 
     if target_g_ind_t and target_g_ind_t != clean_t and (g_id := config["ticker_to_id"].get(target_g_ind_t)):
-        update_props["G산업BM"] = {"relation": [{"id": g_id}]}
+        candidate["G산업BM"] = [g_id]
     else:
-        update_props["G산업BM"] = {"relation": []}
+        candidate["G산업BM"] = []
+
+    # 실제로 바뀐 메타데이터만 추려 전송 (변경 없으면 쓰기 생략)
+    update_props = build_dirty_payload(
+        existing_props=props,
+        candidate_data=candidate,
+        select_fields=["Market", "국가", "상품유형", "자산군"],
+        text_fields=["종목명", "KR_섹터", "KR_산업"],
+        relation_fields=["시장BM", "K산업BM", "G산업BM"],
+        multi_select_fields=["우량주"],
+    )
+    if not update_props:
+        return None
 
     return pid, update_props, clean_t, stock_name
 
@@ -240,29 +240,42 @@ def process_page_kr(
 # ==============================================================================
 def main() -> None:
     """한국 주식 마스터 DB 동기화 메인 파이프라인"""
+    # KIS 토큰 확보를 벤치마크 설정 로드와 겹쳐 백그라운드에서 진행
+    kis_future = prefetch_kis_auth_context()
     client = build_notion_client(NOTION_TOKEN, use_httpx=True, timeout=60.0)
-    kis_ctx = get_kis_auth_context()
     config = load_benchmark_config(client, BENCHMARK_DATABASE_ID, logger=logger)
-    engine = StockAutomationEngineKR(kis_ctx)
+    engine = StockAutomationEngineKR(kis_future.result())
 
     all_pages = []
     logger.info("📋 마스터 DB 스캔 및 대상 페이지 추출 시작...")
-    for page in paginate_database(client, MASTER_DATABASE_ID, page_size=100, retry_delay=0.2):
+    for page in paginate_database_cached(client, MASTER_DATABASE_ID, page_size=100, retry_delay=0.2):
         all_pages.append(page)
 
     logger.info(f"📊 총 {len(all_pages)}개의 동기화 대상 목록 확보 완료")
 
+    # 페이지별 KIS 시장구분 조회를 병렬화 (호출 속도는 공용 KIS_BUCKET이 앱키 한도 이내로 제어)
     update_payloads = []
-    for page in all_pages:
-        res = process_page_kr(page, engine, client, config)
-        if res:
-            update_payloads.append(res)
+    with ThreadPoolExecutor(max_workers=KIS_MAX_WORKERS) as executor:
+        futures = {executor.submit(process_page_kr, page, engine, client, config): page for page in all_pages}
+        for fut in as_completed(futures):
+            try:
+                res = fut.result()
+            except Exception as exc:
+                logger.warning(f"❌ [{futures[fut].get('id')}] 마스터 정보 분석 중 예외 발생: {exc}")
+                continue
+            if res:
+                update_payloads.append(res)
 
     if update_payloads:
-        batch_update_pages(client, update_payloads, max_workers=3, delay=0.1, logger=logger)
+        batch_update_pages(client, update_payloads, max_workers=6, logger=logger)
 
+    logger.info(f"   📦 {FDR_LISTINGS.summary()}")
     logger.info("✨ 한국 주식 마스터 DB 통합 업데이트 프로세스 완료")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        BACKOFF.report(logger)
+        report_kis_usage(logger)
\ No newline at end of file
@@ -2,7 +2,7 @@
 update_master_db_us.py
 =======================
 미국/글로벌 상장 주식(S&P 500, NASDAQ, NYSE, 글로벌 ADR, ETF)의 마스터 메타데이터를 노션 상장주식 DB에 동기화합니다.
-- 데이터 소스: FinanceDataReader (S&P 500, NASDAQ, NYSE) + yfinance
+- 데이터 소스: FinanceDataReader (S&P 500, NASDAQ, NYSE) + 야후 quoteSummary
 - 메타데이터: 종목명(간결한 브랜드명), 마켓(NASDAQ/NYSE/AMEX/ETF), US_섹터, US_업종, 우량주(S&P500/나스닥100) 태깅
 - 지표 연동: 지표 DB의 매칭키워드를 기반으로 시장BM(SPY/QQQ/ONEQ/VTI), G산업BM 동적 릴레이션 연결
 """
@@ -18,8 +18,6 @@ from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple, Set
 
 import pandas as pd
-import yfinance as yf
-import FinanceDataReader as fdr
 
 # Windows 콘솔 인코딩 안전화
 if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
@@ -29,23 +27,25 @@ if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
         pass
 
 from notion_utils import (
+    BACKOFF,
     build_notion_client,
     get_env_var,
     get_page_text,
-    paginate_database,
+    paginate_database_cached,
     safe_page_update,
     kst_isoformat,
-    set_page_date_property,
     extract_short_brand_name,
     is_kr_ticker,
-    make_rich_text,
-    get_http_session,
+    build_dirty_payload,
     match_keyword,
     find_best_bm,
     parse_keywords,
     resolve_stock_taxonomy,
     load_benchmark_config,
     batch_update_pages,
+    FDR_LISTINGS,
+    get_yahoo_client,
+    YAHOO_PROFILE_MODULES,
 )
 
 # ==============================================================================
@@ -72,15 +72,14 @@ logger = logging.getLogger("MasterSyncUS")
 # 2. 미국 주식 데이터 엔진 (인메모리 인덱스 & 실시간 캐시)
 # ==============================================================================
 class StockAutomationEngineUS:
-    """FinanceDataReader 및 yfinance 기반 고속 인메모리 종목 메타데이터 엔진"""
+    """FinanceDataReader 및 야후 quoteSummary 기반 고속 인메모리 종목 메타데이터 엔진"""
 
     def __init__(self):
         logger.info("📡 미국/글로벌 종목 메타데이터 엔진 초기화 중...")
-        self.session = get_http_session()
 
-        # FDR 오픈 피드를 통한 초고속 메모리 로드
+        # FDR 오픈 피드를 통한 초고속 메모리 로드 (같은 거래일에 받은 목록은 디스크 캐시에서 재사용)
         try:
-            self.df_nasdaq = fdr.StockListing('NASDAQ').set_index('Symbol')
+            self.df_nasdaq = FDR_LISTINGS.get('NASDAQ').set_index('Symbol')
             self.nasdaq_symbols = set(self.df_nasdaq.index)
         except Exception as e:
             logger.warning(f"⚠️ NASDAQ 로드 실패: {e}")
@@ -88,7 +87,7 @@ class StockAutomationEngineUS:
             self.nasdaq_symbols = set()
 
         try:
-            self.df_nyse = fdr.StockListing('NYSE').set_index('Symbol')
+            self.df_nyse = FDR_LISTINGS.get('NYSE').set_index('Symbol')
             self.nyse_symbols = set(self.df_nyse.index)
         except Exception as e:
             logger.warning(f"⚠️ NYSE 로드 실패: {e}")
@@ -96,16 +95,13 @@ class StockAutomationEngineUS:
             self.nyse_symbols = set()
 
         try:
-            self.sp500_dict = fdr.StockListing('S&P500').set_index('Symbol').to_dict('index')
+            self.sp500_dict = FDR_LISTINGS.get('S&P500').set_index('Symbol').to_dict('index')
         except Exception as e:
             logger.warning(f"⚠️ S&P500 로드 실패: {e}")
             self.sp500_dict = {}
 
-        try:
-            df_nq100 = fdr.StockListing('NASDAQ')
-            self.nasdaq_100 = set(df_nq100.head(100)['Symbol']) if not df_nq100.empty else set()
-        except Exception:
-            self.nasdaq_100 = set()
+        # 나스닥100: 위에서 받은 NASDAQ 목록의 상위 100종목 (목록 재요청 없음)
+        self.nasdaq_100 = set(self.df_nasdaq.index[:100])
 
 
 # ==============================================================================
@@ -157,10 +153,9 @@ def process_page_us(
         sec = str(row.get('IndustryCode', ''))
         m_hint = "NYSE"
     else:
-        # 2. YFinance 폴백
+        # 2. 야후 quoteSummary 폴백 (종목명·거래소·섹터가 담긴 price/summaryProfile 모듈만 요청)
         try:
-            yf_item = yf.Ticker(raw_t, session=engine.session)
-            info = yf_item.info
+            info = get_yahoo_client().get_info(raw_t, YAHOO_PROFILE_MODULES)
             name = extract_short_brand_name(info.get("longName") or info.get("shortName") or raw_t)
             sec = info.get("sector") or ""
             ind = info.get("industry") or ""
@@ -180,7 +175,7 @@ def process_page_us(
             else:
                 m_hint = "GLOBAL"
         except Exception as exc:
-            logger.warning(f"⚠️ [{raw_t}] YFinance 조회 실패: {exc}")
+            logger.warning(f"⚠️ [{raw_t}] 야후 조회 실패: {exc}")
             name = raw_t
             if raw_t.endswith(".T"):
                 m_hint = "TSE"
@@ -206,16 +201,15 @@ def process_page_us(
     us_industry_bms = [bm for bm in config["benchmarks"] if bm["category"] == "산업" and bm["country"] == "US"]
     target_ind_t = find_best_bm(text_corpus, us_industry_bms)
 
-    update_props: Dict[str, Any] = {
-        "종목명": make_rich_text(name),
-        "Market": {"select": {"name": tax["market"]}},
-        "국가": {"select": {"name": tax["country"]}},
-        "상품유형": {"select": {"name": tax["product_type"]}},
-        "자산군": {"select": {"name": tax["asset_class"]}},
-        "US_섹터": make_rich_text(sec),
-        "US_업종": make_rich_text(ind),
+    candidate: Dict[str, Any] = {
+        "종목명": name,
+        "Market": tax["market"],
+        "국가": tax["country"],
+        "상품유형": tax["product_type"],
+        "자산군": tax["asset_class"],
+        "US_섹터": sec,
+        "US_업종": ind,
     }
-    set_page_date_property(update_props, props)
 
     # 4. 우량주 태깅
     blue_chip_tags = []
@@ -225,23 +219,35 @@ def process_page_us(
         blue_chip_tags.append("NASDAQ 100")
 
     if blue_chip_tags:
-        update_props["우량주"] = {"multi_select": [{"name": tag} for tag in blue_chip_tags]}
+        candidate["우량주"] = blue_chip_tags
 
     # 5. 벤치마크 관계형 속성 반영
-    update_props["K산업BM"] = {"relation": []}
+    candidate["K산업BM"] = []
     if market_label in ("기타", "COMEX"):
-        update_props["시장BM"] = {"relation": []}
-        update_props["G산업BM"] = {"relation": []}
+        candidate["시장BM"] = []
+        candidate["G산업BM"] = []
     else:
         if target_m_t and target_m_t != raw_t and (m_id := config["ticker_to_id"].get(target_m_t)):
-            update_props["시장BM"] = {"relation": [{"id": m_id}]}
+            candidate["시장BM"] = [m_id]
         else:
-            update_props["시장BM"] = {"relation": []}
+            candidate["시장BM"] = []
 
         if target_ind_t and target_ind_t != raw_t and (ind_id := config["ticker_to_id"].get(target_ind_t)):
-            update_props["G산업BM"] = {"relation": [{"id": ind_id}]}
+            candidate["G산업BM"] = [ind_id]
         else:
-            update_props["G산업BM"] = {"relation": []}
+            candidate["G산업BM"] = []
+
+    # 실제로 바뀐 메타데이터만 추려 전송 (변경 없으면 쓰기 생략)
+    update_props = build_dirty_payload(
+        existing_props=props,
+        candidate_data=candidate,
+        select_fields=["Market", "국가", "상품유형", "자산군"],
+        text_fields=["종목명", "US_섹터", "US_업종"],
+        relation_fields=["시장BM", "K산업BM", "G산업BM"],
+        multi_select_fields=["우량주"],
+    )
+    if not update_props:
+        return None
 
     return pid, update_props, raw_t, name
 
@@ -255,7 +261,7 @@ def main() -> None:
     config = load_benchmark_config(client, BENCHMARK_DATABASE_ID, logger=logger)
     engine = StockAutomationEngineUS()
 
-    all_pages = [page for page in paginate_database(client, MASTER_DATABASE_ID, page_size=100, retry_delay=0.1)]
+    all_pages = [page for page in paginate_database_cached(client, MASTER_DATABASE_ID, page_size=100, retry_delay=0.1)]
     logger.info(f"📡 노션 DB 수집 완료: 총 {len(all_pages)}개 페이지 대상 분석 시작...")
 
     update_payloads = []
@@ -265,11 +271,15 @@ def main() -> None:
             update_payloads.append(res)
 
     if update_payloads:
-        batch_update_pages(client, update_payloads, max_workers=3, delay=0.1, logger=logger)
+        batch_update_pages(client, update_payloads, max_workers=6, logger=logger)
 
+    logger.info(f"   📦 {FDR_LISTINGS.summary()} / {get_yahoo_client().summary()}")
     logger.info("✨ 모든 US/Global 종목 업데이트 프로세스가 완료되었습니다.")
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        BACKOFF.report(logger)
 
\ No newline at end of file
@@ -3,9 +3,11 @@ update_price_kr.py
 ===================
 한국투자증권(KIS) Open API를 호출하여 국내 상장 주식의 현재가 및 전일 종가를 수집하고
 노션(Notion) 데이터베이스에 안전하게 배치(Batch) 업데이트합니다.
-- 데이터 소스: 한국투자증권(KIS) Open API (FHKST01010100)
+- 데이터 소스: 한국투자증권(KIS) Open API (멀티종목 시세 FHKST11300006, 단건 시세 FHKST01010100 폴백)
 - 기능: 실시간 시세 수집, 전일 종가 매핑, 마지막 업데이트 일시(KST) 기록
 - 안정성: 지수 백오프 기반 재시도, 멀티스레드 병렬 수집 및 청크 단위 쓰기
+- 실시간 모드(--stream): KIS WebSocket 체결가(H0STCNT0) 구독 후 변경된 최신가만 주기적으로 반영
+- 장 마감 후 모드(--close): FDR KRX 전종목 스냅샷 1회 요청으로 현재가/전일 종가 산출 (스냅샷에 없는 ETF·신규 상장 종목만 KIS 조회)
 """
 
 # ==============================================================================
@@ -13,13 +15,19 @@ update_price_kr.py
 # ==============================================================================
 import os
 import sys
+import json
 import time
+import asyncio
+import threading
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
-import requests
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
 
 # Windows 콘솔 인코딩 안전화
 if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
@@ -31,16 +39,31 @@ if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
 from notion_utils import (
     build_notion_client,
     get_env_var,
-    get_page_text,
-    paginate_database,
+    paginate_database_records,
+    PageRecord,
+    build_market_filter,
+    UPDATE_DATE_CANDIDATES,
     safe_page_update,
-    RETRY_STATUS_CODES,
+    BACKOFF,
     set_page_date_property,
-    get_kis_auth_context,
-    get_http_session,
+    prefetch_kis_auth_context,
+    get_kis_ws_approval_key,
+    get_kst_now,
+    KIS_PROD_WS_URL,
+    KR_MARKET_OPEN_HM,
+    KR_MARKET_CLOSE_HM,
+    get_kr_last_close,
+    FDR_LISTINGS,
+    get_kis_client,
+    report_kis_usage,
+    KIS_MAX_WORKERS,
     is_kr_ticker,
+    safe_float,
     is_valid_num,
+    run_streaming_sync,
     batch_update_pages,
+    WriteJournal,
+    resume_pending_writes,
     build_dirty_payload,
     is_market_holiday,
 )
@@ -57,7 +80,18 @@ DATABASE_ID = (
     or get_env_var("DATABASE_ID")
 )
 
-SESSION = get_http_session()
+# 30종목 묶음당 KIS 호출 1건이라, 단건 폴백까지 초당 한도(KIS_RPS)를 채우는 데 KIS 워커 수면 충분
+COLLECT_WORKERS = KIS_MAX_WORKERS
+
+PRICE_NUM_FIELDS = ["현재가", "전일 종가"]
+SCAN_PROPERTIES = ["티커", "Ticker", "종목명", "Name"] + PRICE_NUM_FIELDS + UPDATE_DATE_CANDIDATES
+
+# KIS 관심종목(멀티종목) 시세조회: 1회 호출당 최대 30종목 (KIS_MULTI_PRICE=false로 종목별 단건 조회만 사용)
+KIS_MULTI_PRICE_ENABLED = os.environ.get("KIS_MULTI_PRICE", "true").lower() not in ("false", "0", "no")
+KIS_MULTI_PRICE_MAX_CODES = 30
+
+# 수집 모드 (PRICE_KR_MODE): auto(기본: 개장 전·장중 KIS / 당일 장 마감 후 KRX 스냅샷), rest(항상 KIS), close(항상 KRX 스냅샷), stream(실시간)
+PRICE_KR_MODE = os.environ.get("PRICE_KR_MODE", "auto").lower()
 
 
 # ==============================================================================
@@ -69,132 +103,549 @@ def get_price_data(
     max_retries: int = 3,
     base_delay: float = 2.0
 ) -> Dict[str, Optional[float]]:
-    """한투 API에서 국내 주식 가격 데이터를 조회합니다. 정밀 지수 백오프를 수행합니다."""
+    """
+    한투 API에서 국내 주식 가격 데이터를 조회합니다. 속도 제한과 지수 백오프는 공용 KISClient가 수행하며,
+    같은 세션에 다른 동기화가 이미 받은 현재가 응답은 디스크 시세 캐시에서 재사용합니다.
+    """
     if not kis_ctx or not isinstance(kis_ctx, dict) or not kis_ctx.get("token"):
         return {}
 
     clean_ticker = ticker.split(".")[0].strip()
-    token = kis_ctx["token"]
-    url_base = kis_ctx["url_base"]
-    app_key = kis_ctx["app_key"]
-    app_secret = kis_ctx["app_secret"]
-
-    headers = {
-        "authorization": f"Bearer {token}",
-        "appkey": app_key,
-        "appsecret": app_secret,
-        "tr_id": "FHKST01010100",
-        "custtype": "P",
+    output = get_kis_client(kis_ctx).get_quote(clean_ticker, label=ticker, max_retries=max_retries, base_delay=base_delay)
+    if not output:
+        return {}
+    return _price_from_quote(output)
+
+
+def _price_from_quote(output: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """현재가 응답(output)에서 현재가/전일 종가를 추출합니다. (현재가가 없으면 기준가로 대체)"""
+    curr_price = safe_float(output.get("stck_prpr")) or 0.0
+    prev_close = safe_float(output.get("stck_sdpr")) or 0.0
+
+    if curr_price <= 0 and prev_close > 0:
+        curr_price = prev_close
+
+    return {
+        "현재가": curr_price if curr_price > 0 else None,
+        "전일 종가": prev_close if prev_close > 0 else None,
     }
-    params = {"fid_cond_mrkt_div_code": "J", "fid_input_iscd": clean_ticker}
-    
-    attempt = 1
-    while attempt <= max_retries:
-        try:
-            response = SESSION.get(
-                url=f"{url_base}/uapi/domestic-stock/v1/quotations/inquire-price",
-                headers=headers,
-                params=params,
-                timeout=10,
-            )
-            
-            status = response.status_code
-            if status in RETRY_STATUS_CODES and attempt < max_retries:
-                delay = base_delay * (2 ** (attempt - 1))
-                print(f"   ⚠️ [{ticker}] KIS API {status} 에러. {delay}초 대기 후 재시도 ({attempt}/{max_retries})")
-                time.sleep(delay)
-                attempt += 1
-                continue
-                
-            response.raise_for_status()
-            data = response.json()
-            output = data.get("output", {})
-            if not output:
-                raise ValueError("응답 데이터(output)가 비어 있습니다.")
-
-            curr_price = float(output.get("stck_prpr", 0.0))
-            prev_close = float(output.get("stck_sdpr", 0.0))
-            
-            if curr_price <= 0 and prev_close > 0:
-                curr_price = prev_close
-
-            return {
-                "현재가": curr_price if curr_price > 0 else None,
-                "전일 종가": prev_close if prev_close > 0 else None,
-            }
-
-        except (requests.exceptions.RequestException, ValueError) as exc:
-            if attempt < max_retries:
-                delay = base_delay * (2 ** (attempt - 1))
-                print(f"   ⚠️ [{ticker}] KIS 통신 에러. {delay}초 대기 후 재시도 ({attempt}/{max_retries}): {exc}")
-                time.sleep(delay)
-                attempt += 1
-                continue
-            print(f"❌ [{ticker}] KIS API 요청 실패 (최대 재시도 초과): {exc}")
-            return {}
-
-    return {}
+
+
+def get_multi_price_data(
+    tickers: List[str],
+    kis_ctx: Dict[str, Any],
+    max_retries: int = 3,
+    base_delay: float = 2.0
+) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    한투 관심종목(멀티종목) 시세조회(FHKST11300006)로 최대 30종목의 가격을 한 번에 조회합니다.
+    응답에 포함되지 않았거나 가격이 비어 있는 종목은 결과에서 빠지며, 호출 측이 단건 조회(get_price_data)로 폴백합니다.
+    Returns:
+        {단축코드: {"현재가": float|None, "전일 종가": float|None}}
+    """
+    if not tickers or not kis_ctx or not isinstance(kis_ctx, dict) or not kis_ctx.get("token"):
+        return {}
+
+    codes = [t.split(".")[0].strip() for t in tickers[:KIS_MULTI_PRICE_MAX_CODES]]
+    params: Dict[str, str] = {}
+    for idx, code in enumerate(codes, 1):
+        params[f"FID_COND_MRKT_DIV_CODE_{idx}"] = "J"
+        params[f"FID_INPUT_ISCD_{idx}"] = code
+
+    label = f"멀티시세 {len(codes)}종목"
+    data = get_kis_client(kis_ctx).get(
+        "/uapi/domestic-stock/v1/quotations/intstock-multprice",
+        "FHKST11300006",
+        params,
+        label=label,
+        require=None,
+        max_retries=max_retries,
+        base_delay=base_delay,
+    )
+    if not data:
+        return {}
+    if str(data.get("rt_cd", "0")) != "0":
+        print(f"   ⚠️ [{label}] 조회 거부 ({data.get('msg_cd', '')}: {data.get('msg1', '')}) - 단건 조회로 폴백합니다.")
+        return {}
+
+    results: Dict[str, Dict[str, Optional[float]]] = {}
+    for row in data.get("output") or []:
+        code = str(row.get("inter_shrn_iscd", "")).strip()
+        if code not in codes:
+            continue
+        curr_price = safe_float(row.get("inter2_prpr")) or 0.0
+        prev_close = safe_float(row.get("inter2_prdy_clpr")) or 0.0
+        if curr_price <= 0 and prev_close > 0:
+            curr_price = prev_close
+        if curr_price <= 0:
+            continue
+        results[code] = {
+            "현재가": curr_price,
+            "전일 종가": prev_close if prev_close > 0 else None,
+        }
+    return results
+
+
+def load_krx_close_snapshot() -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    FDR KRX 전종목 시세(fdr.StockListing('KRX')) 1회 요청으로 상장 종목 전체의 종가와 전일 종가(종가 - 전일대비)를 산출합니다.
+    장 마감 후에는 이 값이 확정 종가이므로 종목별 KIS 호출을 대신할 수 있습니다. (ETF·ETN 등 스냅샷에 없는 종목은 제외됨)
+    Returns:
+        {단축코드: {"현재가": float, "전일 종가": float|None}} (로드 실패 시 빈 딕셔너리)
+    """
+    # 같은 거래일에 마스터·벤치마크 동기화가 받아 둔 목록은 직전 장 마감 이후에 받은 것일 때만 재사용
+    try:
+        df = FDR_LISTINGS.get('KRX', fresh_after=get_kr_last_close())
+    except Exception as exc:
+        print(f"   ⚠️ KRX 전종목 스냅샷 로드 실패 (KIS 조회로 진행): {exc}")
+        return {}
+
+    snapshot: Dict[str, Dict[str, Optional[float]]] = {}
+    if df is None or df.empty or "Code" not in df.columns or "Close" not in df.columns:
+        return snapshot
+
+    changes_col = df["Changes"] if "Changes" in df.columns else [None] * len(df)
+    for code, close, change in zip(df["Code"].astype(str).str.strip().str.zfill(6), df["Close"], changes_col):
+        curr_price = safe_float(close) or 0.0
+        if curr_price <= 0:
+            continue
+        change_val = safe_float(change)
+        prev_close = curr_price - change_val if change_val is not None else 0.0
+        snapshot[code] = {
+            "현재가": curr_price,
+            "전일 종가": prev_close if prev_close > 0 else None,
+        }
+    return snapshot
 
 
 # ==============================================================================
 # 3. 개별 페이지 가격 분석 및 페이로드 빌더
 # ==============================================================================
 def build_update_for_page(
-    page: Dict[str, Any],
+    page: PageRecord,
     kis_ctx: Dict[str, Any]
 ) -> Optional[Tuple[str, Dict[str, Any], str, str]]:
     """개별 노션 페이지의 티커를 추출하여 한투 가격 정보를 조회하고 변경된 경우에만 업데이트 페이로드를 생성합니다."""
-    props = page.get("properties", {})
-    ticker = get_page_text(props, ["티커", "Ticker"]).upper()
-    name = get_page_text(props, ["종목명", "Name"]) or ticker
+    ticker = page.text(["티커", "Ticker"]).upper()
+    name = page.text(["종목명", "Name"]) or ticker
     
     if not ticker or not is_kr_ticker(ticker):
         return None
 
     price_dict = get_price_data(ticker, kis_ctx)
+    return _build_price_payload(page, ticker, name, price_dict)
+
+
+def _build_price_payload(
+    page: PageRecord,
+    ticker: str,
+    name: str,
+    price_dict: Dict[str, Optional[float]]
+) -> Optional[Tuple[str, Dict[str, Any], str, str]]:
+    """수집된 가격을 기존 페이지 값과 비교하여 변경된 속성만 담은 페이로드를 생성합니다."""
     if not price_dict:
         return None
 
     dirty_props = build_dirty_payload(
-        existing_props=props,
+        existing_props=page,
         candidate_data=price_dict,
-        num_fields=["현재가", "전일 종가"],
+        num_fields=PRICE_NUM_FIELDS,
         select_fields=[],
     )
 
     if dirty_props:
-        return page["id"], dirty_props, ticker, name
+        return page.id, dirty_props, ticker, name
 
     return None
 
 
-# ==============================================================================
-# 4. 일괄 데이터 수집
-# ==============================================================================
-def batch_collect_price_data(
-    pages: List[Dict[str, Any]],
-    kis_ctx: Dict[str, Any],
-    max_workers: int = 3
+def build_updates_for_chunk(
+    pages: List[PageRecord],
+    kis_ctx: Dict[str, Any]
 ) -> List[Tuple[str, Dict[str, Any], str, str]]:
-    """페이지 청크 목록에 대해 멀티스레드로 시세를 병렬 수집합니다."""
+    """
+    최대 30개 페이지의 가격을 멀티종목 시세조회 1회로 수집하고 변경된 페이지의 페이로드만 반환합니다.
+    멀티 조회에서 누락되거나 거부된 종목은 기존 단건 조회(get_price_data)로 폴백합니다.
+    """
+    targets: List[Tuple[PageRecord, str, str]] = []
+    for page in pages:
+        ticker = page.text(["티커", "Ticker"]).upper()
+        if ticker and is_kr_ticker(ticker):
+            targets.append((page, ticker, page.text(["종목명", "Name"]) or ticker))
+    if not targets:
+        return []
+
+    # 같은 세션에 재무/마스터 동기화가 이미 받은 현재가 응답이 있으면 멀티 조회 대상에서 제외
+    kis = get_kis_client(kis_ctx)
+    cached: Dict[str, Dict[str, Optional[float]]] = {}
+    for _, ticker, _ in targets:
+        code = ticker.split(".")[0].strip()
+        output = kis.cached_quote(code)
+        if output:
+            cached[code] = _price_from_quote(output)
+    misses = [ticker for _, ticker, _ in targets if ticker.split(".")[0].strip() not in cached]
+    bulk = {**cached, **get_multi_price_data(misses, kis_ctx)}
+
     updates: List[Tuple[str, Dict[str, Any], str, str]] = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(build_update_for_page, page, kis_ctx): page for page in pages}
-        for fut in as_completed(futures):
-            try:
-                res = fut.result()
-                if res:
-                    updates.append(res)
-            except Exception as exc:
-                page = futures[fut]
-                props = page.get("properties", {})
-                ticker = get_page_text(props, ["티커", "Ticker"]).upper() or "UNKNOWN"
-                print(f"❌ [{ticker}] 데이터 수집 중 예외 발생: {exc}")
+    fallback_cnt = 0
+    for page, ticker, name in targets:
+        price_dict = bulk.get(ticker.split(".")[0].strip())
+        if not price_dict:
+            fallback_cnt += 1
+            price_dict = get_price_data(ticker, kis_ctx)
+        payload = _build_price_payload(page, ticker, name, price_dict)
+        if payload:
+            updates.append(payload)
+
+    if fallback_cnt:
+        print(f"   ↩️ [멀티시세] {len(targets)}종목 중 {fallback_cnt}종목 단건 조회 폴백")
     return updates
 
 
+def build_updates_from_snapshot(
+    pages: List[PageRecord],
+    snapshot: Dict[str, Dict[str, Optional[float]]],
+    kis_ctx: Optional[Dict[str, Any]]
+) -> List[Tuple[str, Dict[str, Any], str, str]]:
+    """
+    KRX 전종목 스냅샷에서 페이지 묶음의 가격을 찾아 변경된 페이지의 페이로드를 반환합니다.
+    스냅샷에 없는 종목(ETF·신규 상장 등)만 KIS 멀티/단건 조회(build_updates_for_chunk)로 폴백합니다.
+    """
+    updates: List[Tuple[str, Dict[str, Any], str, str]] = []
+    misses: List[PageRecord] = []
+    for page in pages:
+        ticker = page.text(["티커", "Ticker"]).upper()
+        if not ticker or not is_kr_ticker(ticker):
+            continue
+        price_dict = snapshot.get(ticker.split(".")[0].strip())
+        if not price_dict:
+            misses.append(page)
+            continue
+        payload = _build_price_payload(page, ticker, page.text(["종목명", "Name"]) or ticker, price_dict)
+        if payload:
+            updates.append(payload)
+
+    if misses and kis_ctx:
+        updates.extend(build_updates_for_chunk(misses, kis_ctx))
+    elif misses:
+        print(f"   ⚠️ [KRX 스냅샷] {len(misses)}종목 미포함 (KIS 인증 없음 - 건너뜀)")
+    return updates
+
+
+# ==============================================================================
+# 4. 스트리밍 수집 및 노션 반영 파이프라인
+# ==============================================================================
+def stream_price_updates(
+    notion_client: Any,
+    records: Iterable[PageRecord],
+    kis_ctx: Optional[Dict[str, Any]],
+    journal: Optional[WriteJournal] = None,
+    skip_ids: Optional[Set[str]] = None,
+    snapshot: Optional[Dict[str, Dict[str, Optional[float]]]] = None
+) -> Dict[str, int]:
+    """
+    노션 스캔 결과를 흘려보내며 가격 데이터를 병렬 수집하고, 변경된 페이로드는 즉시 노션에 반영합니다.
+    snapshot(KRX 전종목 스냅샷)이 있으면 스냅샷 가격을 우선 사용하고 누락 종목만 KIS로 조회하며,
+    없으면 KIS_MULTI_PRICE 설정에 따라 30종목 단위 멀티 시세조회 또는 종목별 단건 조회로 수집합니다.
+    """
+    if snapshot:
+        build_fn: Callable[[Any], Any] = lambda chunk: build_updates_from_snapshot(chunk, snapshot, kis_ctx)
+        batch_size = KIS_MULTI_PRICE_MAX_CODES
+    else:
+        if not kis_ctx:
+            raise ValueError("KRX 스냅샷 없이 수집하려면 KIS 인증 컨텍스트가 필요합니다.")
+        ctx: Dict[str, Any] = kis_ctx
+        if KIS_MULTI_PRICE_ENABLED:
+            build_fn = lambda chunk: build_updates_for_chunk(chunk, ctx)
+            batch_size = KIS_MULTI_PRICE_MAX_CODES
+        else:
+            build_fn = lambda record: build_update_for_page(record, ctx)
+            batch_size = 1
+    return run_streaming_sync(
+        notion_client,
+        records,
+        build_fn,
+        collect_workers=COLLECT_WORKERS,
+        write_workers=6,
+        journal=journal,
+        skip_ids=skip_ids,
+        batch_size=batch_size,
+    )
+
+
+# ==============================================================================
+# 5. 실시간 체결가(WebSocket) 스트리밍 모드
+# ==============================================================================
+# KIS_WS_URL을 로컬 대역 서버(예: ws://127.0.0.1:8765)로, KIS_WS_APPROVAL_KEY를 임의 값으로 지정하면 실서버 없이 검증 가능
+KIS_WS_URL = os.environ.get("KIS_WS_URL", KIS_PROD_WS_URL)
+KIS_WS_FLUSH_SEC = float(os.environ.get("KIS_WS_FLUSH_SEC", "30"))
+# 0이면 정규장 마감 시각까지 구독, 양수면 지정한 초만큼만 구독
+KIS_WS_DURATION_SEC = float(os.environ.get("KIS_WS_DURATION_SEC", "0"))
+# KIS_WS_DURATION_SEC 없이 개장 전에 시작한 경우의 구독 시간 상한 (장 마감까지 러너를 붙잡아 두지 않도록)
+KIS_WS_PREOPEN_MAX_SEC = float(os.environ.get("KIS_WS_PREOPEN_MAX_SEC", "3600"))
+# KIS 실시간 등록 한도 (세션당 41건)
+KIS_WS_MAX_SUBSCRIPTIONS = int(os.environ.get("KIS_WS_MAX_SUBSCRIPTIONS", "41"))
+# 구독 종목 지정: KIS_WS_TICKERS(쉼표 구분 종목코드)가 우선, 없으면 노션 체크박스(KIS_WS_FLAG_PROPERTY)가 켜진 종목
+KIS_WS_TICKERS = [t.strip().upper().split(".")[0] for t in os.environ.get("KIS_WS_TICKERS", "").split(",") if t.strip()]
+KIS_WS_FLAG_PROPERTY = os.environ.get("KIS_WS_FLAG_PROPERTY", "실시간")
+REALTIME_TR_ID = "H0STCNT0"
+
+
+def parse_realtime_frame(raw: str) -> List[Tuple[str, float, Optional[float]]]:
+    """
+    KIS 실시간 체결 프레임("0|H0STCNT0|건수|필드^필드^...")을 (종목코드, 현재가, 전일 종가) 목록으로 변환합니다.
+    필드 순서: 0 종목코드, 1 체결시간, 2 현재가, 3 전일대비부호, 4 전일대비 ... (건수만큼 레코드가 이어 붙음)
+    """
+    if not raw or raw[0] not in ("0", "1"):
+        return []
+    parts = raw.split("|", 3)
+    if len(parts) < 4 or parts[0] != "0" or parts[1] != REALTIME_TR_ID:
+        return []
+
+    count = int(parts[2]) if parts[2].isdigit() and int(parts[2]) > 0 else 1
+    fields = parts[3].split("^")
+    width = len(fields) // count
+    ticks: List[Tuple[str, float, Optional[float]]] = []
+    for idx in range(count):
+        row = fields[idx * width:(idx + 1) * width]
+        if len(row) < 5:
+            continue
+        price = safe_float(row[2])
+        if not price or price <= 0:
+            continue
+        diff = safe_float(row[4])
+        # 전일대비 부호 4(하한)/5(하락)인데 절댓값으로 온 경우 음수로 보정
+        if diff is not None and row[3] in ("4", "5") and diff > 0:
+            diff = -diff
+        prev_close = price - diff if diff is not None else None
+        ticks.append((row[0].strip(), price, prev_close if prev_close and prev_close > 0 else None))
+    return ticks
+
+
+class LatestPriceBook:
+    """틱을 종목별 최신가 하나로 합치고(coalesce), 마지막 flush 이후 값이 바뀐 종목만 꺼내 줍니다."""
+
+    def __init__(self):
+        self._latest: Dict[str, Tuple[float, Optional[float]]] = {}
+        self._changed: Set[str] = set()
+        self.ticks = 0
+        self._lock = threading.Lock()
+
+    def update(self, code: str, price: float, prev_close: Optional[float]) -> None:
+        with self._lock:
+            self.ticks += 1
+            if self._latest.get(code) != (price, prev_close):
+                self._latest[code] = (price, prev_close)
+                self._changed.add(code)
+
+    def drain(self) -> Dict[str, Tuple[float, Optional[float]]]:
+        with self._lock:
+            changed = {code: self._latest[code] for code in self._changed}
+            self._changed.clear()
+            return changed
+
+
+def flush_realtime_prices(
+    notion: Any,
+    book: LatestPriceBook,
+    targets: Dict[str, Tuple[PageRecord, str, str]],
+    journal: Optional[WriteJournal] = None
+) -> int:
+    """직전 flush 이후 바뀐 종목의 최신가를 build_dirty_payload로 걸러 노션에 반영하고 성공 건수를 반환합니다."""
+    changed = book.drain()
+    payloads: List[Tuple[str, Dict[str, Any], str, str]] = []
+    applied: Dict[str, Tuple[PageRecord, Dict[str, Optional[float]]]] = {}
+    for code, (price, prev_close) in changed.items():
+        if code not in targets:
+            continue
+        page, ticker, name = targets[code]
+        price_dict = {"현재가": price, "전일 종가": prev_close}
+        payload = _build_price_payload(page, ticker, name, price_dict)
+        if payload:
+            payloads.append(payload)
+            applied[page.id] = (page, price_dict)
+    if not payloads:
+        return 0
+
+    def _on_success(page_id: str) -> None:
+        # 반영된 값을 레코드에 기록해 두어 다음 flush의 dirty 비교 기준으로 사용
+        page, price_dict = applied[page_id]
+        page.values.update({k: v for k, v in price_dict.items() if k in page and v is not None})
+
+    success_cnt, _ = batch_update_pages(notion, payloads, max_workers=6, journal=journal, on_success=_on_success)
+    return success_cnt
+
+
+def _realtime_subscribe_message(approval_key: str, code: str) -> str:
+    """실시간 체결가 등록(tr_type=1) 요청 메시지를 생성합니다."""
+    return json.dumps({
+        "header": {"approval_key": approval_key, "custtype": "P", "tr_type": "1", "content-type": "utf-8"},
+        "body": {"input": {"tr_id": REALTIME_TR_ID, "tr_key": code}},
+    })
+
+
+async def _consume_realtime_feed(ws_url: str, approval_key: str, codes: List[str], book: LatestPriceBook, stop_at: float) -> None:
+    """WebSocket에 접속해 종목을 구독하고 stop_at까지 틱을 book에 누적합니다. 끊기면 BACKOFF 예산 내에서 재접속합니다."""
+    assert websockets is not None, "실시간 모드에는 websockets 패키지가 필요합니다 (main에서 사전 확인)"
+    attempt = 1
+    while time.time() < stop_at:
+        try:
+            async with websockets.connect(ws_url, ping_interval=None) as ws:
+                for code in codes:
+                    await ws.send(_realtime_subscribe_message(approval_key, code))
+                print(f"   📡 [WebSocket] {len(codes)}종목 실시간 체결가 구독 완료 ({ws_url})")
+                attempt = 1
+                while time.time() < stop_at:
+                    try:
+                        raw = await asyncio.wait_for(ws.recv(), timeout=max(0.1, min(5.0, stop_at - time.time())))
+                    except asyncio.TimeoutError:
+                        continue
+                    if isinstance(raw, bytes):
+                        raw = raw.decode("utf-8", errors="ignore")
+                    if raw.startswith("{"):
+                        message = json.loads(raw)
+                        if message.get("header", {}).get("tr_id") == "PINGPONG":
+                            await ws.send(raw)
+                        elif str(message.get("body", {}).get("rt_cd", "0")) != "0":
+                            print(f"   ⚠️ [WebSocket] 구독 응답 오류: {message.get('body', {}).get('msg1', '')}")
+                        continue
+                    for code, price, prev_close in parse_realtime_frame(raw):
+                        book.update(code, price, prev_close)
+        except (OSError, ValueError, websockets.exceptions.WebSocketException) as exc:
+            delay = BACKOFF.next_delay("kis", attempt, 2.0)
+            if delay is None or time.time() + delay >= stop_at:
+                print(f"   ❌ [WebSocket] 연결 종료 후 재접속 포기: {exc}")
+                return
+            print(f"   ⚠️ [WebSocket] 연결 끊김. {delay:.1f}초 후 재접속 ({attempt}회차): {exc}")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+async def _run_realtime_session(
+    notion: Any,
+    ws_url: str,
+    approval_key: str,
+    targets: Dict[str, Tuple[PageRecord, str, str]],
+    stop_at: float,
+    flush_sec: float,
+    journal: Optional[WriteJournal]
+) -> Tuple[LatestPriceBook, int]:
+    """수신 루프와 주기적 flush 루프를 함께 실행하고, 종료 시 남은 변경분을 마지막으로 반영합니다."""
+    book = LatestPriceBook()
+    flushed = 0
+    consumer = asyncio.create_task(_consume_realtime_feed(ws_url, approval_key, list(targets), book, stop_at))
+    while not consumer.done():
+        await asyncio.wait({consumer}, timeout=max(0.1, min(flush_sec, stop_at - time.time())))
+        flushed += await asyncio.to_thread(flush_realtime_prices, notion, book, targets, journal)
+    consumer.result()
+    flushed += await asyncio.to_thread(flush_realtime_prices, notion, book, targets, journal)
+    return book, flushed
+
+
+def resolve_realtime_stop_at(now: datetime, duration_sec: float = KIS_WS_DURATION_SEC) -> Optional[float]:
+    """
+    실시간 구독 종료 시각(epoch 초)을 계산합니다. 정규장이 이미 마감되어 구독할 필요가 없으면 None을 반환합니다.
+    - duration_sec가 양수면 지금부터 그 시간만큼
+    - 장중이면 정규장 마감 시각까지
+    - 개장 전이면 마감 시각과 KIS_WS_PREOPEN_MAX_SEC 중 먼저 오는 시각까지
+    """
+    if duration_sec > 0:
+        return now.timestamp() + duration_sec
+    open_at = now.replace(hour=KR_MARKET_OPEN_HM[0], minute=KR_MARKET_OPEN_HM[1], second=0, microsecond=0)
+    close_at = now.replace(hour=KR_MARKET_CLOSE_HM[0], minute=KR_MARKET_CLOSE_HM[1], second=0, microsecond=0)
+    if close_at <= now:
+        return None
+    if now < open_at:
+        return min(close_at.timestamp(), now.timestamp() + KIS_WS_PREOPEN_MAX_SEC)
+    return close_at.timestamp()
+
+
+def select_realtime_targets(
+    records: Iterable[PageRecord],
+    tickers: Optional[List[str]] = None,
+    flag_property: str = KIS_WS_FLAG_PROPERTY,
+    limit: int = KIS_WS_MAX_SUBSCRIPTIONS,
+    skip_ids: Optional[Set[str]] = None
+) -> Dict[str, Tuple[PageRecord, str, str]]:
+    """
+    구독할 종목을 {종목코드: (레코드, 티커, 종목명)}으로 고릅니다.
+    tickers(KIS_WS_TICKERS)를 주면 그 순서대로, 없으면 flag_property 체크박스가 켜진 종목을,
+    둘 다 없으면 조회 순서대로 구독 한도(limit)까지 선택합니다.
+    """
+    candidates: Dict[str, Tuple[PageRecord, str, str]] = {}
+    flagged: List[str] = []
+    for record in records:
+        if skip_ids and record.id in skip_ids:
+            continue
+        ticker = record.text(["티커", "Ticker"]).upper()
+        if not ticker or not is_kr_ticker(ticker):
+            continue
+        code = ticker.split(".")[0].strip()
+        if code in candidates:
+            continue
+        candidates[code] = (record, ticker, record.text(["종목명", "Name"]) or ticker)
+        if flag_property and record.raw(flag_property) is True:
+            flagged.append(code)
+
+    if tickers:
+        missing = [code for code in tickers if code not in candidates]
+        if missing:
+            print(f"⚠️ KIS_WS_TICKERS 중 노션 DB에 없는(또는 재개 대상인) 종목은 제외합니다: {', '.join(missing)}")
+        order = [code for code in dict.fromkeys(tickers) if code in candidates]
+        source = "KIS_WS_TICKERS"
+    elif flagged:
+        order = flagged
+        source = f"'{flag_property}' 체크 종목"
+    else:
+        order = list(candidates)
+        source = "조회 순서"
+
+    if len(order) > limit:
+        print(f"⚠️ 실시간 구독 한도({limit}종목) 초과: {source} {len(order)}종목 중 앞의 {limit}종목만 구독합니다.")
+        order = order[:limit]
+    elif not tickers and not flagged and order:
+        print(f"ℹ️ 구독 종목 지정이 없어 조회 순서대로 구독합니다. (KIS_WS_TICKERS 또는 노션 '{flag_property}' 체크박스로 지정 가능)")
+    return {code: candidates[code] for code in order}
+
+
+def run_realtime_mode(notion: Any, journal: Optional[WriteJournal] = None, skip_ids: Optional[Set[str]] = None) -> None:
+    """
+    REST 전수 조회 대신 KIS 실시간 체결가(H0STCNT0)를 구독하여 종목별 최신가만 KIS_WS_FLUSH_SEC 간격으로 노션에 반영합니다.
+    구독 대상은 select_realtime_targets가 고르며, 구독 한도(KIS_WS_MAX_SUBSCRIPTIONS) 밖의 종목은 기본 REST 모드로 갱신해야 합니다.
+    """
+    if websockets is None:
+        print("❌ 실시간 모드에는 websockets 패키지가 필요합니다. (pip install websockets)")
+        return
+
+    now = get_kst_now()
+    stop_at = resolve_realtime_stop_at(now)
+    if stop_at is None:
+        print("🛑 정규장이 이미 마감되어 실시간 구독을 시작하지 않습니다. (KIS_WS_DURATION_SEC로 구독 시간 지정 가능)")
+        return
+    if KIS_WS_DURATION_SEC <= 0 and now.hour * 60 + now.minute < KR_MARKET_OPEN_HM[0] * 60 + KR_MARKET_OPEN_HM[1]:
+        print(f"ℹ️ 개장 전 시작: 구독 시간을 최대 {KIS_WS_PREOPEN_MAX_SEC:g}초로 제한합니다. (KIS_WS_PREOPEN_MAX_SEC / KIS_WS_DURATION_SEC로 조정)")
+
+    records = paginate_database_records(
+        notion, DATABASE_ID, SCAN_PROPERTIES + [KIS_WS_FLAG_PROPERTY],
+        page_size=100, retry_delay=0.05, query_filter=build_market_filter("KR")
+    )
+    targets = select_realtime_targets(records, tickers=KIS_WS_TICKERS, skip_ids=skip_ids)
+    if not targets:
+        print("⚠️ 실시간 구독 대상 종목이 없습니다.")
+        return
+
+    approval_key = get_kis_ws_approval_key()
+    if not approval_key:
+        print("❌ KIS 실시간 접속키를 발급받지 못했습니다. 환경 변수를 확인하세요.")
+        return
+
+    print(f"🚀 실시간 체결가 스트리밍 시작: {len(targets)}종목, {KIS_WS_FLUSH_SEC:g}초 간격 반영, 종료 예정 {datetime.fromtimestamp(stop_at, ZoneInfo('Asia/Seoul')):%H:%M:%S}")
+    book, flushed = asyncio.run(_run_realtime_session(notion, KIS_WS_URL, approval_key, targets, stop_at, KIS_WS_FLUSH_SEC, journal))
+    print(f"✨ 실시간 스트리밍 종료: 수신 틱 {book.ticks}건 / 노션 반영 {flushed}건")
+
+
 # ==============================================================================
-# 5. 메인 실행 함수
+# 6. 메인 실행 함수
 # ==============================================================================
 def main() -> None:
     """국내 주식 현재가 일괄 업데이트 메인 파이프라인"""
@@ -205,42 +656,60 @@ def main() -> None:
         print(f"🛑 [KRX 휴장일 감지] 오늘은 {reason}입니다. 불필요한 API 호출 및 리소스를 절약하기 위해 작업을 즉시 종료합니다. (강제실행: FORCE_RUN=true 또는 --force)")
         return
 
+    # KIS 토큰 확보를 노션 클라이언트 생성·저널 재개와 겹쳐 백그라운드에서 진행
+    kis_future = prefetch_kis_auth_context()
     notion = build_notion_client(NOTION_TOKEN)
-    kis_ctx = get_kis_auth_context()
-    if not kis_ctx:
+
+    # 직전 실행이 타임아웃 등으로 중단되었다면 저널에 남은 미완료 쓰기를 먼저 재개
+    journal = WriteJournal("price_kr")
+    resumed_ids = resume_pending_writes(notion, journal)
+
+    # 실시간 모드 (--stream 또는 PRICE_KR_MODE=stream): REST 전수 조회 대신 체결가 구독
+    if "--stream" in sys.argv or PRICE_KR_MODE == "stream":
+        run_realtime_mode(notion, journal=journal, skip_ids=resumed_ids)
+        return
+
+    # 장 마감 후 모드 (--close, PRICE_KR_MODE=close 또는 auto에서 당일 정규장 마감 이후): KRX 전종목 스냅샷 1회로 가격 산출
+    # auto 모드의 개장 전 실행은 get_kr_last_close()가 전 거래일 마감을 돌려주므로 스냅샷(전일 종가)을 쓰지 않고 KIS로 조회
+    snapshot: Dict[str, Dict[str, Optional[float]]] = {}
+    last_close = get_kr_last_close()
+    closed_today = last_close is not None and last_close.date() == get_kst_now().date()
+    use_snapshot = "--close" in sys.argv or PRICE_KR_MODE == "close" or (PRICE_KR_MODE == "auto" and closed_today)
+    if use_snapshot:
+        snapshot = load_krx_close_snapshot()
+        if snapshot:
+            print(f"📸 [장 마감 후 모드] KRX 전종목 스냅샷 {len(snapshot):,}종목 로드 완료 (누락 종목만 KIS 조회)")
+
+    kis_ctx = kis_future.result()
+    if not kis_ctx and not snapshot:
         print("❌ KIS 인증 컨텍스트를 가져오지 못했습니다. 환경 변수를 확인하세요.")
         return
 
-    print(f"🚀 한투 가격 정보 수집 시작 (활성 서버: {kis_ctx['env_type']} - {kis_ctx['url_base']})")
-    all_pages = []
-    
-    print("📋 노션 데이터베이스 스캔 중...")
-    for page in paginate_database(notion, DATABASE_ID, page_size=100, retry_delay=0.05):
-        all_pages.append(page)
-        
-    print(f"📊 총 {len(all_pages)}개 항목 발견")
-    
-    batch_collect_size = 20
-    updates: List[Tuple[str, Dict[str, Any], str, str]] = []
-    
-    for batch_idx, i in enumerate(range(0, len(all_pages), batch_collect_size), 1):
-        batch = all_pages[i : i + batch_collect_size]
-        print(f"\n🔄 가격 데이터 수집 배치 {batch_idx}/{(len(all_pages) + batch_collect_size - 1) // batch_collect_size} ({len(batch)}개 항목)")
-        
-        batch_updates = batch_collect_price_data(batch, kis_ctx, max_workers=3)
-        updates.extend(batch_updates)
-        
-        if i + batch_collect_size < len(all_pages):
-            time.sleep(0.5)
-            
-    if updates:
-        batch_update_pages(notion, updates, max_workers=3, delay=0.05)
+    if kis_ctx:
+        print(f"🚀 한투 가격 정보 수집 시작 (활성 서버: {kis_ctx['env_type']} - {kis_ctx['url_base']})")
     else:
+        print("⚠️ KIS 인증 실패: KRX 스냅샷에 포함된 종목만 업데이트합니다.")
+    # 스캔·수집·반영을 겹쳐 실행 (전체 소요 시간이 가장 느린 단계에 수렴)
+    print("📋 노션 데이터베이스 스캔과 동시에 가격 데이터 수집을 시작합니다...")
+    records = paginate_database_records(notion, DATABASE_ID, SCAN_PROPERTIES, page_size=100, retry_delay=0.05, query_filter=build_market_filter("KR"))
+    stats = stream_price_updates(
+        notion,
+        records,
+        kis_ctx=kis_ctx,
+        journal=journal,
+        skip_ids=resumed_ids,
+        snapshot=snapshot,
+    )
+    if stats["collected"] == 0:
         print("⚠️ 업데이트할 항목이 없습니다.")
-        
+
     print("✨ 모든 국내 주식 현재가 업데이트 프로세스가 완료되었습니다.")
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        BACKOFF.report()
+        report_kis_usage()
 
\ No newline at end of file
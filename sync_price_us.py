@@ -3,7 +3,7 @@ update_price_us.py
 ===================
 Yahoo Finance(yfinance)를 호출하여 미국/해외 상장 주식 및 ADR의 현재가 및 전일 종가를 수집하고
 노션(Notion) 데이터베이스에 배치(Batch) 업데이트합니다.
-- 데이터 소스: Yahoo Finance (yfinance API)
+- 데이터 소스: Yahoo Finance (멀티심볼 quote 엔드포인트 100종목 일괄 조회, yfinance 종목별 조회 폴백)
 - 기능: 해외 주식 실시간 시세 수집, 전일 종가 매핑, 마지막 업데이트 일시(KST) 기록
 - 안정성: 타임아웃/연결 실패 시 재시도, 배치 기반 노션 API 전송
 """
@@ -17,8 +17,7 @@ import time
 import logging
 import warnings
 from datetime import datetime, timedelta, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 import yfinance as yf
 
@@ -34,17 +33,24 @@ if sys.stdout and hasattr(sys.stdout, 'reconfigure'):
         pass
 
 from notion_utils import (
+    BACKOFF,
+    RETRY_STATUS_CODES,
     build_notion_client,
     get_env_var,
-    get_page_text,
     kst_isoformat,
     set_page_date_property,
-    paginate_database,
+    paginate_database_records,
+    PageRecord,
+    build_market_filter,
+    UPDATE_DATE_CANDIDATES,
     safe_page_update,
-    get_http_session,
+    get_yahoo_client,
+    get_yahoo_session,
     is_kr_ticker,
     is_valid_num,
-    batch_update_pages,
+    run_streaming_sync,
+    WriteJournal,
+    resume_pending_writes,
     build_dirty_payload,
     is_market_holiday,
 )
@@ -61,7 +67,16 @@ DATABASE_ID = (
     or get_env_var("DATABASE_ID")
 )
 
-SESSION = get_http_session()
+# 100종목 묶음당 멀티시세 1회라, 6개면 묶음 조회와 종목별 폴백 대기를 겹치기에 충분
+COLLECT_WORKERS = 6
+
+PRICE_NUM_FIELDS = ["현재가", "전일 종가"]
+SCAN_PROPERTIES = ["티커", "Ticker", "종목명", "Name"] + PRICE_NUM_FIELDS + UPDATE_DATE_CANDIDATES
+
+# 야후 멀티심볼 시세조회: 1회 요청당 최대 100종목 (US_BULK_QUOTE=false로 종목별 단건 조회만 사용)
+US_BULK_QUOTE_ENABLED = os.environ.get("US_BULK_QUOTE", "true").lower() not in ("false", "0", "no")
+US_BULK_QUOTE_MAX_SYMBOLS = 100
+YAHOO_QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
 logger = logging.getLogger("PriceSyncUS")
@@ -80,7 +95,7 @@ def get_stock_data(
     
     for attempt in range(1, max_retries + 1):
         try:
-            stock = yf.Ticker(clean_ticker, session=SESSION)
+            stock = yf.Ticker(clean_ticker, session=get_yahoo_session())
             
             # fast_info를 통한 초고속 추출
             current_price = None
@@ -127,72 +142,178 @@ def get_stock_data(
     return (None, None)
 
 
+def get_bulk_quotes(
+    tickers: List[str],
+    max_retries: int = 2,
+    base_delay: float = 1.0
+) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    """
+    야후 멀티심볼 quote 엔드포인트(v7/finance/quote)로 최대 100종목의 현재가/전일 종가를 한 번에 조회합니다.
+    쿠키/crumb는 프로세스·스크립트 공용 YahooClient의 것을 사용하며, 응답에 없거나 가격이 비어 있는 종목은 결과에서 빠져
+    호출 측이 종목별 조회(get_stock_data)로 폴백합니다.
+    재시도는 BACKOFF("yahoo")로 조율하므로 429 Retry-After와 워커 간 일시 정지, 호스트별 재시도 예산을 따릅니다.
+    Returns:
+        {티커: (현재가, 전일 종가)}
+    """
+    symbols = [t.strip().upper() for t in tickers[:US_BULK_QUOTE_MAX_SYMBOLS] if t and t.strip()]
+    if not symbols:
+        return {}
+
+    params = {"symbols": ",".join(symbols), "fields": "regularMarketPrice,regularMarketPreviousClose"}
+    data: Optional[Dict[str, Any]] = None
+    attempt = 1
+    while True:
+        BACKOFF.wait("yahoo")
+        try:
+            data = get_yahoo_client().get_json(YAHOO_QUOTE_URL, params=params, timeout=15)
+            break
+        except Exception as exc:
+            response = getattr(exc, "response", None)
+            status = getattr(response, "status_code", None)
+            retryable = status is None or status in RETRY_STATUS_CODES
+            delay = (
+                BACKOFF.next_delay("yahoo", attempt, base_delay, status, getattr(response, "headers", None))
+                if retryable and attempt < max_retries else None
+            )
+            if delay is None:
+                logger.warning(f"   ⚠️ [멀티시세 {len(symbols)}종목] 조회 실패 - 종목별 조회로 폴백합니다: {exc}")
+                return {}
+            logger.info(f"   ⚠️ [멀티시세 {len(symbols)}종목] 재시도 {attempt}/{max_retries}, {delay:.1f}초 대기: {exc}")
+            time.sleep(delay)
+            attempt += 1
+
+    results: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+    rows = ((data or {}).get("quoteResponse") or {}).get("result") or []
+    wanted = set(symbols)
+    for row in rows:
+        symbol = str(row.get("symbol", "")).strip().upper()
+        if symbol not in wanted:
+            continue
+        current_price = row.get("regularMarketPrice")
+        previous_close = row.get("regularMarketPreviousClose")
+        if not is_valid_num(current_price):
+            continue
+        results[symbol] = (float(current_price), float(previous_close) if is_valid_num(previous_close) else None)
+    return results
+
+
 # ==============================================================================
 # 3. 개별 페이지 가격 분석 및 페이로드 빌더
 # ==============================================================================
+def _build_price_payload(
+    page: PageRecord,
+    ticker: str,
+    name: str,
+    current_price: Optional[float],
+    previous_close: Optional[float]
+) -> Optional[Tuple[str, Dict[str, Any], str, str]]:
+    """수집된 가격을 기존 페이지 값과 비교하여 변경된 속성만 담은 페이로드를 생성합니다."""
+    cand_data: Dict[str, Any] = {}
+    if is_valid_num(current_price):
+        cand_data["현재가"] = current_price
+
+    if is_valid_num(previous_close):
+        cand_data["전일 종가"] = previous_close
+
+    dirty_props = build_dirty_payload(
+        existing_props=page,
+        candidate_data=cand_data,
+        num_fields=PRICE_NUM_FIELDS,
+        select_fields=[],
+    )
+
+    if dirty_props:
+        price_str = f"{round(current_price, 2)}" if current_price is not None and is_valid_num(current_price) else "N/A"
+        return (page.id, dirty_props, ticker, f"{name} (${price_str})")
+    return None
+
+
 def build_price_update_for_page(
-    page: Dict[str, Any]
+    page: PageRecord
 ) -> Optional[Tuple[str, Dict[str, Any], str, str]]:
     """개별 해외 주식 페이지의 가격 데이터를 수집하고 변경된 경우에만 업데이트 정보를 반환합니다."""
-    props = page.get("properties", {})
-    ticker = get_page_text(props, ["티커", "Ticker"]).upper()
-    name = get_page_text(props, ["종목명", "Name"]) or ticker
+    ticker = page.text(["티커", "Ticker"]).upper()
+    name = page.text(["종목명", "Name"]) or ticker
     if not ticker or is_kr_ticker(ticker):
         return None
 
     try:
         current_price, previous_close = get_stock_data(ticker)
-        
-        cand_data: Dict[str, Any] = {}
-        if is_valid_num(current_price):
-            cand_data["현재가"] = current_price
-        
-        if is_valid_num(previous_close):
-            cand_data["전일 종가"] = previous_close
-        
-        dirty_props = build_dirty_payload(
-            existing_props=props,
-            candidate_data=cand_data,
-            num_fields=["현재가", "전일 종가"],
-            select_fields=[],
-        )
-
-        if dirty_props:
-            price_str = f"{round(current_price, 2)}" if current_price is not None and is_valid_num(current_price) else "N/A"
-            return (page["id"], dirty_props, ticker, f"{name} (${price_str})")
-        else:
-            return None
-            
+        return _build_price_payload(page, ticker, name, current_price, previous_close)
     except Exception as e:
         logger.warning(f"❌ [{ticker}] 예상치 못한 에러: {e}")
         return None
 
 
-# ==============================================================================
-# 4. 배치 수집
-# ==============================================================================
-def batch_collect_us_price_data(
-    pages: List[Dict[str, Any]],
-    max_workers: int = 5
+def build_price_updates_for_chunk(
+    pages: List[PageRecord]
 ) -> List[Tuple[str, Dict[str, Any], str, str]]:
-    """여러 페이지의 해외 주식 가격 데이터를 병렬로 수집합니다."""
+    """
+    최대 100개 페이지의 가격을 야후 멀티심볼 시세조회 1회로 수집하고 변경된 페이지의 페이로드만 반환합니다.
+    일괄 조회에서 누락된 종목은 기존 종목별 조회(get_stock_data)로 폴백합니다.
+    """
+    targets: List[Tuple[PageRecord, str, str]] = []
+    for page in pages:
+        ticker = page.text(["티커", "Ticker"]).upper()
+        if ticker and not is_kr_ticker(ticker):
+            targets.append((page, ticker, page.text(["종목명", "Name"]) or ticker))
+    if not targets:
+        return []
+
+    bulk = get_bulk_quotes([ticker for _, ticker, _ in targets])
+
     updates: List[Tuple[str, Dict[str, Any], str, str]] = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(build_price_update_for_page, page): page for page in pages}
-        
-        for fut in as_completed(futures):
-            try:
-                result = fut.result()
-                if result:
-                    updates.append(result)
-            except Exception as exc:
-                page = futures[fut]
-                ticker = get_page_text(page.get("properties", {}), ["티커", "Ticker"]).upper() or "UNKNOWN"
-                logger.warning(f"❌ [{ticker}] 데이터 수집 중 에러: {exc}")
-    
+    fallback_cnt = 0
+    for page, ticker, name in targets:
+        try:
+            quote = bulk.get(ticker.strip().upper())
+            if quote is None:
+                fallback_cnt += 1
+                quote = get_stock_data(ticker)
+            payload = _build_price_payload(page, ticker, name, *quote)
+        except Exception as e:
+            logger.warning(f"❌ [{ticker}] 예상치 못한 에러: {e}")
+            continue
+        if payload:
+            updates.append(payload)
+
+    if fallback_cnt:
+        logger.info(f"   ↩️ [멀티시세] {len(targets)}종목 중 {fallback_cnt}종목 종목별 조회 폴백")
     return updates
 
 
+# ==============================================================================
+# 4. 스트리밍 수집 및 노션 반영 파이프라인
+# ==============================================================================
+def stream_price_updates(
+    notion_client: Any,
+    records: Iterable[PageRecord],
+    journal: Optional[WriteJournal] = None,
+    skip_ids: Optional[Set[str]] = None
+) -> Dict[str, int]:
+    """
+    노션 스캔 결과를 흘려보내며 가격 데이터를 병렬 수집하고, 변경된 페이로드는 즉시 노션에 반영합니다.
+    US_BULK_QUOTE가 켜져 있으면 100종목 단위 멀티심볼 시세조회로, 꺼져 있으면 종목별 조회로 수집합니다.
+    """
+    if US_BULK_QUOTE_ENABLED:
+        build_fn: Callable[[Any], Any] = build_price_updates_for_chunk
+        batch_size = US_BULK_QUOTE_MAX_SYMBOLS
+    else:
+        build_fn = build_price_update_for_page
+        batch_size = 1
+    return run_streaming_sync(
+        notion_client,
+        records,
+        build_fn,
+        collect_workers=COLLECT_WORKERS,
+        write_workers=6,
+        logger=logger,
+        journal=journal,
+        skip_ids=skip_ids,
+        batch_size=batch_size,
+    )
+
+
 # ==============================================================================
 # 5. 메인 실행 함수
 # ==============================================================================
@@ -206,37 +327,32 @@ def main() -> None:
         return
 
     notion_client = build_notion_client(NOTION_TOKEN)
+
+    # 직전 실행이 타임아웃 등으로 중단되었다면 저널에 남은 미완료 쓰기를 먼저 재개
+    journal = WriteJournal("price_us", market="US")
+    resumed_ids = resume_pending_writes(notion_client, journal, logger=logger)
+
     kst = timezone(timedelta(hours=9))
     logger.info(f"⚡ [해외 주식 가격 업데이트] 시작 - {datetime.now(kst)}")
     
-    all_pages = []
-    
-    logger.info("📋 노션 데이터베이스 스캔 중...")
-    for page in paginate_database(notion_client, DATABASE_ID, page_size=100, retry_delay=0.05):
-        all_pages.append(page)
-    
-    logger.info(f"📊 총 {len(all_pages)}개 항목 발견")
-    
-    batch_collect_size = 35
-    updates: List[Tuple[str, Dict[str, Any], str, str]] = []
-    
-    for batch_idx, i in enumerate(range(0, len(all_pages), batch_collect_size), 1):
-        batch = all_pages[i : i + batch_collect_size]
-        logger.info(f"\n🔄 데이터 수집 배치 {batch_idx}/{(len(all_pages) + batch_collect_size - 1) // batch_collect_size} ({len(batch)}개 항목)")
-        
-        batch_updates = batch_collect_us_price_data(batch, max_workers=6)
-        updates.extend(batch_updates)
-        
-        if i + batch_collect_size < len(all_pages):
-            time.sleep(0.5)
-    
-    if updates:
-        batch_update_pages(notion_client, updates, max_workers=3, delay=0.05, logger=logger)
-    else:
+    # 스캔·수집·반영을 겹쳐 실행 (전체 소요 시간이 가장 느린 단계에 수렴)
+    logger.info("📋 노션 데이터베이스 스캔과 동시에 가격 데이터 수집을 시작합니다...")
+    records = paginate_database_records(notion_client, DATABASE_ID, SCAN_PROPERTIES, page_size=100, retry_delay=0.05, query_filter=build_market_filter("US"))
+    stats = stream_price_updates(
+        notion_client,
+        records,
+        journal=journal,
+        skip_ids=resumed_ids,
+    )
+    if stats["collected"] == 0:
         logger.warning("⚠️ 업데이트할 항목이 없습니다.")
-        
+
+    logger.info(f"   📦 {get_yahoo_client().summary()}")
     logger.info("✨ 해외 주식 현재가 업데이트 프로세스가 완료되었습니다.")
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        BACKOFF.report(logger)
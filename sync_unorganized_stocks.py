@@ -24,12 +24,14 @@ import yfinance as yf
 from dotenv import load_dotenv
 
 from notion_utils import (
+    BACKOFF,
     build_notion_client,
     get_env_var,
     get_db_id,
     get_kst_str,
-    paginate_database,
+    paginate_database_cached,
     get_prop_value,
+    get_yahoo_session,
 )
 
 # Windows 콘솔 UTF-8 출력 안전화
@@ -79,7 +81,7 @@ def get_exchange_rates() -> Dict[str, float]:
     direct_tickers = {"USDKRW": "USDKRW=X", "JPYKRW": "JPYKRW=X", "TWDKRW": "TWDKRW=X"}
     for notion_ticker, yf_ticker in direct_tickers.items():
         try:
-            hist = yf.Ticker(yf_ticker).history(period="1d")
+            hist = yf.Ticker(yf_ticker, session=get_yahoo_session()).history(period="1d")
             if not hist.empty:
                 rate = float(hist['Close'].iloc[-1])
                 if notion_ticker == "JPYKRW":
@@ -89,7 +91,7 @@ def get_exchange_rates() -> Dict[str, float]:
             pass
     try:
         usd_krw = rates.get("USDKRW")
-        hist_ils = yf.Ticker("ILS=X").history(period="1d")
+        hist_ils = yf.Ticker("ILS=X", session=get_yahoo_session()).history(period="1d")
         if usd_krw and not hist_ils.empty:
             rates["ILSKRW"] = round(usd_krw / float(hist_ils['Close'].iloc[-1]), 2)
     except Exception:
@@ -216,12 +218,19 @@ def main() -> None:
     print(f"   ✅ 수집된 환율: {exchange_rates}")
 
     print("🔍 노션 데이터베이스 색인 생성 중...")
-    master_pages = get_all_pages(MASTER_DB_ID)
-    master_map = {normalize(get_prop(p['properties'], "티커")): p['id'] for p in master_pages if get_prop(p['properties'], "티커")}
+    notion_client = build_notion_client(NOTION_TOKEN)
+    master_map: Dict[str, str] = {}
+    for p in paginate_database_cached(notion_client, MASTER_DB_ID, page_size=100):
+        t_val = get_prop(p['properties'], "티커")
+        if t_val:
+            master_map[normalize(t_val)] = p['id']
     print(f"   ✅ 상장주식 Master DB: {len(master_map)}개 티커 색인")
 
-    interest_pages = get_all_pages(INTEREST_DB_ID)
-    interest_map = {normalize(get_prop(p['properties'], "티커")): p['id'] for p in interest_pages if get_prop(p['properties'], "티커")}
+    interest_map: Dict[str, str] = {}
+    for p in paginate_database_cached(notion_client, INTEREST_DB_ID, page_size=100):
+        t_val = get_prop(p['properties'], "티커")
+        if t_val:
+            interest_map[normalize(t_val)] = p['id']
     print(f"   ✅ 투자주 DB: {len(interest_map)}개 티커 색인")
 
     print("\n🚀 미정리 종목 처리 및 매칭 시작...")
@@ -236,4 +245,7 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        BACKOFF.report(logger)
@@ -29,12 +29,15 @@ from dotenv import load_dotenv
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
 
 from notion_utils import (
+    BACKOFF,
     build_notion_client,
     get_env_var,
     get_db_id,
     get_kst_str,
-    paginate_database,
+    paginate_database_cached,
     get_prop_value,
+    safe_create_page,
+    safe_append_blocks,
 )
 from ai_service import AIService, YouTubeAnalysisResult, YouTubeAssetItem
 
@@ -295,19 +298,14 @@ def create_youtube_summary_notion_page(
             }
         })
 
-    try:
-        new_page = client.pages.create(
-            parent={"database_id": db_id},
-            properties=page_props,
-            children=blocks
-        )
-        page_id = new_page.get("id")
-        page_url = new_page.get("url", f"https://notion.so/{page_id.replace('-', '')}")
-        logger.info(f"   ✅ [Notion 생성 성공] {title} (URL: {page_url})")
-        return page_id
-    except Exception as e:
-        logger.error(f"   ❌ [Notion 생성 실패] {title}: {e}")
+    new_page = safe_create_page(client, db_id, page_props, children=blocks)
+    if not new_page or not new_page.get("id"):
+        logger.error(f"   ❌ [Notion 생성 실패] {title}")
         return None
+    page_id = new_page["id"]
+    page_url = new_page.get("url", f"https://notion.so/{page_id.replace('-', '')}")
+    logger.info(f"   ✅ [Notion 생성 성공] {title} (URL: {page_url})")
+    return page_id
 
 
 def create_unorganized_stock_items(
@@ -354,12 +352,11 @@ def create_unorganized_stock_items(
         if clean_ticker in master_map:
             props["상장주식DB"] = {"relation": [{"id": master_map[clean_ticker]}]}
 
-        try:
-            client.pages.create(parent={"database_id": db_id}, properties=props)
+        if safe_create_page(client, db_id, props):
             count += 1
             logger.info(f"      🥬 [미정리 종목 추가] {raw_ticker} ({name}) -> 미정리 DB 적재 완료")
-        except Exception as e:
-            logger.warning(f"      ⚠️ [미정리 종목 생성 실패] {raw_ticker}: {e}")
+        else:
+            logger.warning(f"      ⚠️ [미정리 종목 생성 실패] {raw_ticker}")
 
     return count
 
@@ -407,12 +404,11 @@ def append_insight_callout_to_master_db(
             }
         }
 
-        try:
-            client.blocks.children.append(block_id=master_page_id, children=[callout_block])
+        if safe_append_blocks(client, master_page_id, [callout_block]):
             appended_count += 1
             logger.info(f"      📌 [Master DB Callout 추가] {clean_ticker} 페이지에 유튜브 인사이트 블록 추가 완료")
-        except Exception as e:
-            logger.warning(f"      ⚠️ [Master DB Callout 추가 실패] {clean_ticker}: {e}")
+        else:
+            logger.warning(f"      ⚠️ [Master DB Callout 추가 실패] {clean_ticker}")
 
     return appended_count
 
@@ -432,7 +428,7 @@ def main() -> None:
     master_map: Dict[str, str] = {}
     if MASTER_DB_ID:
         try:
-            for p in paginate_database(notion_client, MASTER_DB_ID, page_size=100):
+            for p in paginate_database_cached(notion_client, MASTER_DB_ID, page_size=100):
                 t_val = get_prop_value(p.get("properties", {}), ["티커", "Ticker"])
                 if t_val:
                     master_map[normalize_ticker(str(t_val))] = p.get("id", "")
@@ -523,4 +519,7 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        BACKOFF.report(logger)
@@ -0,0 +1,65 @@
+"""
+테스트 공용 설정 및 픽스처
+- 저장소 루트의 동기화 스크립트를 임포트할 수 있도록 경로와 필수 환경 변수를 준비합니다.
+- kis_ws_server: KIS 실시간 체결가 서버를 대신하는 로컬 websockets.serve 대역 서버
+"""
+
+import os
+import sys
+import asyncio
+import threading
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("NOTION_TOKEN", "test-token")
+os.environ.setdefault("DATABASE_ID", "test-database")
+
+websockets = pytest.importorskip("websockets")
+
+
+class FakeKISServer:
+    """
+    구독 요청을 모두 받은 뒤 script에 적힌 (대기 초, 프레임) 순서대로 체결 프레임을 보내는 대역 서버입니다.
+    받은 구독 메시지는 subscriptions에 쌓입니다.
+    """
+
+    def __init__(self):
+        self.url = ""
+        self.expected_subscriptions = 0
+        self.script: List[Tuple[float, str]] = []
+        self.subscriptions: List[str] = []
+
+    async def handler(self, ws: Any) -> None:
+        while len(self.subscriptions) < self.expected_subscriptions:
+            self.subscriptions.append(await ws.recv())
+        for delay, frame in self.script:
+            await asyncio.sleep(delay)
+            await ws.send(frame)
+        await ws.wait_closed()
+
+
+@pytest.fixture
+def kis_ws_server() -> Iterator[FakeKISServer]:
+    """별도 스레드의 이벤트 루프에서 127.0.0.1 임의 포트로 대역 서버를 띄웁니다."""
+    server = FakeKISServer()
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    state: Dict[str, Any] = {}
+
+    async def _serve() -> None:
+        async with websockets.serve(server.handler, "127.0.0.1", 0) as ws_server:
+            port = list(ws_server.sockets)[0].getsockname()[1]
+            server.url = f"ws://127.0.0.1:{port}"
+            state["stop"] = loop.create_future()
+            ready.set()
+            await state["stop"]
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(_serve(),), daemon=True)
+    thread.start()
+    assert ready.wait(5), "대역 WebSocket 서버 기동 실패"
+    yield server
+    loop.call_soon_threadsafe(state["stop"].set_result, None)
+    thread.join(5)
+    loop.close()
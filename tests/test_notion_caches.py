@@ -0,0 +1,455 @@
+"""
+notion_utils 상태 보존형 캐시·저장소 테스트
+- NotionSnapshotStore: 전체/증분 갱신, 휴지통·아카이브 페이지 제거
+- WriteJournal / resume_pending_writes: 미완료 쓰기 복원, 이전 거래일 레코드 폐기, 실패 건만 유지
+- KIS 토큰 메모·파일 잠금: 메모/디스크 재사용, 동시 요청 시 1회 발급
+- OHLCVStore: 증분 수신과 수정주가 재계산 시 전체 재수신
+- KISQuoteCache / YahooFundamentalsCache / FDRListingCache: 만료 규칙과 디스크 공유
+- build_dirty_payload: text / relation / multi_select 변경 감지
+"""
+
+import sys
+import threading
+import time
+import types
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+from notion_client.errors import APIErrorCode, APIResponseError
+
+import notion_utils as nu
+
+
+def _page(page_id: str, edited: str = "2026-01-01T00:00:00.000Z", **flags: Any) -> Dict[str, Any]:
+    page = {"id": page_id, "last_edited_time": edited, "properties": {}}
+    page.update(flags)
+    return page
+
+
+def _api_error(status: int, message: str) -> APIResponseError:
+    response = httpx.Response(status, request=httpx.Request("PATCH", "https://api.notion.com/v1/pages/x"))
+    return APIResponseError(response, message, APIErrorCode.ValidationError)
+
+
+class FakePages:
+    """pages.update 호출을 기록하고, rejected에 있는 페이지는 지정한 오류로 거절하는 대역입니다."""
+
+    def __init__(self, rejected: Optional[Dict[str, Exception]] = None):
+        self.rejected = rejected or {}
+        self.updated: List[str] = []
+
+    def update(self, page_id: str, properties: Dict[str, Any]) -> Dict[str, Any]:
+        if page_id in self.rejected:
+            raise self.rejected[page_id]
+        self.updated.append(page_id)
+        return {"id": page_id}
+
+
+class FakeClient:
+    def __init__(self, rejected: Optional[Dict[str, Exception]] = None):
+        self.pages = FakePages(rejected)
+
+
+# ==============================================================================
+# 1. 노션 스냅샷 저장소
+# ==============================================================================
+@pytest.fixture
+def snapshot_store(tmp_path, monkeypatch):
+    store = nu.NotionSnapshotStore(str(tmp_path / "snapshot.sqlite3"))
+    monkeypatch.setattr(nu, "_SNAPSHOT_STORE", store)
+    return store
+
+
+def _serve_pages(monkeypatch, pages: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    filters: List[Optional[Dict[str, Any]]] = []
+
+    def _fake_iter(client, database_id, page_size, retry_delay, query_filter=None, filter_properties=None):
+        filters.append(query_filter)
+        return iter(pages)
+
+    monkeypatch.setattr(nu, "_iter_database_pages", _fake_iter)
+    return filters
+
+
+def test_snapshot_incremental_refresh_merges_and_drops_trashed_pages(snapshot_store, monkeypatch):
+    _serve_pages(monkeypatch, [_page("a"), _page("b"), _page("c")])
+    assert snapshot_store.refresh(None, "db") == (3, 3, True)
+
+    filters = _serve_pages(monkeypatch, [_page("b", "2026-01-02T00:00:00.000Z"), _page("c", in_trash=True), _page("d")])
+    fetched, total, full = snapshot_store.refresh(None, "db")
+
+    assert (fetched, total, full) == (3, 3, False)
+    assert filters[0] is not None and filters[0]["timestamp"] == "last_edited_time"
+    pages = {page["id"]: page for page in snapshot_store.iter_pages("db")}
+    assert sorted(pages) == ["a", "b", "d"]
+    assert pages["b"]["last_edited_time"] == "2026-01-02T00:00:00.000Z"
+
+
+def test_snapshot_full_refresh_replaces_local_copy(snapshot_store, monkeypatch):
+    _serve_pages(monkeypatch, [_page("a"), _page("b")])
+    snapshot_store.refresh(None, "db")
+    monkeypatch.setattr(nu, "SNAPSHOT_FULL_REFRESH_HOURS", 0.0)
+
+    _serve_pages(monkeypatch, [_page("b")])
+    assert snapshot_store.refresh(None, "db") == (1, 1, True)
+
+
+@pytest.mark.parametrize("error", [
+    _api_error(400, "Can't edit block that is archived. You must unarchive the block before editing."),
+    _api_error(404, "Could not find page with ID: a."),
+])
+def test_rejected_update_removes_trashed_page_from_every_snapshot(snapshot_store, monkeypatch, error):
+    _serve_pages(monkeypatch, [_page("aaaa-1111"), _page("b")])
+    snapshot_store.refresh(None, "db")
+    snapshot_store.refresh(None, "db", query_filter={"property": "시장", "select": {"equals": "KR"}})
+    filtered_key = snapshot_store.snapshot_key("db", {"property": "시장", "select": {"equals": "KR"}})
+
+    assert nu.safe_page_update(FakeClient({"AAAA1111": error}), "AAAA1111", {"현재가": {"number": 1}}) is False
+
+    assert [page["id"] for page in snapshot_store.iter_pages("db")] == ["b"]
+    assert [page["id"] for page in snapshot_store.iter_pages(filtered_key)] == ["b"]
+
+
+def test_other_rejections_keep_the_snapshot_page(snapshot_store, monkeypatch):
+    _serve_pages(monkeypatch, [_page("a")])
+    snapshot_store.refresh(None, "db")
+
+    error = _api_error(400, "body failed validation: body.properties.현재가.number should be a number")
+    assert nu.safe_page_update(FakeClient({"a": error}), "a", {"현재가": {"number": "x"}}) is False
+
+    assert [page["id"] for page in snapshot_store.iter_pages("db")] == ["a"]
+
+
+# ==============================================================================
+# 2. 쓰기 저널 및 재개
+# ==============================================================================
+def _payload(page_id: str, price: float) -> Any:
+    return (page_id, {"현재가": {"number": price}}, page_id.upper(), f"종목{page_id}")
+
+
+def test_journal_restores_unfinished_payloads_of_the_current_session(tmp_path):
+    journal = nu.WriteJournal("test", directory=str(tmp_path))
+    journal.record_pending([_payload("a", 1), _payload("b", 2), _payload("c", 3)])
+    journal.mark_done("b")
+    journal.record_pending([_payload("a", 10)])
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"op": "done", "page_')  # 강제 종료로 잘린 마지막 줄
+
+    pending = nu.WriteJournal("test", directory=str(tmp_path)).load_pending()
+
+    assert [(pid, props["현재가"]["number"]) for pid, props, _, _ in pending] == [("c", 3), ("a", 10)]
+
+
+def test_journal_drops_records_from_a_previous_trading_session(tmp_path):
+    old = nu.WriteJournal("test", directory=str(tmp_path))
+    old.session = "2020-01-02"
+    old.record_pending([_payload("a", 1)])
+    journal = nu.WriteJournal("test", directory=str(tmp_path))
+    journal.record_pending([_payload("b", 2)])
+
+    assert [p[0] for p in journal.load_pending()] == ["b"]
+    assert journal.stale_dropped == 1
+
+
+def test_journal_fsync_is_batched_by_interval(tmp_path, monkeypatch):
+    synced: List[int] = []
+    real_fsync = nu.os.fsync
+    monkeypatch.setattr(nu.os, "fsync", lambda fd: (synced.append(fd), real_fsync(fd)))
+
+    batched = nu.WriteJournal("batched", directory=str(tmp_path), fsync_interval=3600)
+    for idx in range(20):
+        batched.mark_done(f"p{idx}")
+    assert len(synced) == 1
+
+    synced.clear()
+    every = nu.WriteJournal("every", directory=str(tmp_path), fsync_interval=0)
+    for idx in range(5):
+        every.mark_done(f"p{idx}")
+    assert len(synced) == 5
+
+
+def test_resume_pending_writes_keeps_only_failed_payloads(tmp_path):
+    journal = nu.WriteJournal("test", directory=str(tmp_path))
+    journal.record_pending([_payload("a", 1), _payload("b", 2)])
+    client = FakeClient({"b": _api_error(400, "body failed validation")})
+
+    completed = nu.resume_pending_writes(client, journal, max_workers=2)
+
+    assert completed == {"a"}
+    assert client.pages.updated == ["a"]
+    assert [p[0] for p in journal.load_pending()] == ["b"]
+
+
+def test_resume_pending_writes_clears_an_empty_journal(tmp_path):
+    journal = nu.WriteJournal("test", directory=str(tmp_path))
+    assert nu.resume_pending_writes(FakeClient(), journal) == set()
+    assert open(journal.path, encoding="utf-8").read() == ""
+
+
+# ==============================================================================
+# 3. KIS 토큰 메모 및 파일 잠금
+# ==============================================================================
+class FakeTokenResponse:
+    status_code = 200
+    headers: Dict[str, str] = {}
+
+    def __init__(self, token: str):
+        self._token = token
+
+    def raise_for_status(self) -> None:
+        return None
+
+    def json(self) -> Dict[str, Any]:
+        return {"access_token": self._token, "expires_in": 86400}
+
+
+@pytest.fixture
+def token_env(tmp_path, monkeypatch):
+    """토큰 캐시·잠금 파일을 임시 경로로 옮기고, 발급 요청을 세는 가짜 requests.post를 설치합니다."""
+    cache_file = tmp_path / "token.json"
+    monkeypatch.setattr(nu, "TOKEN_CACHE_FILE", str(cache_file))
+    monkeypatch.setattr(nu, "TOKEN_LOCK_FILE", f"{cache_file}.lock")
+    monkeypatch.setattr(nu, "_TOKEN_MEMO", {})
+    issued: List[str] = []
+
+    def _fake_post(url, json=None, timeout=None):
+        time.sleep(0.05)
+        issued.append(url)
+        return FakeTokenResponse(f"token-{len(issued)}")
+
+    monkeypatch.setattr(nu.requests, "post", _fake_post)
+    return issued
+
+
+def test_token_is_issued_once_and_reused_from_memo_and_disk(token_env, monkeypatch):
+    assert nu._request_kis_token("https://kis", "APPKEY123", "secret") == "token-1"
+    assert nu._request_kis_token("https://kis", "APPKEY123", "secret") == "token-1"
+
+    # 새 프로세스: 메모는 비어 있고 디스크 캐시만 남아 있음
+    monkeypatch.setattr(nu, "_TOKEN_MEMO", {})
+    assert nu._request_kis_token("https://kis", "APPKEY123", "secret") == "token-1"
+    assert len(token_env) == 1
+
+
+def test_concurrent_token_requests_issue_a_single_token(token_env):
+    tokens: List[Optional[str]] = []
+    threads = [
+        threading.Thread(target=lambda: tokens.append(nu._request_kis_token("https://kis", "APPKEY123", "secret")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert tokens == ["token-1"] * 8
+    assert len(token_env) == 1
+
+
+def test_expiring_disk_token_is_reissued(token_env):
+    cache_key = nu._token_cache_key("https://kis", "APPKEY123")
+    nu._save_token_cache({cache_key: {"token": "old", "expires_at": time.time() + 60}})
+
+    assert nu._request_kis_token("https://kis", "APPKEY123", "secret") == "token-1"
+    assert nu._load_token_cache()[cache_key]["token"] == "token-1"
+
+
+# ==============================================================================
+# 4. 로컬 일봉 저장소
+# ==============================================================================
+def _candles(end: date, days: int, scale: float = 1.0) -> pd.DataFrame:
+    index = pd.bdate_range(end=pd.Timestamp(end), periods=days)
+    close = np.linspace(100, 150, days) * scale
+    return pd.DataFrame(
+        {"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close, "Volume": np.full(days, 1000.0)},
+        index=index,
+    )
+
+
+class CandleSource:
+    """start 이후의 일봉을 잘라 돌려주고, 요청 시작일을 기록하는 fetch_fn 대역입니다."""
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self.starts: List[date] = []
+
+    def __call__(self, start: date) -> pd.DataFrame:
+        self.starts.append(start)
+        return self.frame.loc[self.frame.index >= pd.Timestamp(start)]
+
+
+def test_ohlcv_store_fetches_only_recent_days_after_the_first_run(tmp_path):
+    today = nu.get_kst_now().date()
+    store = nu.OHLCVStore(root=str(tmp_path))
+    source = CandleSource(_candles(today, 400))
+
+    first = store.get_history("US", "AAPL", 365, source)
+    assert store.full_fetches == 1 and first is not None and not first.empty
+
+    second = store.get_history("US", "AAPL", 365, source)
+    assert store.incremental_fetches == 1
+    assert source.starts[-1] >= first.index[-1].date() - timedelta(days=nu.OHLCV_OVERLAP_DAYS)
+    pd.testing.assert_frame_equal(first, second, check_freq=False)
+
+
+def test_ohlcv_store_refetches_everything_when_the_overlap_was_adjusted(tmp_path):
+    today = nu.get_kst_now().date()
+    store = nu.OHLCVStore(root=str(tmp_path))
+    store.get_history("US", "AAPL", 365, CandleSource(_candles(today, 400)))
+
+    # 액면분할 등으로 과거 종가 전체가 재계산된 경우
+    adjusted = CandleSource(_candles(today, 400, scale=0.5))
+    result = store.get_history("US", "AAPL", 365, adjusted)
+
+    assert store.full_fetches == 2 and store.incremental_fetches == 0
+    assert len(adjusted.starts) == 2
+    assert result is not None
+    assert result["Close"].iloc[0] == pytest.approx(adjusted.frame.loc[result.index[0], "Close"])
+
+
+def test_ohlcv_store_returns_stored_history_when_the_fetch_fails(tmp_path):
+    today = nu.get_kst_now().date()
+    store = nu.OHLCVStore(root=str(tmp_path))
+    first = store.get_history("US", "AAPL", 365, CandleSource(_candles(today, 400)))
+
+    def _broken(start: date) -> pd.DataFrame:
+        raise ConnectionError("network down")
+
+    assert store.get_history("US", "AAPL", 365, _broken) is not None
+    assert store.failures == 1
+    assert first is not None
+
+
+# ==============================================================================
+# 5. 시세·펀더멘털·상장 목록 디스크 캐시
+# ==============================================================================
+def test_quote_cache_uses_ttl_during_session_and_close_cutoff_after(tmp_path, monkeypatch):
+    path = str(tmp_path / "quotes.json")
+    monkeypatch.setattr(nu, "get_kr_last_close", lambda now=None: None)
+    cache = nu.KISQuoteCache(path=path, ttl_sec=300)
+    cache.put("005930", {"stck_prpr": "70000"})
+    assert cache.get("005930") == {"stck_prpr": "70000"}
+
+    cache._entries["005930"]["fetched_at"] -= 301  # type: ignore[index]
+    assert cache.get("005930") is None
+
+    # 장 마감 후: 마감 이후에 받은 응답은 TTL과 무관하게 재사용, 마감 전 응답은 만료
+    closed_at = datetime.now(nu.ZoneInfo("Asia/Seoul")) - timedelta(hours=1)
+    monkeypatch.setattr(nu, "get_kr_last_close", lambda now=None: closed_at)
+    after_close = nu.KISQuoteCache(path=path, ttl_sec=300)
+    after_close.put("000660", {"stck_prpr": "200000"})
+    after_close._entries["000660"]["fetched_at"] = closed_at.timestamp() + 1  # type: ignore[index]
+    after_close._entries["005930"] = {"fetched_at": closed_at.timestamp() - 1, "output": {}}  # type: ignore[index]
+    after_close.save()
+
+    shared = nu.KISQuoteCache(path=path, ttl_sec=300)
+    assert shared.get("000660") == {"stck_prpr": "200000"}
+    assert shared.get("005930") is None
+    assert (shared.hits, shared.misses) == (1, 1)
+
+
+def test_fundamentals_cache_keeps_base_fields_until_ttl_or_earnings(tmp_path, monkeypatch):
+    monkeypatch.setattr(nu, "YAHOO_FUNDAMENTALS_ENABLED", True)
+    path = str(tmp_path / "fundamentals.json")
+    cache = nu.YahooFundamentalsCache(path=path, ttl_sec=7 * 86400)
+
+    fields = cache.put("aapl", {"trailingEps": 6.1, "bookValue": 4.2, "currentPrice": 190.0, "trailingPE": None})
+    assert fields == {"trailingEps": 6.1, "bookValue": 4.2}
+    cache.save()
+    assert nu.YahooFundamentalsCache(path=path).get("AAPL") == fields
+
+    now = time.time()
+    cache.put("MSFT", {"trailingEps": 11.0, "earningsTimestamp": now - 2 * 86400})
+    cache._entries["MSFT"]["fetched_at"] = now - 3 * 86400  # type: ignore[index]
+    assert cache.get("MSFT") is None  # 보관 이후 실적 발표(+1일)가 지남
+
+    cache._entries["AAPL"]["fetched_at"] = now - 8 * 86400  # type: ignore[index]
+    assert cache.get("AAPL") is None
+
+
+def test_listing_cache_downloads_once_per_trading_day(tmp_path, monkeypatch):
+    downloads: List[str] = []
+
+    def _stock_listing(name: str) -> pd.DataFrame:
+        downloads.append(name)
+        return pd.DataFrame({"Code": ["005930", "000660"], "Name": ["삼성전자", "SK하이닉스"]})
+
+    monkeypatch.setitem(sys.modules, "FinanceDataReader", types.SimpleNamespace(StockListing=_stock_listing))
+    monkeypatch.setattr(nu, "FDR_LISTING_CACHE_ENABLED", True)
+
+    cache = nu.FDRListingCache(root=str(tmp_path))
+    first = cache.get("KRX")
+    first.loc[0, "Name"] = "변경"  # 반환값은 사본이므로 캐시에 영향 없음
+    assert cache.get("KRX")["Name"].tolist() == ["삼성전자", "SK하이닉스"]
+
+    # 다른 워크플로우(새 프로세스)는 디스크 사본을 재사용
+    other = nu.FDRListingCache(root=str(tmp_path))
+    assert other.get("KRX")["Code"].tolist() == ["005930", "000660"]
+    assert downloads == ["KRX"]
+
+    # fresh_after 이후에 받은 목록만 인정
+    other.get("KRX", fresh_after=datetime.now(nu.ZoneInfo("Asia/Seoul")) + timedelta(minutes=1))
+    assert downloads == ["KRX", "KRX"]
+
+
+# ==============================================================================
+# 6. Dirty checking (text / relation / multi_select)
+# ==============================================================================
+def _notion_props() -> Dict[str, Any]:
+    return {
+        "종목명": {"type": "title", "title": [{"plain_text": "삼성전자"}]},
+        "요약": {"type": "rich_text", "rich_text": [{"plain_text": "메모리 반도체"}]},
+        "벤치마크": {"type": "relation", "relation": [{"id": "aaaa-1111"}, {"id": "bbbb-2222"}]},
+        "태그": {"type": "multi_select", "multi_select": [{"name": "반도체"}, {"name": "대형주"}]},
+    }
+
+
+def _dirty(candidate: Dict[str, Any], record: bool = False) -> Optional[Dict[str, Any]]:
+    props: Any = _notion_props()
+    if record:
+        props = nu.PageRecord.from_page({"id": "p", "properties": props})
+    payload = nu.build_dirty_payload(
+        props, candidate,
+        text_fields=["종목명", "요약"], relation_fields=["벤치마크"], multi_select_fields=["태그"],
+    )
+    if payload is not None:
+        # 변경이 있으면 함께 주입되는 '마지막 업데이트' 날짜 속성은 비교에서 제외
+        assert payload.pop("마지막 업데이트", None) is not None
+    return payload
+
+
+@pytest.mark.parametrize("record", [False, True])
+def test_dirty_payload_ignores_reordered_or_reformatted_values(record):
+    candidate = {
+        "종목명": " 삼성전자 ",
+        "요약": "메모리 반도체",
+        "벤치마크": ["BBBB2222", "aaaa1111"],
+        "태그": ["대형주", "반도체"],
+    }
+    assert _dirty(candidate, record) is None
+
+
+@pytest.mark.parametrize("record", [False, True])
+def test_dirty_payload_writes_only_changed_fields(record):
+    candidate = {"종목명": "삼성전자", "요약": "", "벤치마크": ["aaaa-1111"], "태그": ["반도체", "배당"]}
+
+    payload = _dirty(candidate, record)
+
+    assert payload == {
+        "요약": {"rich_text": []},
+        "벤치마크": {"relation": [{"id": "aaaa-1111"}]},
+        "태그": {"multi_select": [{"name": "반도체"}, {"name": "배당"}]},
+    }
+
+
+def test_dirty_payload_clears_relations_and_keeps_title_type():
+    payload = _dirty({"종목명": "Samsung Electronics", "벤치마크": []})
+
+    assert payload == {
+        "종목명": {"title": [{"text": {"content": "Samsung Electronics"}}]},
+        "벤치마크": {"relation": []},
+    }
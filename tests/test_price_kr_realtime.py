@@ -0,0 +1,133 @@
+"""
+sync_price_kr 실시간 체결가 모드 테스트
+- parse_realtime_frame 파싱
+- 로컬 대역 서버(kis_ws_server) → LatestPriceBook → flush_realtime_prices → dirty checking 까지의 종단 흐름
+- 구독 종료 시각 및 구독 종목 선택 규칙
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+import sync_price_kr as price_kr
+from notion_utils import PageRecord
+
+KST = ZoneInfo("Asia/Seoul")
+FIELD_COUNT = 46  # H0STCNT0 레코드당 필드 수
+
+
+def _tick(code: str, price: int, sign: str, diff: int) -> List[str]:
+    row = ["0"] * FIELD_COUNT
+    row[0], row[1], row[2], row[3], row[4] = code, "093000", str(price), sign, str(diff)
+    return row
+
+
+def _frame(*rows: List[str]) -> str:
+    return f"0|{price_kr.REALTIME_TR_ID}|{len(rows):03d}|" + "^".join("^".join(row) for row in rows)
+
+
+def _page(page_id: str, ticker: str, price: Optional[float], prev_close: Optional[float], flag: bool = False) -> PageRecord:
+    page = {
+        "id": page_id,
+        "properties": {
+            "티커": {"type": "rich_text", "rich_text": [{"plain_text": ticker}]},
+            "종목명": {"type": "title", "title": [{"plain_text": f"종목{ticker}"}]},
+            "현재가": {"type": "number", "number": price},
+            "전일 종가": {"type": "number", "number": prev_close},
+            "실시간": {"type": "checkbox", "checkbox": flag},
+        },
+    }
+    return PageRecord.from_page(page, price_kr.SCAN_PROPERTIES + ["실시간"])
+
+
+class FakeNotion:
+    """pages.update 호출만 기록하는 노션 클라이언트 대역 (비동기 경로 없이 스레드 경로로 전송됨)."""
+
+    def __init__(self):
+        self.pages = self
+        self.updates: List[Dict[str, Any]] = []
+
+    def update(self, page_id: str, properties: Dict[str, Any]) -> Dict[str, Any]:
+        self.updates.append({"page_id": page_id, "properties": properties})
+        return {"id": page_id}
+
+
+def test_parse_realtime_frame_multi_record_and_sign():
+    frame = _frame(_tick("005930", 70000, "2", 1000), _tick("000660", 99000, "5", 1000))
+    assert price_kr.parse_realtime_frame(frame) == [
+        ("005930", 70000.0, 69000.0),
+        ("000660", 99000.0, 100000.0),
+    ]
+
+
+def test_parse_realtime_frame_ignores_non_tick_messages():
+    assert price_kr.parse_realtime_frame("") == []
+    assert price_kr.parse_realtime_frame('{"header": {"tr_id": "PINGPONG"}}') == []
+    assert price_kr.parse_realtime_frame("0|H0STASP0|001|005930^1^2^3^4") == []
+    assert price_kr.parse_realtime_frame(_frame(_tick("005930", 0, "3", 0))) == []
+
+
+def test_realtime_session_flushes_only_changed_prices(kis_ws_server):
+    samsung = _page("page-samsung", "005930", 70000, 69000)
+    hynix = _page("page-hynix", "000660", 100000, 98000)
+    targets = {
+        "005930": (samsung, "005930", "삼성전자"),
+        "000660": (hynix, "000660", "SK하이닉스"),
+    }
+    kis_ws_server.expected_subscriptions = len(targets)
+    kis_ws_server.script = [
+        (0.0, json.dumps({"header": {"tr_id": "PINGPONG"}})),
+        # 삼성전자는 노션 값과 같아 쓰기 없음, 하이닉스는 두 틱이 최신가 하나로 합쳐짐
+        (0.0, _frame(_tick("005930", 70000, "2", 1000), _tick("000660", 101000, "2", 3000))),
+        (0.0, _frame(_tick("000660", 102000, "2", 4000))),
+        # 구독하지 않은 종목은 무시
+        (0.0, _frame(_tick("035720", 50000, "2", 100))),
+        # 다음 flush 주기: 하이닉스는 같은 값 재수신(쓰기 없음), 삼성전자만 변경
+        (0.6, _frame(_tick("000660", 102000, "2", 4000), _tick("005930", 71000, "2", 2000))),
+    ]
+    notion = FakeNotion()
+
+    book, flushed = asyncio.run(price_kr._run_realtime_session(
+        notion, kis_ws_server.url, "test-key", targets, time.time() + 1.5, 0.3, None
+    ))
+
+    subscribed = [json.loads(msg)["body"]["input"]["tr_key"] for msg in kis_ws_server.subscriptions]
+    assert subscribed == ["005930", "000660"]
+    assert book.ticks == 6
+    assert flushed == 2
+    # 전일 종가는 노션 값과 같아 빠지고 현재가(와 마지막 업데이트 일시)만 전송됨
+    assert [(u["page_id"], u["properties"]["현재가"]) for u in notion.updates] == [
+        ("page-hynix", {"number": 102000.0}),
+        ("page-samsung", {"number": 71000.0}),
+    ]
+    assert all("전일 종가" not in u["properties"] for u in notion.updates)
+    # 반영된 값이 다음 dirty 비교 기준으로 기록됨
+    assert hynix.raw("현재가") == 102000.0
+    assert samsung.raw("현재가") == 71000.0
+
+
+def test_resolve_realtime_stop_at_bounds_preopen_start():
+    preopen = datetime(2026, 10, 16, 8, 0, tzinfo=KST)
+    assert price_kr.resolve_realtime_stop_at(preopen, 0) == preopen.timestamp() + price_kr.KIS_WS_PREOPEN_MAX_SEC
+
+    intraday = datetime(2026, 10, 16, 10, 0, tzinfo=KST)
+    assert price_kr.resolve_realtime_stop_at(intraday, 0) == datetime(2026, 10, 16, 15, 40, tzinfo=KST).timestamp()
+    assert price_kr.resolve_realtime_stop_at(intraday, 120) == intraday.timestamp() + 120
+    assert price_kr.resolve_realtime_stop_at(datetime(2026, 10, 16, 16, 0, tzinfo=KST), 0) is None
+
+
+def test_select_realtime_targets_prefers_config_then_flag():
+    records = [
+        _page("p1", "005930", 1, 1),
+        _page("p2", "000660", 1, 1, flag=True),
+        _page("p3", "035720", 1, 1),
+        _page("p4", "373220", 1, 1, flag=True),
+    ]
+
+    assert list(price_kr.select_realtime_targets(records, tickers=["035720", "005930", "999999"])) == ["035720", "005930"]
+    assert list(price_kr.select_realtime_targets(records)) == ["000660", "373220"]
+    assert list(price_kr.select_realtime_targets(records, flag_property="", limit=2)) == ["005930", "000660"]
+    assert list(price_kr.select_realtime_targets(records, skip_ids={"p2"})) == ["373220"]
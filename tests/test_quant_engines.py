@@ -0,0 +1,87 @@
+"""
+퀀트 지표 엔진 일치성 테스트
+- 단일 종목 엔진(calculate_quant_indicators)을 기준으로 롤링 상태(RollingQuantStore)와 패널 엔진의 결과를 비교합니다.
+- 종가만 NaN인 행, 고가·저가만 NaN인 행, 종가 NaN 행의 고가 급등처럼 창 구성이 갈리기 쉬운 이력을 사용합니다.
+"""
+
+import math
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from notion_utils import OHLCVStore, RollingQuantStore, calculate_quant_indicators, calculate_quant_indicators_panel
+
+
+def _history(seed: int, rows: int = 320, with_hl: bool = True) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, rows)))
+    df = pd.DataFrame(
+        {"Close": close, "High": close * (1 + rng.random(rows) * 0.03), "Low": close * (1 - rng.random(rows) * 0.03)},
+        index=pd.bdate_range("2024-01-02", periods=rows),
+    )
+    df.loc[rng.random(rows) < 0.1, "Close"] = np.nan
+    if not with_hl:
+        return df.loc[:, ["Close"]]
+    df.loc[rng.random(rows) < 0.05, "High"] = np.nan
+    df.loc[rng.random(rows) < 0.05, "Low"] = np.nan
+    # 종가가 비어 있는 행의 고가가 52주·20일 고점이 되는 경우
+    df.iloc[-8, df.columns.get_loc("Close")] = np.nan
+    df.iloc[-8, df.columns.get_loc("High")] = float(np.nanmax(close)) * 1.5
+    return df
+
+
+def assert_same_result(expected: Dict[str, Any], actual: Dict[str, Any]) -> None:
+    assert expected.keys() == actual.keys()
+    for key, value in expected.items():
+        got = actual[key]
+        if isinstance(value, float) and isinstance(got, float) and math.isnan(value):
+            assert math.isnan(got), key
+        elif isinstance(value, float):
+            assert got == pytest.approx(value, rel=1e-9, abs=1e-4), key
+        else:
+            assert got == value, key
+
+
+@pytest.mark.parametrize("seed,with_hl,is_kr", [(1, True, True), (2, True, False), (3, False, True)])
+@pytest.mark.parametrize("last_close_nan", [False, True])
+def test_rolling_state_matches_scalar_engine_with_nan_rows(tmp_path, seed, with_hl, is_kr, last_close_nan):
+    hist = _history(seed, with_hl=with_hl)
+    if last_close_nan:
+        hist.iloc[-1, hist.columns.get_loc("Close")] = np.nan
+    store = RollingQuantStore(OHLCVStore(root=str(tmp_path)))
+
+    # 1회차: 상태가 없어 패널 엔진으로 계산하고 상태를 생성
+    first = hist.iloc[:250]
+    result = store.evaluate_batch("KR", {"T": first}, is_kr=is_kr)["T"]
+    assert_same_result(calculate_quant_indicators(first, is_kr=is_kr), result)
+    assert store.rebuilt == 1
+
+    # 2회차: 조회 시작일이 늦어지고 새 봉이 붙은 이력을 롤링 상태로 증분 갱신
+    second = hist.iloc[3:]
+    result = store.evaluate_batch("KR", {"T": second}, is_kr=is_kr)["T"]
+    assert store.incremental == 1
+    assert_same_result(calculate_quant_indicators(second, is_kr=is_kr), result)
+
+
+@pytest.mark.parametrize("is_kr", [True, False])
+def test_panel_engine_matches_scalar_engine_across_ragged_histories(is_kr):
+    # 상장일·거래일이 서로 다른 종목을 한 패널로 묶어도 종목별 단일 엔진과 같은 결과여야 함
+    histories = {
+        "LONG": _history(11),
+        "SHORT": _history(12, rows=40),
+        "CLOSE_ONLY": _history(13, with_hl=False),
+        "SHIFTED": _history(14).iloc[::2],
+        "EMPTY": pd.DataFrame(columns=["Close", "High", "Low"]),
+    }
+    current = {"LONG": 123.0, "SHIFTED": None}
+    overrides: Dict[str, Optional[float]] = {"SHORT": 500.0}
+
+    panel = calculate_quant_indicators_panel(histories, current_prices=current, is_kr=is_kr, high_52w_overrides=overrides)
+
+    for ticker, hist in histories.items():
+        expected = calculate_quant_indicators(
+            hist, current_price=current.get(ticker), is_kr=is_kr, high_52w_override=overrides.get(ticker)
+        )
+        assert_same_result(expected, panel[ticker])